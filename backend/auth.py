@@ -9,11 +9,19 @@ from datetime import datetime, timezone, timedelta
 from passlib.context import CryptContext
 from typing import Optional, Literal
 import jwt
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError, OperationFailure
 import uuid
 import httpx
+import logging
 import os
+import re
 import secrets
 
+import stats
+
+logger = logging.getLogger(__name__)
+
 # Configuration
 SECRET_KEY = os.environ.get('JWT_SECRET_KEY', secrets.token_urlsafe(32))
 ALGORITHM = "HS256"
@@ -167,8 +175,11 @@ async def get_current_user(request: Request, db) -> User:
     # Check if it's a session token (OAuth)
     session = await db.sessions.find_one({"session_token": token})
     if session:
-        # Check if session is expired
-        if datetime.now(timezone.utc) > session["expires_at"]:
+        # Check if session is expired (Motor returns naive UTC datetimes)
+        expires_at = session["expires_at"]
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        if datetime.now(timezone.utc) > expires_at:
             await db.sessions.delete_one({"session_token": token})
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -290,53 +301,96 @@ async def get_google_user_from_session(session_id: str) -> dict:
             )
         return response.json()
 
+async def ensure_indexes(db):
+    # Unique email makes the login upsert safe against concurrent first logins
+    try:
+        await db.users.create_index("email", unique=True)
+        await db.users.create_index("id", unique=True)
+    except OperationFailure as exc:
+        logger.warning("Could not create unique user indexes (duplicate users?): %s", exc)
+
 async def create_or_update_user(db, email: str, name: str, picture: Optional[str], provider: str, password_hash: Optional[str] = None) -> User:
-    """Create or update user in database"""
-    # Check if user exists by email
-    existing_user = await db.users.find_one({"email": email})
-    
-    if existing_user:
-        # Update last login and picture if changed
-        update_data = {
-            "last_login": datetime.now(timezone.utc),
-        }
-        if picture and existing_user.get("picture") != picture:
-            update_data["picture"] = picture
-        
-        # Update role if email is in admin list (in case it was added later)
-        correct_role = get_user_role(email)
-        if existing_user.get("role") != correct_role:
-            update_data["role"] = correct_role
-        
-        await db.users.update_one(
-            {"email": email},
-            {"$set": update_data}
-        )
-        # Refresh user data to include updated role
-        existing_user = await db.users.find_one({"email": email})
-        return User(**existing_user)
-    
-    # Create new user with automatic role assignment
-    user = User(
+    """Create or update user in database with a single upsert round-trip
+
+    Returning users get last_login, role (in case ADMIN_EMAILS changed) and
+    picture refreshed; new users are inserted from $setOnInsert. The profile
+    document is created lazily by the profile endpoints.
+    """
+    now = datetime.now(timezone.utc)
+    new_user = User(
         email=email,
         name=name,
         picture=picture,
         provider=provider,
         password_hash=password_hash,
-        role=get_user_role(email)  # Automatic role based on email
+        role=get_user_role(email),  # Automatic role based on email
+        created_at=now,
+        last_login=now
     )
+    update_data = {"last_login": now, "role": new_user.role}
+    if picture:
+        update_data["picture"] = picture
+    insert_data = {
+        k: v for k, v in new_user.model_dump().items()
+        if k not in update_data and k != "email"
+    }
     
-    user_doc = user.model_dump()
-    user_doc["created_at"] = user.created_at
-    user_doc["last_login"] = user.last_login
-    
-    await db.users.insert_one(user_doc)
+    for attempt in range(2):
+        try:
+            user_doc = await db.users.find_one_and_update(
+                {"email": email},
+                {"$set": update_data, "$setOnInsert": insert_data},
+                upsert=True,
+                projection={"_id": 0},
+                return_document=ReturnDocument.AFTER
+            )
+            break
+        except DuplicateKeyError:
+            # A concurrent first login inserted the user; the retry updates it
+            if attempt:
+                raise
     
-    # Create user profile
-    profile = UserProfile(user_id=user.id)
-    await db.user_profiles.insert_one(profile.model_dump())
+    if user_doc["id"] == new_user.id:
+        await stats.bump(db, total_users=1)
     
-    return user
+    return User(**user_doc)
+
+async def sync_roles(db, dry_run: bool = False) -> dict:
+    """Make every stored role match get_user_role (ADMIN_EMAILS), idempotently
+
+    One query reads the only users whose role can be wrong: configured admins
+    and current admins. Promotions and demotions go out in one unordered
+    bulk_write whose filters include the role that was read, so re-running it
+    or racing a login changes nothing twice. Roles are read from db.users on
+    every request, so changes apply without logging out.
+
+    Stored emails keep the case they were typed in, so configured admins are
+    matched case-insensitively, like is_admin_email does.
+    """
+    admin_patterns = [re.compile(rf"^\s*{re.escape(email)}\s*$", re.IGNORECASE) for email in ADMIN_EMAILS]
+    candidates = await db.users.find(
+        {"$or": [{"email": {"$in": admin_patterns}}, {"role": "admin"}]},
+        {"_id": 0, "id": 1, "email": 1, "role": 1}
+    ).to_list(None)
+    changes = [
+        (user, get_user_role(user["email"])) for user in candidates
+        if user.get("role") != get_user_role(user["email"])
+    ]
+    found = {user["email"].strip().lower() for user in candidates}
+    result = {
+        "promoted": [user["email"] for user, role in changes if role == "admin"],
+        "demoted": [user["email"] for user, role in changes if role != "admin"],
+        "missing": [email for email in ADMIN_EMAILS if email not in found],
+        "modified": 0,
+        "dry_run": dry_run,
+    }
+    if changes and not dry_run:
+        outcome = await db.users.bulk_write([
+            UpdateOne({"id": user["id"], "role": user.get("role")}, {"$set": {"role": role}})
+            for user, role in changes
+        ], ordered=False)
+        result["modified"] = outcome.modified_count
+    return result
 
 async def create_session(db, user_id: str, provider: str, session_token: str) -> Session:
     """Create a new session"""
@@ -0,0 +1,4 @@
+"""
+Benchmarks for FarchoDev Blog backend
+Run from backend/: python -m benchmarks.<module> --help
+"""
@@ -0,0 +1,282 @@
+"""
+In-process API benchmark: drives the FastAPI app through httpx's ASGI transport
+(no network, no uvicorn) against a seeded database and reports throughput and
+p50/p95/p99 per endpoint. Results can be saved as JSON baselines and compared
+between commits.
+
+Ejecutar (desde backend/):
+    python -m benchmarks.bench_api --mongo-url mongodb://localhost:27017
+    python -m benchmarks.bench_api --in-memory        # requiere: pip install mongomock-motor
+    python -m benchmarks.bench_api --save benchmarks/baselines/main.json
+    python -m benchmarks.bench_api --compare benchmarks/baselines/main.json --fail-on-regression
+
+The database (--db-name) is wiped and reseeded on every run, so its name must
+contain "bench".
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+from benchmarks import dataset
+
+REGRESSION_THRESHOLD_PERCENT = 10.0
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * p // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def summarize(latencies: List[float], wall_seconds: float, errors: int) -> dict:
+    ordered = sorted(latencies)
+    return {
+        "requests": len(ordered),
+        "errors": errors,
+        "throughput_rps": round(len(ordered) / wall_seconds, 1) if wall_seconds else 0.0,
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3) if ordered else 0.0,
+        **{f"p{p}_ms": round(percentile(ordered, p) * 1000, 3) for p in PERCENTILES},
+        "max_ms": round(ordered[-1] * 1000, 3) if ordered else 0.0,
+    }
+
+
+class ZipfPicker:
+    """Picks items with probability ∝ 1/rank, like real traffic on a few popular posts"""
+
+    def __init__(self, items: list, rng: random.Random, exponent: float = 1.1):
+        self.items = items
+        self.rng = rng
+        weights = [1 / (rank ** exponent) for rank in range(1, len(items) + 1)]
+        self.cum_weights = list(itertools.accumulate(weights))
+
+    def pick(self):
+        return self.rng.choices(self.items, cum_weights=self.cum_weights)[0]
+
+
+@dataclass
+class Endpoint:
+    name: str
+    method: str
+    path: Callable[[], str]
+    auth: Optional[str] = None  # None, "user" or "admin"
+
+
+def endpoints(data: Dict[str, List[dict]], rng: random.Random) -> List[Endpoint]:
+    published = [post for post in data["posts"] if post["published"]]
+    posts = ZipfPicker(published, rng)
+    categories = [category["slug"] for category in data["categories"]]
+    return [
+        Endpoint("list_posts", "GET", lambda: "/api/posts?limit=10"),
+        Endpoint("list_posts_category", "GET", lambda: f"/api/posts?category={rng.choice(categories)}"),
+        Endpoint("search_posts", "GET", lambda: f"/api/posts?search={rng.choice(dataset.WORDS)}"),
+        Endpoint("get_post", "GET", lambda: f"/api/posts/{posts.pick()['slug']}"),
+        Endpoint("related_posts", "GET", lambda: f"/api/posts/{posts.pick()['slug']}/related"),
+        Endpoint("post_comments", "GET", lambda: f"/api/posts/{posts.pick()['id']}/comments"),
+        Endpoint("post_likes", "GET", lambda: f"/api/posts/{posts.pick()['id']}/likes"),
+        Endpoint("view_post", "POST", lambda: f"/api/posts/{posts.pick()['id']}/view"),
+        Endpoint("categories", "GET", lambda: "/api/categories"),
+        Endpoint("user_activity", "GET", lambda: "/api/users/activity", auth="user"),
+        Endpoint("bookmarks", "GET", lambda: "/api/bookmarks", auth="user"),
+        Endpoint("admin_posts", "GET", lambda: "/api/admin/posts?limit=50", auth="admin"),
+        Endpoint("admin_comments", "GET", lambda: "/api/admin/comments?status=pending", auth="admin"),
+        Endpoint("admin_stats", "GET", lambda: "/api/admin/stats", auth="admin"),
+    ]
+
+
+def load_server(mongo_url: Optional[str], db_name: str, in_memory: bool):
+    """Import server.py configured for benchmarking (before it reads the environment)"""
+    os.environ.update({
+        "MONGO_URL": mongo_url or "mongodb://localhost:27017",
+        "DB_NAME": db_name,
+        "ADMIN_EMAILS": dataset.ADMIN_EMAIL,
+        "RATE_LIMIT_ENABLED": "false",
+        "SPAM_FILTER_ENABLED": "false",
+        "NEWSLETTER_ANNOUNCEMENTS": "false",
+    })
+    if in_memory:
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            sys.exit("❌ --in-memory necesita mongomock-motor: pip install mongomock-motor (o usa --mongo-url)")
+        import motor.motor_asyncio
+        motor.motor_asyncio.AsyncIOMotorClient = AsyncMongoMockClient
+    import server
+    return server
+
+
+async def measure(client, endpoint: Endpoint, headers: Dict[str, Optional[dict]],
+                  requests: int, concurrency: int, warmup: int) -> dict:
+    latencies: List[float] = []
+    errors = 0
+
+    async def worker(count: int, record: bool):
+        nonlocal errors
+        for _ in range(count):
+            started = time.perf_counter()
+            response = await client.request(endpoint.method, endpoint.path(), headers=headers[endpoint.auth])
+            elapsed = time.perf_counter() - started
+            if record:
+                latencies.append(elapsed)
+                errors += response.status_code >= 400
+
+    await worker(warmup, record=False)
+    shares = [requests // concurrency + (i < requests % concurrency) for i in range(concurrency)]
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(share, record=True) for share in shares))
+    return summarize(latencies, time.perf_counter() - started, errors)
+
+
+async def run(args) -> dict:
+    server = load_server(args.mongo_url, args.db_name, args.in_memory)
+    import httpx
+    logging.getLogger("httpx").setLevel(logging.WARNING)  # One INFO line per request otherwise
+
+    data = dataset.build(posts=args.posts, users=args.users, seed=args.seed)
+    await dataset.load(server.db, data)
+    await server.start_background_tasks()
+    await server.related_posts.rebuild()
+
+    headers = {
+        None: None,
+        "user": {"Authorization": f"Bearer {data['sessions'][1]['session_token']}"},
+        "admin": {"Authorization": f"Bearer {data['sessions'][0]['session_token']}"},
+    }
+    rng = random.Random(args.seed)
+    selected = set(args.endpoints.split(",")) if args.endpoints else None
+    results = {}
+    transport = httpx.ASGITransport(app=server.app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for endpoint in endpoints(data, rng):
+                if selected and endpoint.name not in selected:
+                    continue
+                results[endpoint.name] = await measure(
+                    client, endpoint, headers, args.requests, args.concurrency, args.warmup
+                )
+                print_row(endpoint.name, results[endpoint.name])
+    finally:
+        await server.shutdown_db_client()
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "database": "in-memory" if args.in_memory else "mongod",
+            "dataset": {"posts": args.posts, "users": args.users, "seed": args.seed,
+                        **{name: len(docs) for name, docs in data.items()}},
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+        },
+        "results": results,
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_row(name: str, result: dict):
+    errors = f"  ⚠️ {result['errors']} errors" if result["errors"] else ""
+    print(f"   {name:<22} {result['throughput_rps']:>8.1f} req/s   p50 {result['p50_ms']:>8.2f} ms   "
+          f"p95 {result['p95_ms']:>8.2f} ms   p99 {result['p99_ms']:>8.2f} ms{errors}")
+
+
+def compare(baseline: dict, current: dict, threshold: float = REGRESSION_THRESHOLD_PERCENT) -> List[Tuple[str, str, float]]:
+    """(endpoint, metric, % change) for every p95/p99 slowdown or throughput drop beyond threshold"""
+    regressions = []
+    for name, now in current["results"].items():
+        before = baseline["results"].get(name)
+        if not before:
+            continue
+        for metric, worse_if_higher in (("p95_ms", True), ("p99_ms", True), ("throughput_rps", False)):
+            if not before[metric]:
+                continue
+            change = (now[metric] - before[metric]) / before[metric] * 100
+            if (change if worse_if_higher else -change) > threshold:
+                regressions.append((name, metric, round(change, 1)))
+    return regressions
+
+
+def print_comparison(baseline: dict, current: dict, threshold: float) -> bool:
+    print(f"\n📊 Comparación con baseline ({baseline['meta'].get('commit') or 'sin commit'}):")
+    for name, now in current["results"].items():
+        before = baseline["results"].get(name)
+        if not before:
+            print(f"   {name:<22} (nuevo)")
+            continue
+        changes = "   ".join(
+            f"{metric} {before[metric]:.2f} → {now[metric]:.2f} ({_percent(before[metric], now[metric])})"
+            for metric in ("p50_ms", "p95_ms", "p99_ms", "throughput_rps")
+        )
+        print(f"   {name:<22} {changes}")
+    regressions = compare(baseline, current, threshold)
+    for name, metric, change in regressions:
+        print(f"   ❌ {name}: {metric} {change:+.1f}% (umbral {threshold}%)")
+    if not regressions:
+        print(f"   ✅ Sin regresiones por encima del {threshold}%")
+    return bool(regressions)
+
+
+def _percent(before: float, now: float) -> str:
+    return f"{(now - before) / before * 100:+.1f}%" if before else "n/a"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-url", help="mongod local, p.ej. mongodb://localhost:27017")
+    parser.add_argument("--in-memory", action="store_true", help="mongomock-motor en lugar de mongod")
+    parser.add_argument("--db-name", default="farchodev_blog_bench")
+    parser.add_argument("--posts", type=int, default=500)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--requests", type=int, default=500, help="requests medidas por endpoint")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--endpoints", help="lista separada por comas (por defecto todos)")
+    parser.add_argument("--save", help="guardar resultados como baseline JSON")
+    parser.add_argument("--compare", help="baseline JSON con el que comparar")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD_PERCENT)
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit 1 si hay regresiones")
+    args = parser.parse_args()
+
+    if not args.mongo_url and not args.in_memory:
+        parser.error("usa --mongo-url o --in-memory")
+    if "bench" not in args.db_name:
+        parser.error("--db-name debe contener 'bench': la base se borra en cada ejecución")
+
+    print(f"🏁 API benchmark ({args.requests} requests/endpoint, concurrency {args.concurrency})")
+    current = asyncio.run(run(args))
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.save) or ".", exist_ok=True)
+        with open(args.save, "w") as f:
+            json.dump(current, f, indent=2)
+        print(f"\n💾 Baseline guardado en {args.save}")
+    if args.compare:
+        with open(args.compare) as f:
+            regressed = print_comparison(json.load(f), current, args.threshold)
+        if regressed and args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Newsletter export benchmark (no database needed)
+Ejecutar (desde backend/): python -m benchmarks.bench_export --rows 1000000 --format csv
+"""
+import argparse
+import asyncio
+import resource
+import time
+from datetime import datetime, timezone, timedelta
+
+import newsletter
+
+
+async def fake_cursor(rows: int):
+    """Yields documents shaped like db.newsletter, like an async Motor cursor"""
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    for i in range(rows):
+        yield {
+            "email": f"subscriber{i}@example.com",
+            "subscribed_at": (start + timedelta(seconds=i)).isoformat(),
+            "active": i % 10 != 0,
+        }
+
+
+async def run(rows: int, export_format: str, batch_size: int):
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    first_chunk_at = None
+    chunks = 0
+    total_bytes = 0
+    largest_chunk = 0
+    async for chunk in newsletter.export_chunks(export_format, fake_cursor(rows), batch_size):
+        if first_chunk_at is None:
+            first_chunk_at = time.perf_counter() - started
+        size = len(chunk.encode() if isinstance(chunk, str) else chunk)
+        chunks += 1
+        total_bytes += size
+        largest_chunk = max(largest_chunk, size)
+    elapsed = time.perf_counter() - started
+    rss_growth = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) / 1024
+
+    print(f"format={export_format} rows={rows:,} batch={batch_size}")
+    print(f"   total:        {elapsed:.2f}s ({rows / elapsed:,.0f} rows/s)")
+    print(f"   first chunk:  {first_chunk_at * 1000:.1f} ms")
+    print(f"   output:       {total_bytes / 1e6:.1f} MB in {chunks} chunks (largest {largest_chunk / 1e3:.0f} KB)")
+    print(f"   peak RSS growth: {rss_growth:.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--format", choices=sorted(newsletter.EXPORT_FORMATS), default="csv")
+    parser.add_argument("--batch-size", type=int, default=newsletter.EXPORT_BATCH_SIZE)
+    args = parser.parse_args()
+    asyncio.run(run(args.rows, args.format, args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Build-time benchmark for the related posts recommender
+Ejecutar (desde backend/): python -m benchmarks.bench_related --sizes 1000,10000,50000
+"""
+import argparse
+import time
+import resource
+
+import numpy as np
+
+from related import RelatedIndex, N_FEATURES, TOP_K
+
+
+def synthetic_posts(n: int, seed: int = 42, vocabulary: int = 20000, topics: int = 50):
+    """Posts whose words come from a few Zipf-distributed topic vocabularies"""
+    rng = np.random.default_rng(seed)
+    words = np.array([f"w{i}" for i in range(vocabulary)])
+    topic_offsets = rng.integers(0, vocabulary, size=topics)
+    posts = []
+    for i in range(n):
+        topic = int(rng.integers(topics))
+        length = int(rng.integers(300, 1500))
+        ranks = np.minimum(rng.zipf(1.3, size=length), vocabulary) - 1
+        content = " ".join(words[(ranks + topic_offsets[topic]) % vocabulary])
+        posts.append({
+            "id": f"post-{i}",
+            "slug": f"post-{i}",
+            "title": " ".join(words[(ranks[:6] + topic_offsets[topic]) % vocabulary]),
+            "excerpt": "",
+            "category": f"cat-{topic % 8}",
+            "tags": [f"topic-{topic}", f"tag-{int(rng.integers(200))}"],
+            "content": content,
+        })
+    return posts
+
+
+def run(size: int, n_features: int, k: int):
+    posts = synthetic_posts(size + 1)
+    index = RelatedIndex(n_features=n_features, k=k)
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    index.build(posts[:size])
+    build_seconds = time.perf_counter() - started
+    # ru_maxrss is in KB on Linux; growth of the peak is an upper bound for the build
+    peak = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) * 1024
+
+    started = time.perf_counter()
+    changed = index.upsert(posts[size])
+    upsert_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    index.remove(posts[size]["id"])
+    remove_ms = (time.perf_counter() - started) * 1000
+
+    print(
+        f"{size:>7} posts | build {build_seconds:7.2f}s | peak +{peak / 1e6:7.1f} MB | "
+        f"matrix {index.matrix.nbytes / 1e6:7.1f} MB | upsert {upsert_ms:7.1f} ms "
+        f"({len(changed)} rows) | remove {remove_ms:7.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="1000,5000,10000,50000")
+    parser.add_argument("--features", type=int, default=N_FEATURES)
+    parser.add_argument("--k", type=int, default=TOP_K)
+    args = parser.parse_args()
+
+    print(f"Related posts build benchmark (features={args.features}, k={args.k})")
+    for size in (int(s) for s in args.sizes.split(",")):
+        run(size, args.features, args.k)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+"""
+Synthetic blog dataset, from a few hundred documents to millions
+Deterministic for a given seed: the same Spec always produces the same
+documents, ids included, so runs on different commits are comparable
+(session expiry dates are the exception: they are relative to now so
+that sessions stay usable).
+
+Shapes follow what the API writes (ISO strings for posts/comments/
+newsletter dates, datetimes for users/sessions). Post bodies are Markdown
+with log-normal lengths, rendered like the API does (content_html, toc).
+Engagement is skewed the way real traffic is: likes, bookmarks and
+comments go to posts and come from users by Zipf rank, so a few posts and
+a few users account for most of it.
+
+Use benchmarks/generate_data.py to write a dataset to MongoDB.
+"""
+import asyncio
+import math
+import multiprocessing
+import random
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, fields
+from datetime import datetime, timezone, timedelta
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from pymongo import InsertOne
+
+import render
+import stats
+
+BASE_DATE = datetime(2023, 1, 1, tzinfo=timezone.utc)
+DAYS_OF_HISTORY = 730
+ZIPF_EXPONENT = 1.1
+RENDER_CHUNK = 256  # Posts generated, then rendered in parallel, per round
+CATEGORIES = ["backend", "frontend", "devops", "python", "javascript", "databases", "career", "tutorials"]
+TAGS = ["fastapi", "react", "mongodb", "docker", "testing", "performance", "asyncio", "css", "typescript",
+        "kubernetes", "security", "linux", "git", "api", "tips", "pandas", "numpy", "redis", "nginx", "ci"]
+WORDS = ("el la de que y en un una para con por los las datos código servidor cliente función "
+         "consulta índice proceso memoria cache request respuesta async await python react mongo "
+         "rendimiento latencia usuario post blog ejemplo prueba error valor lista objeto clase").split()
+CODE_SAMPLES = [
+    "```python\n@app.get(\"/items/{item_id}\")\nasync def read_item(item_id: int):\n    return {\"id\": item_id}\n```",
+    "```javascript\nconst res = await fetch(`${API}/posts`);\nconst posts = await res.json();\n```",
+    "```bash\ndocker compose up -d\ncurl -s localhost:8001/api/health | jq\n```",
+    "```json\n{\"status\": \"ok\", \"items\": [1, 2, 3]}\n```",
+]
+# Insertion order: parents before the documents that reference them
+COLLECTIONS = ["users", "sessions", "categories", "posts", "comments", "post_likes", "bookmarks", "newsletter"]
+ADMIN_EMAIL = "admin@bench.local"
+
+
+@dataclass
+class Spec:
+    """How many documents of each kind to generate"""
+    users: int = 50_000
+    posts: int = 10_000
+    comments: int = 300_000
+    likes: int = 400_000
+    bookmarks: int = 100_000
+    subscribers: int = 90_000
+    active_sessions_ratio: float = 0.7
+    seed: int = 42
+
+    @classmethod
+    def scaled(cls, total: int, seed: int = 42) -> "Spec":
+        """Default proportions resized to roughly `total` documents"""
+        default = cls()
+        factor = total / default.total()
+        counts = {f.name: max(1, round(getattr(default, f.name) * factor))
+                  for f in fields(cls) if f.type in (int, "int") and f.name != "seed"}
+        return cls(**counts, seed=seed)
+
+    def total(self) -> int:
+        # Sessions: one per user
+        return 2 * self.users + self.posts + self.comments + self.likes + self.bookmarks + self.subscribers
+
+
+class Generator:
+    def __init__(self, spec: Spec, render_workers: int = 0):
+        self.spec = spec
+        # Rendering (~4 ms per post) dominates generation; > 0 spreads it over processes
+        self.render_workers = render_workers
+        self.rng = random.Random(spec.seed)
+        self.np_rng = np.random.default_rng(spec.seed)
+        self.user_ids: List[str] = []
+        self.user_names: List[str] = []
+        self.user_emails: List[str] = []
+        self.post_ids: List[str] = []
+        self.post_dates: List[datetime] = []
+        # population name -> (rank -> item permutation, Zipf probabilities)
+        self._popularity: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+
+    def uuid(self) -> str:
+        return str(uuid.UUID(int=self.rng.getrandbits(128), version=4))
+
+    def sentence(self, words: int) -> str:
+        return " ".join(self.rng.choices(WORDS, k=words)).capitalize() + "."
+
+    def markdown(self) -> str:
+        # Log-normal length: median ~900 words, long tail up to ~6000
+        target = min(6000, max(150, int(self.np_rng.lognormal(math.log(900), 0.6))))
+        parts, words = [], 0
+        while words < target:
+            parts.append(f"## {self.sentence(self.rng.randint(2, 6))[:-1]}")
+            for _ in range(self.rng.randint(2, 5)):
+                paragraph = " ".join(self.sentence(self.rng.randint(8, 24)) for _ in range(self.rng.randint(2, 6)))
+                words += paragraph.count(" ") + 1
+                parts.append(paragraph)
+            roll = self.rng.random()
+            if roll < 0.4:
+                parts.append(self.rng.choice(CODE_SAMPLES))
+            elif roll < 0.6:
+                parts.append("\n".join(f"- {self.sentence(self.rng.randint(3, 8))}" for _ in range(self.rng.randint(2, 5))))
+            elif roll < 0.7:
+                parts.append(f"Más en [la documentación](https://example.com/docs/{self.rng.randint(1, 999)}).")
+        return "\n\n".join(parts)
+
+    def zipf_indexes(self, population: str, size: int) -> np.ndarray:
+        """`size` indexes into "posts" or "users", rank r chosen ∝ 1/r^s
+
+        Ranks map to items through one permutation per population, drawn on
+        first use, so the same posts and users are popular in every collection.
+        """
+        count = len(self.post_ids if population == "posts" else self.user_ids)
+        order, probabilities = self._popularity.get(population, (None, None))
+        if order is None or len(order) != count:
+            weights = 1.0 / np.arange(1, count + 1) ** ZIPF_EXPONENT
+            order, probabilities = self.np_rng.permutation(count), weights / weights.sum()
+            self._popularity[population] = (order, probabilities)
+        return order[self.np_rng.choice(count, size=size, p=probabilities)]
+
+    def date_after(self, start: datetime) -> datetime:
+        end = BASE_DATE + timedelta(days=DAYS_OF_HISTORY)
+        span = max((end - start).total_seconds(), 1.0)
+        return start + timedelta(seconds=self.rng.random() * span)
+
+    # Collections -----------------------------------------------------------
+
+    def users(self) -> Iterator[dict]:
+        for i in range(self.spec.users):
+            created = BASE_DATE + timedelta(seconds=self.rng.random() * DAYS_OF_HISTORY * 86400)
+            user_id, email, name = self.uuid(), ADMIN_EMAIL if i == 0 else f"user{i}@bench.local", f"User {i}"
+            self.user_ids.append(user_id)
+            self.user_emails.append(email)
+            self.user_names.append(name)
+            yield {
+                "id": user_id, "email": email, "name": name, "password_hash": None, "picture": None,
+                "role": "admin" if i == 0 else "user", "provider": self.rng.choice(["github", "google"]),
+                "created_at": created, "last_login": self.date_after(created),
+            }
+
+    def sessions(self) -> Iterator[dict]:
+        now = datetime.now(timezone.utc)
+        for i, user_id in enumerate(self.user_ids):
+            # The first sessions (admin and user 1 included) are always valid: benchmarks log in with them
+            active = i < 2 or self.rng.random() < self.spec.active_sessions_ratio
+            expires_at = now + timedelta(days=7) if active else now - timedelta(days=self.rng.randint(1, 30))
+            yield {
+                "id": self.uuid(), "user_id": user_id, "session_token": f"bench-session-{i}",
+                "provider": "github", "expires_at": expires_at, "created_at": expires_at - timedelta(days=7),
+            }
+
+    def categories(self) -> Iterator[dict]:
+        for name in CATEGORIES:
+            yield {"id": self.uuid(), "name": name.capitalize(), "slug": name, "description": None,
+                   "created_at": BASE_DATE.isoformat()}
+
+    def post(self, i: int) -> dict:
+        created = BASE_DATE + timedelta(seconds=DAYS_OF_HISTORY * 86400 * i / self.spec.posts)
+        content = self.markdown()
+        published = self.rng.random() < 0.9
+        post_id = self.uuid()
+        self.post_ids.append(post_id)
+        self.post_dates.append(created)
+        return {
+            "id": post_id, "title": f"Post {i}: {self.sentence(5)[:-1]}", "slug": f"post-{i}",
+            "content": content, "excerpt": self.sentence(25), "author": "FarchoDev",
+            "featured_image_url": None, "category": self.rng.choice(CATEGORIES),
+            "tags": self.rng.sample(TAGS, self.rng.randint(1, 5)), "published": published,
+            "published_at": created.isoformat() if published else None,
+            "created_at": created.isoformat(), "updated_at": created.isoformat(),
+            "views_count": int(self.np_rng.pareto(1.2) * 100), "reading_time": max(1, round(content.count(" ") / 200)),
+            "content_hash": render.content_hash(content), "render_version": render.RENDER_VERSION,
+        }
+
+    def posts(self) -> Iterator[dict]:
+        pool = None
+        if self.render_workers > 0:
+            pool = ProcessPoolExecutor(self.render_workers, mp_context=multiprocessing.get_context("spawn"))
+        try:
+            for first in range(0, self.spec.posts, RENDER_CHUNK):
+                chunk = [self.post(i) for i in range(first, min(first + RENDER_CHUNK, self.spec.posts))]
+                contents = [post["content"] for post in chunk]
+                rendered = pool.map(render.render_markdown, contents, chunksize=16) if pool else map(render.render_markdown, contents)
+                for post, fields_ in zip(chunk, rendered):
+                    post.update(fields_)
+                    yield post
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+    def comments(self) -> Iterator[dict]:
+        posts = self.zipf_indexes("posts", self.spec.comments)
+        users = self.zipf_indexes("users", self.spec.comments)
+        for post, user in zip(posts.tolist(), users.tolist()):
+            yield {
+                "id": self.uuid(), "post_id": self.post_ids[post], "user_id": self.user_ids[user],
+                "author_name": self.user_names[user], "author_email": self.user_emails[user],
+                "content": self.sentence(int(self.np_rng.integers(4, 60))),
+                "created_at": self.date_after(self.post_dates[post]).isoformat(),
+                "approved": self.rng.random() < 0.85,
+            }
+
+    def engagement(self, count: int) -> Iterator[dict]:
+        """Likes or bookmarks: unique (post, user) pairs, both sides Zipf-distributed"""
+        n_users = len(self.user_ids)
+        count = min(count, len(self.post_ids) * n_users)
+        keys = np.empty(0, dtype=np.int64)
+        # Popular pairs repeat; keep drawing until there are `count` distinct ones
+        while len(keys) < count:
+            draws = 2 * (count - len(keys))
+            new = self.zipf_indexes("posts", draws).astype(np.int64) * n_users \
+                + self.zipf_indexes("users", draws)
+            combined = np.concatenate([keys, new])
+            _, first = np.unique(combined, return_index=True)
+            keys = combined[np.sort(first)]
+        for key in keys[:count].tolist():
+            post, user = divmod(key, n_users)
+            yield {"id": self.uuid(), "post_id": self.post_ids[post], "user_id": self.user_ids[user],
+                   "created_at": self.date_after(self.post_dates[post]).isoformat()}
+
+    def newsletter(self) -> Iterator[dict]:
+        for i in range(self.spec.subscribers):
+            yield {"id": self.uuid(), "email": f"reader{i}@bench.local",
+                   "subscribed_at": (BASE_DATE + timedelta(seconds=self.rng.random() * DAYS_OF_HISTORY * 86400)).isoformat(),
+                   "active": self.rng.random() < 0.9}
+
+    def collections(self) -> Iterator[Tuple[str, Iterator[dict]]]:
+        """(collection, documents) in dependency order; consume each before the next"""
+        yield "users", self.users()
+        yield "sessions", self.sessions()
+        yield "categories", self.categories()
+        yield "posts", self.posts()
+        yield "comments", self.comments()
+        yield "post_likes", self.engagement(self.spec.likes)
+        yield "bookmarks", self.engagement(self.spec.bookmarks)
+        yield "newsletter", self.newsletter()
+
+
+def build(posts: int = 200, users: int = 100, seed: int = 42) -> Dict[str, List[dict]]:
+    """A small dataset in memory (for the in-process benchmark)"""
+    spec = Spec(users=users, posts=posts, comments=posts * 5, likes=posts * 3, bookmarks=posts * 3,
+                subscribers=users * 2, seed=seed)
+    return {name: list(docs) for name, docs in Generator(spec).collections()}
+
+
+def batches(docs: Iterable[dict], size: int) -> Iterator[List[dict]]:
+    batch = []
+    for doc in docs:
+        batch.append(doc)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def write(collection, docs: Iterable[dict], batch_size: int = 5000, parallel: int = 4,
+                progress: Optional[Callable[[int], None]] = None) -> int:
+    """Unordered bulk_write batches, up to `parallel` in flight while the next batch is generated
+
+    Every batch task is kept and awaited, so a failed batch stops the load
+    and its exception is raised from here.
+    """
+    slots = asyncio.Semaphore(parallel)
+    tasks = []
+    written = 0
+
+    async def flush(batch):
+        nonlocal written
+        try:
+            result = await collection.bulk_write([InsertOne(doc) for doc in batch], ordered=False)
+            written += result.inserted_count
+            if progress:
+                progress(result.inserted_count)
+        finally:
+            slots.release()
+
+    for batch in batches(docs, batch_size):
+        await slots.acquire()
+        if any(task.done() and task.exception() for task in tasks):
+            slots.release()
+            break
+        tasks.append(asyncio.create_task(flush(batch)))
+    await asyncio.gather(*tasks)
+    return written
+
+
+async def load(db, data: Dict[str, List[dict]]):
+    """Replace the benchmark collections with `data` and rebuild the stats counters"""
+    for name, docs in data.items():
+        await db[name].delete_many({})
+        if docs:
+            await write(db[name], [dict(doc) for doc in docs])
+    await stats.rebuild_stats(db)
@@ -0,0 +1,106 @@
+"""
+Write a synthetic blog dataset to MongoDB (see benchmarks/dataset.py)
+Ejecutar (desde backend/):
+    python -m benchmarks.generate_data --mongo-url mongodb://localhost:27017 --total 1000000
+    python -m benchmarks.generate_data --posts 20000 --users 100000 --comments 500000 --seed 7
+    python -m benchmarks.generate_data --total 100000 --dry-run     # solo cuenta y mide la generación
+
+The target database (--db-name) must contain "bench"; --drop empties its
+collections first.
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from benchmarks import dataset
+
+COUNT_OPTIONS = ("users", "posts", "comments", "likes", "bookmarks", "subscribers")
+
+
+class Progress:
+    def __init__(self, collection: str):
+        self.collection = collection
+        self.written = 0
+        self.started = time.perf_counter()
+        self._last_print = self.started
+
+    def __call__(self, inserted: int):
+        self.written += inserted
+        now = time.perf_counter()
+        if now - self._last_print > 1:
+            self._last_print = now
+            print(f"\r   {self.collection:<12} {self.written:>10,} docs", end="", flush=True)
+
+    def done(self):
+        elapsed = time.perf_counter() - self.started
+        rate = self.written / elapsed if elapsed else 0
+        print(f"\r   {self.collection:<12} {self.written:>10,} docs  {elapsed:7.1f}s  ({rate:,.0f} docs/s)")
+
+
+async def run(args, spec: dataset.Spec):
+    db = None
+    if not args.dry_run:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        client = AsyncIOMotorClient(args.mongo_url)
+        db = client[args.db_name]
+    started = time.perf_counter()
+    total = 0
+    try:
+        for name, docs in dataset.Generator(spec, args.workers).collections():
+            progress = Progress(name)
+            if db is None:
+                for _ in docs:
+                    progress(1)
+            else:
+                if args.drop:
+                    await db[name].delete_many({})
+                await dataset.write(db[name], docs, args.batch_size, args.parallel, progress)
+            progress.done()
+            total += progress.written
+        if db is not None:
+            counters = await dataset.stats.rebuild_stats(db)
+            print(f"📊 Contadores de db.stats recalculados: {counters}")
+            if args.related:
+                from related import RelatedPosts
+                print(f"🔗 Relacionados recalculados: {await RelatedPosts(db).rebuild()} posts")
+    finally:
+        if db is not None:
+            client.close()
+    elapsed = time.perf_counter() - started
+    print(f"\n✅ {total:,} documentos en {elapsed:.1f}s ({total / elapsed:,.0f} docs/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-url", default="mongodb://localhost:27017")
+    parser.add_argument("--db-name", default="farchodev_blog_bench")
+    parser.add_argument("--total", type=int, help="documentos aproximados, con las proporciones por defecto")
+    for name in COUNT_OPTIONS:
+        parser.add_argument(f"--{name}", type=int, help=f"número de {name} (ignora --total para este campo)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--parallel", type=int, default=4, help="bulk_write simultáneos")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="procesos para renderizar el Markdown de los posts (0: en este proceso)")
+    parser.add_argument("--drop", action="store_true", help="vaciar las colecciones antes de escribir")
+    parser.add_argument("--related", action="store_true", help="recalcular posts relacionados al final")
+    parser.add_argument("--dry-run", action="store_true", help="generar sin escribir en MongoDB")
+    args = parser.parse_args()
+
+    if "bench" not in args.db_name:
+        parser.error("--db-name debe contener 'bench' para no escribir sobre una base real")
+
+    spec = dataset.Spec.scaled(args.total, args.seed) if args.total else dataset.Spec(seed=args.seed)
+    for name in COUNT_OPTIONS:
+        if getattr(args, name) is not None:
+            setattr(spec, name, getattr(args, name))
+
+    print(f"🧪 Dataset sintético (seed={spec.seed}) → {'dry run' if args.dry_run else args.db_name}")
+    print("   " + ", ".join(f"{name}={getattr(spec, name):,}" for name in COUNT_OPTIONS)
+          + f", sessions={spec.users:,} (~{spec.total():,} docs)")
+    asyncio.run(run(args, spec))
+
+
+if __name__ == "__main__":
+    main()
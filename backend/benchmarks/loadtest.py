@@ -0,0 +1,491 @@
+"""
+Load test against a running server: replays a mix of anonymous browsing,
+authenticated engagement and admin traffic, and reports latency
+percentiles per action.
+
+Two modes:
+- open (default): requests start at a constant rate (--rate) whether or
+  not earlier ones finished, like real users. Latency is measured from the
+  moment each request *should* have started, so a stalled server shows up
+  in the percentiles instead of silently slowing the test down
+  (coordinated omission).
+- closed: --concurrency users each send a request, wait for the answer,
+  think for --think-ms and repeat. Raw latencies hide stalls; with --rate
+  as the expected throughput, the corrected histogram adds the requests
+  that a stall prevented (HdrHistogram's recordValueWithExpectedInterval).
+
+Ejecutar (desde backend/), con la base cargada por benchmarks/generate_data.py
+y el servidor arrancado con RATE_LIMIT_ENABLED=false y SPAM_FILTER_ENABLED=false:
+    python -m benchmarks.loadtest --url http://localhost:8001 --rate 200 --duration 60
+    python -m benchmarks.loadtest --mode closed --concurrency 50 --think-ms 100 --rate 400
+    python -m benchmarks.loadtest --mix anonymous=70,engaged=25,admin=5 --save load.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks import bench_api, dataset
+
+DEFAULT_MIX = "anonymous=85,engaged=12,admin=3"
+PERCENTILES = (50, 90, 95, 99, 99.9)
+MIN_LATENCY = 1e-6  # Lowest bucket, 1 µs
+BUCKET_GROWTH = 1.01  # Each bucket 1% wider than the previous: ~1% error on any percentile
+
+
+class LatencyHistogram:
+    """Log-bucketed latencies (HdrHistogram-style): constant memory, ~1% precision"""
+
+    def __init__(self):
+        self.counts: Counter = Counter()
+        self.total = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float, count: int = 1):
+        bucket = max(0, math.ceil(math.log(max(seconds, MIN_LATENCY) / MIN_LATENCY, BUCKET_GROWTH)))
+        self.counts[bucket] += count
+        self.total += count
+        self.sum += seconds * count
+        self.max = max(self.max, seconds)
+
+    def record_corrected(self, seconds: float, expected_interval: float):
+        """Record, plus the samples a stall of `seconds` kept from being sent every `expected_interval`"""
+        self.record(seconds)
+        if expected_interval <= 0:
+            return
+        missing = seconds - expected_interval
+        while missing >= expected_interval:
+            self.record(missing)
+            missing -= expected_interval
+
+    def percentile(self, p: float) -> float:
+        if not self.total:
+            return 0.0
+        rank = max(1, math.ceil(self.total * p / 100))
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                return min(MIN_LATENCY * BUCKET_GROWTH ** bucket, self.max)
+        return self.max
+
+    def merge(self, other: "LatencyHistogram"):
+        self.counts.update(other.counts)
+        self.total += other.total
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+
+
+def _percentile_key(p: float) -> str:
+    return f"p{str(p).replace('.', '')}_ms"
+
+
+class ActionStats:
+    def __init__(self):
+        self.latency = LatencyHistogram()  # What users saw (corrected)
+        self.service = LatencyHistogram()  # Send to response, as the client measured it
+        self.statuses: Counter = Counter()
+
+    def merge(self, other: "ActionStats"):
+        self.latency.merge(other.latency)
+        self.service.merge(other.service)
+        self.statuses.update(other.statuses)
+
+    def summary(self, wall_seconds: float) -> dict:
+        requests = sum(self.statuses.values())
+        return {
+            "requests": requests,
+            "errors": sum(count for status, count in self.statuses.items() if not 200 <= status < 400),
+            "throughput_rps": round(requests / wall_seconds, 1) if wall_seconds else 0.0,
+            "mean_ms": round(self.latency.sum / self.latency.total * 1000, 3) if self.latency.total else 0.0,
+            **{_percentile_key(p): round(self.latency.percentile(p) * 1000, 3) for p in PERCENTILES},
+            "max_ms": round(self.latency.max * 1000, 3),
+            "service_p99_ms": round(self.service.percentile(99) * 1000, 3),
+            "statuses": {str(status): count for status, count in sorted(self.statuses.items())},
+        }
+
+
+class PairState:
+    """(user token, post id) pairs known to be liked (or bookmarked) during the run
+
+    Like/unlike pick their pair by state, so each sample is exactly one
+    request against a pair in the state that request expects.
+    """
+
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+        self._pairs: List[Tuple[str, str]] = []
+        self._index: Dict[Tuple[str, str], int] = {}
+
+    def __contains__(self, pair: Tuple[str, str]) -> bool:
+        return pair in self._index
+
+    def __len__(self) -> int:
+        return len(self._pairs)
+
+    def add(self, pair: Tuple[str, str]):
+        if pair not in self._index:
+            self._index[pair] = len(self._pairs)
+            self._pairs.append(pair)
+
+    def pop(self) -> Optional[Tuple[str, str]]:
+        """Remove and return a random pair (swap with the last: O(1))"""
+        if not self._pairs:
+            return None
+        i = self.rng.randrange(len(self._pairs))
+        pair, last = self._pairs[i], self._pairs[-1]
+        self._pairs[i], self._index[last] = last, i
+        self._pairs.pop()
+        del self._index[pair]
+        return pair
+
+
+class Traffic:
+    """What the actions need: posts to visit, users to act as, the admin"""
+
+    def __init__(self, posts: List[dict], user_tokens: List[str], admin_token: Optional[str], rng: random.Random):
+        self.posts = bench_api.ZipfPicker(posts, rng)
+        self.user_tokens = user_tokens
+        self.admin_headers = {"Authorization": f"Bearer {admin_token}"} if admin_token else None
+        self.rng = rng
+        self.liked = PairState(rng)
+        self.bookmarked = PairState(rng)
+
+    def user_headers(self, token: Optional[str] = None) -> dict:
+        return {"Authorization": f"Bearer {token or self.rng.choice(self.user_tokens)}"}
+
+    def pair(self, exclude: PairState, tries: int = 5) -> Tuple[str, str]:
+        """A (token, post id) pair, preferring one not already in `exclude`"""
+        for _ in range(tries):
+            pair = (self.rng.choice(self.user_tokens), self.posts.pick()["id"])
+            if pair not in exclude:
+                break
+        return pair
+
+
+async def list_posts(client, traffic: Traffic):
+    return await client.get("/api/posts", params={"limit": 10, "skip": traffic.rng.choice((0, 0, 0, 10, 20))})
+
+
+async def get_post(client, traffic: Traffic):
+    return await client.get(f"/api/posts/{traffic.posts.pick()['slug']}")
+
+
+async def view_post(client, traffic: Traffic):
+    return await client.post(f"/api/posts/{traffic.posts.pick()['id']}/view")
+
+
+async def like(client, traffic: Traffic):
+    token, post_id = pair = traffic.pair(traffic.liked)
+    response = await client.post(f"/api/posts/{post_id}/like", headers=traffic.user_headers(token))
+    if response.status_code < 300 or response.status_code == 400:  # 400: liked before this run
+        traffic.liked.add(pair)
+    return response
+
+
+async def unlike(client, traffic: Traffic):
+    # Without a known like (start of the run), whatever pair comes up is tried
+    token, post_id = traffic.liked.pop() or traffic.pair(traffic.liked)
+    return await client.delete(f"/api/posts/{post_id}/like", headers=traffic.user_headers(token))
+
+
+async def bookmark(client, traffic: Traffic):
+    token, post_id = pair = traffic.pair(traffic.bookmarked)
+    response = await client.post("/api/bookmarks", json={"post_id": post_id}, headers=traffic.user_headers(token))
+    if response.status_code < 300 or response.status_code == 400:
+        traffic.bookmarked.add(pair)
+    return response
+
+
+async def unbookmark(client, traffic: Traffic):
+    token, post_id = traffic.bookmarked.pop() or traffic.pair(traffic.bookmarked)
+    return await client.delete(f"/api/bookmarks/{post_id}", headers=traffic.user_headers(token))
+
+
+async def comment(client, traffic: Traffic):
+    content = " ".join(traffic.rng.choices(dataset.WORDS, k=traffic.rng.randint(5, 40)))
+    return await client.post("/api/comments", json={"post_id": traffic.posts.pick()["id"], "content": content},
+                             headers=traffic.user_headers())
+
+
+async def admin_posts(client, traffic: Traffic):
+    return await client.get("/api/admin/posts", params={"limit": 50}, headers=traffic.admin_headers)
+
+
+async def admin_comments(client, traffic: Traffic):
+    return await client.get("/api/admin/comments", params={"status": "pending"}, headers=traffic.admin_headers)
+
+
+async def admin_stats(client, traffic: Traffic):
+    return await client.get("/api/admin/stats", headers=traffic.admin_headers)
+
+
+@dataclass
+class Action:
+    name: str
+    group: str
+    weight: float  # Within its group
+    run: Callable[..., Awaitable]
+
+
+ACTIONS = [
+    Action("list_posts", "anonymous", 30, list_posts),
+    Action("get_post", "anonymous", 45, get_post),
+    Action("view_post", "anonymous", 25, view_post),
+    Action("like", "engaged", 30, like),
+    Action("unlike", "engaged", 15, unlike),
+    Action("bookmark", "engaged", 25, bookmark),
+    Action("unbookmark", "engaged", 10, unbookmark),
+    Action("comment", "engaged", 20, comment),
+    Action("admin_posts", "admin", 40, admin_posts),
+    Action("admin_comments", "admin", 30, admin_comments),
+    Action("admin_stats", "admin", 30, admin_stats),
+]
+GROUPS = sorted({action.group for action in ACTIONS})
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """'anonymous=85,engaged=12,admin=3' → share of traffic per group"""
+    mix = {}
+    for part in spec.split(","):
+        name, _, share = part.partition("=")
+        name = name.strip()
+        if name not in GROUPS:
+            raise ValueError(f"Unknown traffic group '{name}' (expected one of {', '.join(GROUPS)})")
+        try:
+            mix[name] = float(share)
+        except ValueError:
+            raise ValueError(f"Invalid share for '{name}': '{share}'")
+        if mix[name] < 0:
+            raise ValueError(f"Share for '{name}' must not be negative")
+    if not sum(mix.values()):
+        raise ValueError("The traffic mix is empty")
+    return mix
+
+
+def action_weights(mix: Dict[str, float]) -> Tuple[List[Action], List[float]]:
+    """Every action's probability: its group's share times its weight within the group"""
+    actions, weights = [], []
+    for group, share in mix.items():
+        members = [action for action in ACTIONS if action.group == group]
+        group_weight = sum(action.weight for action in members)
+        for action in members:
+            actions.append(action)
+            weights.append(share * action.weight / group_weight)
+    return actions, weights
+
+
+class LoadTest:
+    def __init__(self, client, traffic: Traffic, mix: Dict[str, float], warmup: float):
+        self.client = client
+        self.traffic = traffic
+        self.actions, self.weights = action_weights(mix)
+        self.warmup = warmup
+        self.stats: Dict[str, ActionStats] = {action.name: ActionStats() for action in self.actions}
+        self.started = 0.0
+
+    def pick(self) -> Action:
+        return self.traffic.rng.choices(self.actions, weights=self.weights)[0]
+
+    async def call(self, action: Action) -> int:
+        try:
+            response = await action.run(self.client, self.traffic)
+            return response.status_code
+        except httpx.HTTPError:
+            return 0  # Connection refused, timeout...: counted as an error
+
+    def measuring(self, intended: float) -> bool:
+        return intended >= self.started + self.warmup
+
+    async def open_loop(self, rate: float, duration: float, max_in_flight: int):
+        interval = 1 / rate
+        slots = asyncio.Semaphore(max_in_flight)
+        pending = set()
+
+        async def fire(action: Action, intended: float):
+            async with slots:  # Waiting for a slot counts as latency: it starts at `intended`
+                sent = time.perf_counter()
+                status = await self.call(action)
+            done = time.perf_counter()
+            if self.measuring(intended):
+                stats = self.stats[action.name]
+                stats.latency.record(done - intended)
+                stats.service.record(done - sent)
+                stats.statuses[status] += 1
+
+        self.started = time.perf_counter()
+        for i in range(int((self.warmup + duration) * rate)):
+            intended = self.started + i * interval
+            delay = intended - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            task = asyncio.create_task(fire(self.pick(), intended))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+        await asyncio.gather(*pending)
+
+    async def closed_loop(self, concurrency: int, duration: float, think: float, rate: Optional[float]):
+        # Each user is expected to start a request every concurrency/rate seconds
+        expected_interval = concurrency / rate if rate else 0.0
+
+        async def user():
+            while True:
+                sent = time.perf_counter()
+                if sent >= deadline:
+                    return
+                action = self.pick()
+                status = await self.call(action)
+                elapsed = time.perf_counter() - sent
+                if self.measuring(sent):
+                    stats = self.stats[action.name]
+                    stats.latency.record_corrected(elapsed, expected_interval)
+                    stats.service.record(elapsed)
+                    stats.statuses[status] += 1
+                if think:
+                    await asyncio.sleep(think * self.traffic.rng.uniform(0.5, 1.5))
+
+        self.started = time.perf_counter()
+        deadline = self.started + self.warmup + duration
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+
+    def results(self, duration: float) -> Dict[str, dict]:
+        results = {name: stats.summary(duration) for name, stats in self.stats.items() if stats.statuses}
+        total = ActionStats()
+        for stats in self.stats.values():
+            total.merge(stats)
+        results["total"] = total.summary(duration)
+        return results
+
+
+async def discover(client, max_posts: int, users: int, admin_token: Optional[str]) -> Tuple[List[dict], List[str]]:
+    """Published posts (newest first, so Zipf rank follows recency) and the session tokens that are valid"""
+    posts = []
+    while len(posts) < max_posts:
+        response = await client.get("/api/posts", params={"skip": len(posts), "limit": min(100, max_posts - len(posts))})
+        response.raise_for_status()
+        page = response.json()
+        posts.extend({"id": post["id"], "slug": post["slug"]} for post in page)
+        if not page:
+            break
+    candidates = [f"bench-session-{i}" for i in range(1, users + 1)]
+    checks = await asyncio.gather(*(
+        client.get("/api/auth/me", headers={"Authorization": f"Bearer {token}"}) for token in candidates
+    ))
+    tokens = [token for token, response in zip(candidates, checks) if response.status_code == 200]
+    if admin_token:
+        response = await client.get("/api/admin/stats", headers={"Authorization": f"Bearer {admin_token}"})
+        if response.status_code != 200:
+            raise RuntimeError(f"--admin-token is not an admin session (HTTP {response.status_code})")
+    return posts, tokens
+
+
+async def run(args) -> dict:
+    mix = parse_mix(args.mix)
+    in_flight = args.max_in_flight if args.mode == "open" else args.concurrency
+    limits = httpx.Limits(max_connections=in_flight, max_keepalive_connections=in_flight)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout) as client:
+        posts, tokens = await discover(client, args.posts, args.users, args.admin_token if mix.get("admin") else None)
+        if not posts:
+            raise RuntimeError("No published posts: load a dataset first (python -m benchmarks.generate_data)")
+        if mix.get("engaged") and not tokens:
+            raise RuntimeError("No valid bench-session-N tokens: load a dataset first, or drop 'engaged' from --mix")
+        print(f"   {len(posts)} posts, {len(tokens)} usuarios con sesión válida")
+
+        test = LoadTest(client, Traffic(posts, tokens, args.admin_token, random.Random(args.seed)), mix, args.warmup)
+        if args.mode == "open":
+            await test.open_loop(args.rate, args.duration, args.max_in_flight)
+        else:
+            await test.closed_loop(args.concurrency, args.duration, args.think_ms / 1000, args.rate)
+
+    return {
+        "meta": {
+            "commit": bench_api.git_commit(),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "url": args.url,
+            "mode": args.mode,
+            "rate": args.rate,
+            "concurrency": args.concurrency if args.mode == "closed" else args.max_in_flight,
+            "duration": args.duration,
+            "mix": mix,
+        },
+        "results": test.results(args.duration),
+    }
+
+
+def print_results(results: Dict[str, dict]):
+    header = "".join(f"{'p' + str(p):>10}" for p in PERCENTILES)
+    print(f"\n   {'action':<16}{'req':>8}{'req/s':>9}{header}{'max':>10}  (ms)")
+    for name, result in results.items():
+        row = "".join(f"{result[_percentile_key(p)]:>10.2f}" for p in PERCENTILES)
+        errors = f"  ⚠️ {result['errors']} errores {result['statuses']}" if result["errors"] else ""
+        print(f"   {name:<16}{result['requests']:>8}{result['throughput_rps']:>9.1f}{row}{result['max_ms']:>10.2f}{errors}")
+    total = results["total"]
+    print(f"\n   p99 visto por los usuarios {total['p99_ms']:.2f} ms, medido por el cliente {total['service_p99_ms']:.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8001")
+    parser.add_argument("--mode", choices=("open", "closed"), default="open")
+    parser.add_argument("--rate", type=float, help="open: requests/s (obligatorio); closed: throughput esperado, "
+                                                   "activa la corrección de coordinated omission")
+    parser.add_argument("--concurrency", type=int, default=20, help="closed: usuarios simultáneos")
+    parser.add_argument("--think-ms", type=float, default=0, help="closed: pausa media entre requests de un usuario")
+    parser.add_argument("--max-in-flight", type=int, default=500, help="open: límite de requests abiertas")
+    parser.add_argument("--duration", type=float, default=30, help="segundos medidos")
+    parser.add_argument("--warmup", type=float, default=5, help="segundos iniciales sin medir")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"reparto del tráfico (por defecto {DEFAULT_MIX})")
+    parser.add_argument("--posts", type=int, default=1000, help="posts publicados entre los que repartir visitas")
+    parser.add_argument("--users", type=int, default=200, help="sesiones bench-session-1..N a usar")
+    parser.add_argument("--admin-token", default="bench-session-0")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--save", help="guardar resultados en JSON")
+    parser.add_argument("--compare", help="resultados JSON anteriores con los que comparar")
+    parser.add_argument("--threshold", type=float, default=bench_api.REGRESSION_THRESHOLD_PERCENT)
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit 1 si hay regresiones")
+    args = parser.parse_args()
+
+    if args.mode == "open" and not args.rate:
+        parser.error("--mode open necesita --rate")
+    try:
+        parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+
+    target = f"{args.rate:g} req/s" if args.mode == "open" else f"{args.concurrency} usuarios"
+    print(f"🚦 Load test {args.mode}-loop contra {args.url}: {target}, {args.duration:g}s (+{args.warmup:g}s warmup), "
+          f"mix {args.mix}")
+    try:
+        current = asyncio.run(run(args))
+    except httpx.HTTPError as e:
+        sys.exit(f"❌ No se pudo hablar con {args.url}: {e}")
+    except RuntimeError as e:
+        sys.exit(f"❌ {e}")
+    print_results(current["results"])
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.save) or ".", exist_ok=True)
+        with open(args.save, "w") as f:
+            json.dump(current, f, indent=2)
+        print(f"\n💾 Resultados guardados en {args.save}")
+    if args.compare:
+        with open(args.compare) as f:
+            regressed = bench_api.print_comparison(json.load(f), current, args.threshold)
+        if regressed and args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+Cascading post deletion for FarchoDev Blog
+Deleting a post writes a tombstone in db.post_tombstones and queues a
+"posts.cascade_delete" job that removes the post's likes, bookmarks,
+comments and visitor sketches in batches. The tombstone records progress
+and is re-queued on startup, so an interrupted cascade always finishes;
+finished tombstones expire after TOMBSTONE_RETENTION_DAYS.
+
+The orphan sweeper finds dependents whose post no longer exists (e.g. from
+deletions made before the cascade existed) and removes them.
+
+Ejecutar:
+    python cascade.py --sweep [--dry-run] [--compact]
+"""
+import asyncio
+import os
+import sys
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple
+
+import jobs
+import stats
+import visitors
+
+DELETE_BATCH_SIZE = 1000
+SWEEP_LOOKUP_BATCH = 1000
+TOMBSTONE_RETENTION_DAYS = 30
+
+# (collection, field holding the post id)
+DEPENDENTS: Tuple[Tuple[str, str], ...] = (
+    ("post_likes", "post_id"),
+    ("bookmarks", "post_id"),
+    ("comments", "post_id"),
+    ("post_visitors", "post_id"),
+)
+# Dependent keys that never name a post
+NON_POST_KEYS = {None, visitors.SITE_KEY}
+
+
+async def ensure_indexes(db):
+    await db.post_tombstones.create_index("post_id", unique=True)
+    await db.post_tombstones.create_index("status")
+    # Only finished tombstones have finished_at; pending ones never expire
+    await db.post_tombstones.create_index("finished_at", expireAfterSeconds=TOMBSTONE_RETENTION_DAYS * 24 * 3600)
+    await db.post_likes.create_index("post_id")
+    await db.bookmarks.create_index("post_id")
+
+
+async def delete_batch(db, collection: str, query: dict, batch_size: int = DELETE_BATCH_SIZE) -> int:
+    """Delete up to batch_size matching documents; returns how many were removed
+
+    Bounded batches keep each delete short, so a post with many dependents
+    does not hold one long-running operation against the collection.
+    """
+    if collection == "comments":
+        docs = await db.comments.find(query, {"_id": 1, "approved": 1}).limit(batch_size).to_list(batch_size)
+        pending = [d["_id"] for d in docs if not d.get("approved")]
+        approved = [d["_id"] for d in docs if d.get("approved")]
+        removed_pending = (await db.comments.delete_many({"_id": {"$in": pending}})).deleted_count if pending else 0
+        removed_approved = (await db.comments.delete_many({"_id": {"$in": approved}})).deleted_count if approved else 0
+        await stats.bump(db, total_comments=-(removed_pending + removed_approved), pending_comments=-removed_pending)
+        return removed_pending + removed_approved
+    docs = await db[collection].find(query, {"_id": 1}).limit(batch_size).to_list(batch_size)
+    if not docs:
+        return 0
+    result = await db[collection].delete_many({"_id": {"$in": [d["_id"] for d in docs]}})
+    return result.deleted_count
+
+
+async def delete_post_dependents(db, post_ids: List[str], batch_size: int = DELETE_BATCH_SIZE,
+                                 progress=None) -> Dict[str, int]:
+    """Remove every dependent of the given posts, one batch at a time"""
+    removed: Dict[str, int] = {}
+    for collection, field in DEPENDENTS:
+        query = {field: post_ids[0]} if len(post_ids) == 1 else {field: {"$in": post_ids}}
+        removed[collection] = 0
+        while True:
+            count = await delete_batch(db, collection, query, batch_size)
+            removed[collection] += count
+            if progress is not None and count:
+                await progress(collection, count)
+            if count < batch_size:
+                break
+    return removed
+
+
+async def schedule(db, post_id: str):
+    """Tombstone a deleted post and queue the removal of its dependents"""
+    await db.post_tombstones.update_one(
+        {"post_id": post_id},
+        {"$setOnInsert": {
+            "post_id": post_id,
+            "status": "pending",
+            "deleted_at": datetime.now(timezone.utc),
+            "removed": {},
+        }},
+        upsert=True
+    )
+    return await jobs.enqueue(db, "posts.cascade_delete", {"post_id": post_id},
+                              dedupe_key=f"posts.cascade_delete:{post_id}")
+
+
+async def resume(db) -> int:
+    """Re-queue cascades whose tombstone is still pending (run at startup)
+
+    A job that already failed (or ended without finishing the tombstone)
+    still holds the dedupe key, so it is reset instead of enqueued again.
+    """
+    queued = 0
+    async for tombstone in db.post_tombstones.find({"status": "pending"}, {"_id": 0, "post_id": 1}):
+        dedupe_key = f"posts.cascade_delete:{tombstone['post_id']}"
+        if not await jobs.requeue(db, dedupe_key):
+            await jobs.enqueue(db, "posts.cascade_delete", {"post_id": tombstone["post_id"]},
+                               dedupe_key=dedupe_key)
+        queued += 1
+    return queued
+
+
+@jobs.handler("posts.cascade_delete")
+async def _cascade_delete(db, payload: dict, job: dict) -> dict:
+    post_id = payload["post_id"]
+
+    async def progress(collection: str, count: int):
+        await db.post_tombstones.update_one(
+            {"post_id": post_id}, {"$inc": {f"removed.{collection}": count}}
+        )
+
+    removed = await delete_post_dependents(db, [post_id], progress=progress)
+    await db.post_tombstones.update_one(
+        {"post_id": post_id},
+        {"$set": {"status": "done", "finished_at": datetime.now(timezone.utc)}}
+    )
+    return removed
+
+
+async def find_orphan_post_ids(db, collection: str, field: str) -> List[str]:
+    """Post ids referenced by a dependent collection that no longer exist"""
+    referenced = [row["_id"] async for row in db[collection].aggregate(
+        [{"$group": {"_id": f"${field}"}}], allowDiskUse=True
+    )]
+    orphans = []
+    for start in range(0, len(referenced), SWEEP_LOOKUP_BATCH):
+        chunk = referenced[start:start + SWEEP_LOOKUP_BATCH]
+        existing = {doc["id"] async for doc in db.posts.find({"id": {"$in": chunk}}, {"_id": 0, "id": 1})}
+        orphans.extend(post_id for post_id in chunk if post_id not in existing and post_id not in NON_POST_KEYS)
+    return orphans
+
+
+async def collection_sizes(db, collection: str) -> dict:
+    coll_stats = await db.command("collStats", collection)
+    return {
+        "count": coll_stats.get("count", 0),
+        "size": coll_stats.get("size", 0),
+        "storage_size": coll_stats.get("storageSize", 0),
+        "free_storage_size": coll_stats.get("freeStorageSize", 0),
+    }
+
+
+async def sweep_orphans(db, dry_run: bool = False, compact: bool = False) -> Dict[str, dict]:
+    """Find (and unless dry_run, delete) dependents of posts that no longer exist"""
+    report = {}
+    for collection, field in DEPENDENTS:
+        before = await collection_sizes(db, collection)
+        orphan_ids = await find_orphan_post_ids(db, collection, field)
+        orphan_docs = 0
+        if orphan_ids:
+            orphan_docs = await db[collection].count_documents({field: {"$in": orphan_ids}})
+        entry = {"orphan_posts": len(orphan_ids), "orphan_docs": orphan_docs, "before": before}
+        if not dry_run and orphan_ids:
+            removed = 0
+            for start in range(0, len(orphan_ids), SWEEP_LOOKUP_BATCH):
+                chunk = orphan_ids[start:start + SWEEP_LOOKUP_BATCH]
+                while True:
+                    count = await delete_batch(db, collection, {field: {"$in": chunk}})
+                    removed += count
+                    if count < DELETE_BATCH_SIZE:
+                        break
+            entry["removed"] = removed
+            if compact:
+                # WiredTiger keeps freed pages for reuse; compact returns them to the OS
+                await db.command("compact", collection)
+            entry["after"] = await collection_sizes(db, collection)
+        report[collection] = entry
+    return report
+
+
+def _mb(size: int) -> str:
+    return f"{size / (1024 * 1024):.2f} MB"
+
+
+async def main():
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from pathlib import Path
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+
+    if len(sys.argv) < 2 or sys.argv[1] != "--sweep":
+        print("📖 USO:")
+        print("  python cascade.py --sweep              - Eliminar likes/bookmarks/comentarios huérfanos")
+        print("  python cascade.py --sweep --dry-run    - Solo informar, sin borrar")
+        print("  python cascade.py --sweep --compact    - Además compactar las colecciones")
+        client.close()
+        return
+
+    dry_run = "--dry-run" in sys.argv
+    report = await sweep_orphans(db, dry_run=dry_run, compact="--compact" in sys.argv)
+    for collection, entry in report.items():
+        before = entry["before"]
+        print(f"🧹 {collection}: {entry['orphan_docs']} documentos huérfanos ({entry['orphan_posts']} posts inexistentes)")
+        print(f"   Antes:   {before['count']} docs, datos {_mb(before['size'])}, almacenamiento {_mb(before['storage_size'])}")
+        if "after" in entry:
+            after = entry["after"]
+            print(f"   Después: {after['count']} docs, datos {_mb(after['size'])}, almacenamiento {_mb(after['storage_size'])}"
+                  f" (reutilizable {_mb(after['free_storage_size'])})")
+    if dry_run:
+        print("ℹ️  Modo --dry-run: no se eliminó nada")
+
+    client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,511 @@
+"""
+Fake en memoria de Motor/MongoDB compartido por los tests
+
+Cubre el subconjunto de la API que usan los módulos del backend: filtros
+con los operadores habituales, proyecciones, cursores con sort/limit,
+updates con $set/$inc/$unset/$setOnInsert/$addToSet (también como
+pipeline de update), find_one_and_update, bulk_write y los pipelines que
+usa el backend ($match/$group/$sort/$limit/$sample/$facet/$indexStats).
+Cada colección anota las operaciones en `calls`, para comprobar cuántos
+round-trips hace el código. Una etapa o expresión no soportada hace fallar
+el test que la usa con un mensaje explícito.
+"""
+import asyncio
+import copy
+import operator
+import re
+from types import SimpleNamespace
+from typing import Dict, Iterable, List, Optional
+
+import pytest
+from bson import ObjectId
+from pymongo import DeleteMany, DeleteOne, InsertOne, ReplaceOne, ReturnDocument, UpdateMany, UpdateOne
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+_MISSING = object()
+
+
+def get_path(doc: dict, path: str, default=None):
+    for part in path.split("."):
+        if not isinstance(doc, dict) or part not in doc:
+            return default
+        doc = doc[part]
+    return doc
+
+
+def set_path(doc: dict, path: str, value):
+    *parents, last = path.split(".")
+    for part in parents:
+        doc = doc.setdefault(part, {})
+    doc[last] = value
+
+
+def unset_path(doc: dict, path: str):
+    *parents, last = path.split(".")
+    for part in parents:
+        doc = doc.get(part, {})
+    doc.pop(last, None)
+
+
+_COMPARISONS = {"$lt": operator.lt, "$lte": operator.le, "$gt": operator.gt, "$gte": operator.ge}
+
+
+def _compare(value, op: str, arg) -> bool:
+    if op == "$exists":
+        return (value is not _MISSING) == bool(arg)
+    if value is _MISSING:
+        value = None
+    if op == "$eq":
+        return value == arg
+    if op == "$ne":
+        return value != arg
+    if op in ("$in", "$nin"):
+        found = any(
+            isinstance(value, str) and item.search(value) is not None if isinstance(item, re.Pattern) else value == item
+            for item in arg
+        )
+        return found == (op == "$in")
+    if op == "$regex":
+        return isinstance(value, str) and re.search(arg, value) is not None
+    return value is not None and _COMPARISONS[op](value, arg)
+
+
+def matches(doc: dict, query: Optional[dict]) -> bool:
+    for key, cond in (query or {}).items():
+        if key == "$and":
+            if not all(matches(doc, q) for q in cond):
+                return False
+        elif key == "$or":
+            if not any(matches(doc, q) for q in cond):
+                return False
+        elif key == "$expr":
+            if not evaluate(cond, doc):
+                return False
+        elif isinstance(cond, dict) and cond and all(op.startswith("$") for op in cond):
+            value = get_path(doc, key, _MISSING)
+            if not all(_compare(value, op, arg) for op, arg in cond.items() if op != "$options"):
+                return False
+        elif get_path(doc, key) != cond:
+            return False
+    return True
+
+
+def project(doc: dict, projection: Optional[dict]) -> dict:
+    doc = copy.deepcopy(doc)
+    if not projection:
+        return doc
+    included = [field for field, keep in projection.items() if keep and field != "_id"]
+    if included:
+        picked = {field: doc[field] for field in included if field in doc}
+        if projection.get("_id", 1) and "_id" in doc:
+            picked["_id"] = doc["_id"]
+        return picked
+    for field, keep in projection.items():
+        if not keep:
+            doc.pop(field, None)
+    return doc
+
+
+def sort_docs(docs: List[dict], keys) -> List[dict]:
+    for field, direction in reversed(list(keys)):
+        # Missing fields sort first, like null in MongoDB
+        docs.sort(key=lambda d: (get_path(d, field) is not None, get_path(d, field)), reverse=direction < 0)
+    return docs
+
+
+def _sort_keys(key_or_list, direction=None):
+    if isinstance(key_or_list, str):
+        return [(key_or_list, direction or 1)]
+    if isinstance(key_or_list, dict):
+        return list(key_or_list.items())
+    return list(key_or_list)
+
+
+def sorted_hits(docs: List[dict], query: Optional[dict], sort=None) -> List[dict]:
+    hits = [doc for doc in docs if matches(doc, query)]
+    return sort_docs(hits, _sort_keys(sort)) if sort else hits
+
+
+class FakeCursor:
+    def __init__(self, docs: List[dict], latency: float = 0.0):
+        self.docs = docs
+        self.latency = latency
+
+    def sort(self, key_or_list, direction=None):
+        sort_docs(self.docs, _sort_keys(key_or_list, direction))
+        return self
+
+    def skip(self, n: int):
+        self.docs = self.docs[n:]
+        return self
+
+    def limit(self, n: int):
+        if n:
+            self.docs = self.docs[:n]
+        return self
+
+    def batch_size(self, n: int):
+        return self
+
+    async def to_list(self, length: Optional[int] = None):
+        await asyncio.sleep(self.latency)
+        return self.docs[:length] if length else list(self.docs)
+
+    def __aiter__(self):
+        return self._iter()
+
+    async def _iter(self):
+        for doc in self.docs:
+            yield doc
+
+
+def _unsupported(what: str):
+    pytest.fail(f"The fake MongoDB in conftest.py does not support {what}; add it there", pytrace=False)
+
+
+def evaluate(expression, doc: dict):
+    """Aggregation expressions: field paths, literals, sub-documents and a few operators"""
+    if isinstance(expression, str) and expression.startswith("$"):
+        return get_path(doc, expression[1:])
+    if isinstance(expression, list):
+        return [evaluate(item, doc) for item in expression]
+    if not isinstance(expression, dict):
+        return expression
+    if len(expression) != 1 or not next(iter(expression)).startswith("$"):
+        return {name: evaluate(value, doc) for name, value in expression.items()}
+    (op, arg), = expression.items()
+    if op == "$literal":
+        return arg
+    if op == "$cond":
+        condition, then, otherwise = arg if isinstance(arg, list) else (arg["if"], arg["then"], arg["else"])
+        return evaluate(then if evaluate(condition, doc) else otherwise, doc)
+    if op in ("$eq", "$ne"):
+        left, right = evaluate(arg, doc)
+        return (left == right) == (op == "$eq")
+    if op in _COMPARISONS:
+        left, right = evaluate(arg, doc)
+        return _COMPARISONS[op](left, right)
+    if op == "$toLower":
+        return (evaluate(arg, doc) or "").lower()
+    if op == "$trim":
+        return (evaluate(arg["input"], doc) or "").strip()
+    _unsupported(f"the {op} expression")
+
+
+def _group_key(expression, doc):
+    value = evaluate(expression, doc)
+    return tuple(value.items()) if isinstance(value, dict) else value
+
+
+def _accumulate(group: dict, field: str, accumulator: dict, doc: dict):
+    (op, expression), = accumulator.items()
+    value = evaluate(expression, doc)
+    if op == "$sum":
+        group[field] = group.get(field, 0) + (value or 0)
+    elif op == "$push":
+        group.setdefault(field, []).append(value)
+    elif op == "$first":
+        group.setdefault(field, value)
+    elif op in ("$max", "$min"):
+        pick = max if op == "$max" else min
+        group[field] = value if field not in group else pick(group[field], value)
+    else:
+        _unsupported(f"the {op} accumulator")
+
+
+class FakeCollection:
+    """One collection: documents in `docs`, operation names in `calls`"""
+
+    def __init__(self, docs: Iterable[dict] = (), unique: Iterable[str] = (), latency: float = 0.0):
+        self.docs: List[dict] = []
+        self.unique = tuple(unique)
+        self.latency = latency
+        self.calls: List[str] = []
+        self.pipelines: List[list] = []
+        self.indexes: Dict[str, dict] = {"_id_": {"key": [("_id", 1)]}}
+        self.seed(docs)
+
+    def seed(self, docs: Iterable[dict]) -> "FakeCollection":
+        """Insert test data without recording a call"""
+        for doc in docs:
+            self._insert(doc)
+        return self
+
+    async def _io(self, name: str):
+        self.calls.append(name)
+        await asyncio.sleep(self.latency)
+
+    def _insert(self, doc: dict) -> dict:
+        doc = copy.deepcopy(doc)
+        doc.setdefault("_id", ObjectId())
+        for field in ("_id", *self.unique, *self._unique_indexes()):
+            value = doc.get(field, _MISSING)
+            if value is not _MISSING and any(other.get(field, _MISSING) == value for other in self.docs):
+                raise DuplicateKeyError(f"E11000 duplicate key error: {field}: {value!r}")
+        self.docs.append(doc)
+        return doc
+
+    def _apply(self, doc: dict, update, inserting: bool = False):
+        if isinstance(update, list):
+            # Pipeline update: every stage sees the document as left by the previous one
+            for stage in update:
+                (name, fields), = stage.items()
+                if name not in ("$set", "$addFields"):
+                    _unsupported(f"the {name} update stage")
+                before = copy.deepcopy(doc)
+                for path, expression in fields.items():
+                    set_path(doc, path, copy.deepcopy(evaluate(expression, before)))
+            return
+        for path, value in update.get("$set", {}).items():
+            set_path(doc, path, copy.deepcopy(value))
+        if inserting:
+            for path, value in update.get("$setOnInsert", {}).items():
+                set_path(doc, path, copy.deepcopy(value))
+        for path, delta in update.get("$inc", {}).items():
+            set_path(doc, path, get_path(doc, path, 0) + delta)
+        for path in update.get("$unset", {}):
+            unset_path(doc, path)
+        for path, value in update.get("$addToSet", {}).items():
+            values = get_path(doc, path) or []
+            if value not in values:
+                set_path(doc, path, values + [value])
+
+    def _update(self, query: dict, update, upsert: bool, many: bool, sort=None) -> SimpleNamespace:
+        hits = [doc for doc in self.docs if matches(doc, query)]
+        if sort:
+            sort_docs(hits, _sort_keys(sort))
+        if not many:
+            hits = hits[:1]
+        modified = 0
+        for doc in hits:
+            before = copy.deepcopy(doc)
+            self._apply(doc, update)
+            modified += doc != before
+        upserted_id = None
+        if not hits and upsert:
+            doc = {key: value for key, value in query.items() if not key.startswith("$") and not isinstance(value, dict)}
+            self._apply(doc, update, inserting=True)
+            upserted_id = self._insert(doc)["_id"]
+        return SimpleNamespace(matched_count=len(hits), modified_count=modified, upserted_id=upserted_id)
+
+    def _delete(self, query: dict, many: bool) -> SimpleNamespace:
+        hits = [doc for doc in self.docs if matches(doc, query)]
+        if not many:
+            hits = hits[:1]
+        self.docs = [doc for doc in self.docs if not any(doc is hit for hit in hits)]
+        return SimpleNamespace(deleted_count=len(hits))
+
+    def find(self, query: Optional[dict] = None, projection: Optional[dict] = None, **kwargs) -> FakeCursor:
+        self.calls.append("find")
+        docs = [doc for doc in self.docs if matches(doc, query)]
+        if kwargs.get("sort"):
+            sort_docs(docs, kwargs["sort"])
+        return FakeCursor([project(doc, projection) for doc in docs], self.latency)
+
+    async def find_one(self, query: Optional[dict] = None, projection: Optional[dict] = None, sort=None, **kwargs):
+        await self._io("find_one")
+        docs = [doc for doc in self.docs if matches(doc, query)]
+        if sort:
+            sort_docs(docs, sort)
+        return project(docs[0], projection) if docs else None
+
+    async def count_documents(self, query: dict, **kwargs) -> int:
+        await self._io("count_documents")
+        return sum(1 for doc in self.docs if matches(doc, query))
+
+    async def estimated_document_count(self) -> int:
+        await self._io("estimated_document_count")
+        return len(self.docs)
+
+    async def insert_one(self, doc: dict):
+        await self._io("insert_one")
+        return SimpleNamespace(inserted_id=self._insert(doc)["_id"])
+
+    async def insert_many(self, docs: Iterable[dict], ordered: bool = True):
+        await self._io("insert_many")
+        return SimpleNamespace(inserted_ids=[self._insert(doc)["_id"] for doc in docs])
+
+    async def update_one(self, query: dict, update: dict, upsert: bool = False):
+        await self._io("update_one")
+        return self._update(query, update, upsert, many=False)
+
+    async def update_many(self, query: dict, update: dict, upsert: bool = False):
+        await self._io("update_many")
+        return self._update(query, update, upsert, many=True)
+
+    def _replace(self, query: dict, doc: dict, upsert: bool) -> SimpleNamespace:
+        hit = next((d for d in self.docs if matches(d, query)), None)
+        upserted_id = None
+        if hit is not None:
+            replacement = {"_id": hit["_id"], **copy.deepcopy(doc)}
+            hit.clear()
+            hit.update(replacement)
+        elif upsert:
+            upserted_id = self._insert({**{k: v for k, v in query.items() if not isinstance(v, dict)}, **doc})["_id"]
+        return SimpleNamespace(matched_count=int(hit is not None), modified_count=int(hit is not None),
+                               upserted_id=upserted_id)
+
+    async def replace_one(self, query: dict, doc: dict, upsert: bool = False):
+        await self._io("replace_one")
+        return self._replace(query, doc, upsert)
+
+    async def delete_one(self, query: dict):
+        await self._io("delete_one")
+        return self._delete(query, many=False)
+
+    async def delete_many(self, query: dict):
+        await self._io("delete_many")
+        return self._delete(query, many=True)
+
+    async def find_one_and_delete(self, query: dict, projection: Optional[dict] = None, **kwargs):
+        await self._io("find_one_and_delete")
+        doc = next((d for d in self.docs if matches(d, query)), None)
+        if doc is not None:
+            self._delete({"_id": doc["_id"]}, many=False)
+            return project(doc, projection)
+        return None
+
+    async def find_one_and_update(self, query: dict, update, projection: Optional[dict] = None, sort=None,
+                                  upsert: bool = False, return_document=ReturnDocument.BEFORE, **kwargs):
+        await self._io("find_one_and_update")
+        hit = next((d for d in sorted_hits(self.docs, query, sort)), None)
+        before = copy.deepcopy(hit)
+        result = self._update({"_id": hit["_id"]} if hit else query, update, upsert and hit is None, many=False)
+        if return_document == ReturnDocument.AFTER:
+            if result.upserted_id is not None:
+                return project(next(d for d in self.docs if d["_id"] == result.upserted_id), projection)
+            return project(hit, projection) if hit else None
+        return project(before, projection) if before else None
+
+    async def bulk_write(self, requests: list, ordered: bool = True):
+        await self._io("bulk_write")
+        counts = dict(inserted_count=0, matched_count=0, modified_count=0, deleted_count=0, upserted_count=0)
+        for request in requests:
+            if isinstance(request, InsertOne):
+                self._insert(request._doc)
+                counts["inserted_count"] += 1
+            elif isinstance(request, (UpdateOne, UpdateMany, ReplaceOne)):
+                if isinstance(request, ReplaceOne):
+                    result = self._replace(request._filter, request._doc, request._upsert)
+                else:
+                    result = self._update(request._filter, request._doc, request._upsert,
+                                          many=isinstance(request, UpdateMany))
+                counts["matched_count"] += result.matched_count
+                counts["modified_count"] += result.modified_count
+                counts["upserted_count"] += result.upserted_id is not None
+            elif isinstance(request, (DeleteOne, DeleteMany)):
+                counts["deleted_count"] += self._delete(request._filter, many=isinstance(request, DeleteMany)).deleted_count
+            else:
+                _unsupported(f"{type(request).__name__} in bulk_write")
+        return SimpleNamespace(**counts, bulk_api_result={
+            "nInserted": counts["inserted_count"], "nMatched": counts["matched_count"],
+            "nModified": counts["modified_count"], "nUpserted": counts["upserted_count"],
+            "nRemoved": counts["deleted_count"],
+        })
+
+    def aggregate(self, pipeline: list, **kwargs) -> FakeCursor:
+        """$match, $group, $sort, $limit, $sample, $facet and $indexStats"""
+        self.calls.append("aggregate")
+        self.pipelines.append(pipeline)
+        return FakeCursor(self._run_pipeline([copy.deepcopy(doc) for doc in self.docs], pipeline), self.latency)
+
+    def _run_pipeline(self, docs: List[dict], pipeline: list) -> List[dict]:
+        for stage in pipeline:
+            (name, spec), = stage.items()
+            if name == "$match":
+                docs = [doc for doc in docs if matches(doc, spec)]
+            elif name == "$group":
+                groups: Dict[object, dict] = {}
+                for doc in docs:
+                    key = _group_key(spec["_id"], doc)
+                    group = groups.setdefault(key, {"_id": dict(key) if isinstance(key, tuple) else key})
+                    for field, accumulator in spec.items():
+                        if field != "_id":
+                            _accumulate(group, field, accumulator, doc)
+                docs = list(groups.values())
+            elif name == "$sort":
+                sort_docs(docs, spec.items())
+            elif name == "$limit":
+                docs = docs[:spec]
+            elif name == "$sample":
+                docs = docs[:spec["size"]]
+            elif name == "$facet":
+                docs = [{field: self._run_pipeline(copy.deepcopy(docs), sub) for field, sub in spec.items()}]
+            elif name == "$indexStats":
+                docs = [{"name": index, "key": dict(info["key"]), "accesses": {"ops": 0}} for index, info in self.indexes.items()]
+            else:
+                _unsupported(f"the {name} aggregation stage")
+        return docs
+
+    def _unique_indexes(self) -> List[str]:
+        return [info["key"][0][0] for info in self.indexes.values() if info.get("unique") and len(info["key"]) == 1]
+
+    async def create_index(self, keys, **options):
+        """Like MongoDB: a no-op for an identical index, an error for conflicting options or duplicates"""
+        keys = _sort_keys(keys)
+        name = options.pop("name", None) or "_".join(f"{field}_{direction}" for field, direction in keys)
+        existing = self.indexes.get(name)
+        if existing is not None:
+            if {k: v for k, v in existing.items() if k != "key"} != options:
+                raise OperationFailure(f"Index with name: {name} already exists with different options", code=85)
+            return name
+        if options.get("unique") and len(keys) == 1:
+            seen = []
+            for doc in self.docs:
+                value = get_path(doc, keys[0][0], _MISSING)
+                if value is _MISSING and options.get("sparse"):
+                    continue
+                if value in seen:
+                    raise DuplicateKeyError(f"E11000 duplicate key error: {keys[0][0]}: {value!r}")
+                seen.append(value)
+        self.indexes[name] = {"key": keys, **options}
+        return name
+
+    async def drop_index(self, name: str):
+        if name not in self.indexes:
+            raise OperationFailure(f"index not found with name [{name}]", code=27)
+        del self.indexes[name]
+
+    async def index_information(self) -> Dict[str, dict]:
+        return copy.deepcopy(self.indexes)
+
+
+class FakeDB:
+    """Collections are created on first access, like in MongoDB"""
+
+    collection_class = FakeCollection
+
+    def __init__(self, **collections):
+        self._collections: Dict[str, FakeCollection] = {}
+        for name, value in collections.items():
+            self._collections[name] = value if isinstance(value, FakeCollection) else self.collection_class(value)
+
+    def __getattr__(self, name: str) -> FakeCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def __setattr__(self, name: str, value):
+        if name.startswith("_"):
+            super().__setattr__(name, value)
+        else:
+            self._collections[name] = value
+
+    def __getitem__(self, name: str) -> FakeCollection:
+        if name not in self._collections:
+            self._collections[name] = self.collection_class()
+        return self._collections[name]
+
+    async def list_collection_names(self) -> List[str]:
+        return list(self._collections)
+
+    def counters(self) -> dict:
+        """The blog stats counters (db.stats), without bookkeeping fields"""
+        doc = next(iter(self.stats.docs), {})
+        return {name: value for name, value in doc.items() if name not in ("_id", "updated_at", "rebuilt_at")}
+
+
+@pytest.fixture
+def fake_db() -> FakeDB:
+    """An empty FakeDB whose stats document is seeded, as at server startup"""
+    return FakeDB(stats=[{"_id": "blog"}])
@@ -1,153 +1,466 @@
 """
 Script para ver estadísticas de la base de datos
 Ejecutar: python db_stats.py
+          python db_stats.py --json     # salida JSON (p.ej. para jq o para guardarla)
+
+All sections run concurrently. Each collection is read in a single pass:
+one $facet aggregation returns all of its breakdowns, and totals are the
+sum of those groups. Collections that only need a size (likes, bookmarks,
+profiles) use estimated_document_count, which reads collection metadata
+instead of scanning. Every section reports how long it took.
+
+The storage section is for capacity planning: per collection, data and
+storage size, average document size, index sizes and how often each index
+is used ($indexStats, counted since the last mongod restart); the largest
+fields, measured on a $sample of documents; and whether the working set
+(all indexes plus the collections read on every request) fits in the
+WiredTiger cache.
 """
+import argparse
 import asyncio
+import json
 import os
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+import bson
 from dotenv import load_dotenv
 from motor.motor_asyncio import AsyncIOMotorClient
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timezone, timedelta
+from pymongo.errors import OperationFailure
+
+from sessions import session_stats
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-db_name = os.environ['DB_NAME']
-client = AsyncIOMotorClient(mongo_url)
-db = client[db_name]
+RECENT_LIMIT = 5
+FIELD_SAMPLE_SIZE = 200
+LARGEST_FIELDS = 5
+FIELD_SHARE_WARNING = 0.5  # A field over half of the document is worth splitting out
+CACHE_FILL_WARNING = 0.8
+# Read on (almost) every request: their data competes with the indexes for the cache
+HOT_COLLECTIONS = ("posts", "users", "sessions", "comments", "post_likes", "bookmarks", "related_posts", "stats")
+EMPTY_DOC_BYTES = len(bson.encode({}))
+MB = 1024 * 1024
+
+
+async def facet(collection, facets: dict) -> dict:
+    """Run several sub-pipelines over one scan of the collection"""
+    result = await collection.aggregate([{"$facet": facets}]).to_list(1)
+    return result[0] if result else {name: [] for name in facets}
+
+
+def group_by(expression) -> list:
+    return [{"$group": {"_id": expression, "count": {"$sum": 1}}}, {"$sort": {"count": -1}}]
+
+
+def _key(value) -> str:
+    if value is None:
+        return "none"
+    return str(value).lower() if isinstance(value, bool) else str(value)
+
+
+def counts(rows: list) -> dict:
+    return {_key(row["_id"]): row["count"] for row in rows}
+
+
+# Sections --------------------------------------------------------------------
+
+async def users_section(db) -> dict:
+    result = await facet(db.users, {
+        "by_role": group_by("$role"),
+        "by_provider": group_by("$provider"),
+        "admins": [{"$match": {"role": "admin"}}, {"$project": {"_id": 0, "email": 1, "name": 1}}],
+    })
+    by_role = counts(result["by_role"])
+    return {
+        "total": sum(by_role.values()),
+        "admins": by_role.get("admin", 0),
+        "by_role": by_role,
+        "by_provider": counts(result["by_provider"]),
+        "admin_list": result["admins"],
+    }
+
+
+async def posts_section(db) -> dict:
+    result = await facet(db.posts, {
+        "by_status": group_by("$published"),
+        "by_category": group_by("$category"),
+    })
+    by_status = counts(result["by_status"])
+    return {
+        "total": sum(by_status.values()),
+        "published": by_status.get("true", 0),
+        "drafts": sum(count for status, count in by_status.items() if status != "true"),
+        "by_category": counts(result["by_category"]),
+    }
+
+
+async def categories_section(db) -> dict:
+    categories = await db.categories.find({}, {"_id": 0, "name": 1, "slug": 1}).to_list(None)
+    return {"total": len(categories), "list": categories}
+
+
+async def comments_section(db) -> dict:
+    week_ago = (datetime.now(timezone.utc) - timedelta(days=7)).isoformat()
+    result = await facet(db.comments, {
+        "by_status": group_by("$approved"),
+        "by_author": group_by({"$cond": [{"$ifNull": ["$user_id", False]}, "registered", "anonymous"]}),
+        "last_7_days": [{"$match": {"created_at": {"$gte": week_ago}}}, {"$count": "count"}],
+    })
+    by_status = counts(result["by_status"])
+    return {
+        "total": sum(by_status.values()),
+        "approved": by_status.get("true", 0),
+        "pending": sum(count for status, count in by_status.items() if status != "true"),
+        "by_author": counts(result["by_author"]),
+        "last_7_days": result["last_7_days"][0]["count"] if result["last_7_days"] else 0,
+    }
+
+
+async def newsletter_section(db) -> dict:
+    by_status = counts(await db.newsletter.aggregate(group_by("$active")).to_list(None))
+    return {"total": sum(by_status.values()), "active": by_status.get("true", 0)}
+
+
+async def engagement_section(db) -> dict:
+    """Sizes only: estimated from collection metadata, no scan"""
+    likes, bookmarks, profiles = await asyncio.gather(
+        db.post_likes.estimated_document_count(),
+        db.bookmarks.estimated_document_count(),
+        db.user_profiles.estimated_document_count(),
+    )
+    return {"likes": likes, "bookmarks": bookmarks, "user_profiles": profiles, "estimated": True}
+
+
+async def recent_section(db) -> dict:
+    users, posts, comments = await asyncio.gather(
+        db.users.find({}, {"_id": 0, "email": 1, "name": 1, "created_at": 1})
+            .sort("created_at", -1).limit(RECENT_LIMIT).to_list(RECENT_LIMIT),
+        db.posts.find({}, {"_id": 0, "title": 1, "published": 1, "created_at": 1})
+            .sort("created_at", -1).limit(RECENT_LIMIT).to_list(RECENT_LIMIT),
+        db.comments.find({}, {"_id": 0, "author_name": 1, "content": 1, "approved": 1, "created_at": 1})
+            .sort("created_at", -1).limit(RECENT_LIMIT).to_list(RECENT_LIMIT),
+    )
+    return {"users": users, "posts": posts, "comments": comments}
+
+
+def field_sizes(docs: List[dict]) -> Dict[str, float]:
+    """Average BSON bytes of each top-level field, largest first"""
+    totals: Counter = Counter()
+    for doc in docs:
+        for field, value in doc.items():
+            totals[field] += len(bson.encode({field: value})) - EMPTY_DOC_BYTES
+    return {field: total / len(docs) for field, total in totals.most_common()} if docs else {}
+
+
+async def collection_storage(db, name: str) -> dict:
+    try:
+        coll_stats, index_usage, sample = await asyncio.gather(
+            db.command("collStats", name),
+            db[name].aggregate([{"$indexStats": {}}]).to_list(None),
+            db[name].aggregate([{"$sample": {"size": FIELD_SAMPLE_SIZE}}]).to_list(FIELD_SAMPLE_SIZE),
+        )
+    except OperationFailure as e:
+        return {"error": str(e)}
+    usage = {index["name"]: index.get("accesses", {}) for index in index_usage}
+    avg_obj_size = coll_stats.get("avgObjSize", 0)
+    return {
+        "count": coll_stats.get("count", 0),
+        "size": coll_stats.get("size", 0),
+        "avg_obj_size": avg_obj_size,
+        "storage_size": coll_stats.get("storageSize", 0),
+        "free_storage_size": coll_stats.get("freeStorageSize", 0),
+        "total_index_size": coll_stats.get("totalIndexSize", 0),
+        "indexes": [
+            {"name": index, "size": size, "ops": usage.get(index, {}).get("ops"),
+             "since": usage.get(index, {}).get("since")}
+            for index, size in sorted(coll_stats.get("indexSizes", {}).items(), key=lambda item: -item[1])
+        ],
+        "largest_fields": [
+            {"field": field, "avg_bytes": round(size), "share": round(size / avg_obj_size, 3) if avg_obj_size else 0.0}
+            for field, size in list(field_sizes(sample).items())[:LARGEST_FIELDS]
+        ],
+    }
+
+
+async def server_memory(db) -> Optional[dict]:
+    """WiredTiger cache and host RAM (None without the serverStatus/hostInfo privileges)"""
+    try:
+        status, host = await asyncio.gather(db.command("serverStatus"), db.command("hostInfo"))
+    except OperationFailure:
+        return None
+    cache = status.get("wiredTiger", {}).get("cache", {})
+    return {
+        "cache_max": cache.get("maximum bytes configured"),
+        "cache_used": cache.get("bytes currently in the cache"),
+        "ram": host.get("system", {}).get("memSizeMB", 0) * MB,
+    }
+
+
+def working_set(collections: Dict[str, dict], memory: Optional[dict]) -> dict:
+    """All indexes plus the data of HOT_COLLECTIONS, against CACHE_FILL_WARNING of the cache"""
+    sizes = [entry for entry in collections.values() if "error" not in entry]
+    indexes = sum(entry["total_index_size"] for entry in sizes)
+    hot_data = sum(entry["size"] for name, entry in collections.items() if name in HOT_COLLECTIONS and "error" not in entry)
+    cache = (memory or {}).get("cache_max")
+    return {
+        "indexes": indexes,
+        "hot_data": hot_data,
+        "estimate": indexes + hot_data,
+        "cache": cache,
+        "fits": (indexes + hot_data) <= cache * CACHE_FILL_WARNING if cache else None,
+    }
+
+
+def capacity_warnings(collections: Dict[str, dict], working: dict) -> List[str]:
+    warnings = []
+    if working["fits"] is False:
+        warnings.append(
+            f"El working set estimado ({working['estimate'] / MB:.0f} MB) supera el {CACHE_FILL_WARNING:.0%} "
+            f"de la caché de WiredTiger ({working['cache'] / MB:.0f} MB): más RAM, o menos datos calientes"
+        )
+    for name, entry in collections.items():
+        if "error" in entry:
+            continue
+        for field in entry["largest_fields"]:
+            if field["field"] != "_id" and field["share"] >= FIELD_SHARE_WARNING:
+                warnings.append(
+                    f"{name}.{field['field']} ocupa el {field['share']:.0%} de cada documento "
+                    f"({field['avg_bytes'] / 1024:.1f} KB): excluirlo de las proyecciones o moverlo a otra colección"
+                )
+        for index in entry["indexes"]:
+            if index["name"] != "_id_" and index["ops"] == 0:
+                warnings.append(f"Índice {name}.{index['name']} sin uso desde {_date(index['since'])} "
+                                f"({index['size'] / MB:.1f} MB en caché y en cada escritura)")
+    return warnings
+
+
+async def storage_section(db) -> dict:
+    names = sorted(name for name in await db.list_collection_names() if not name.startswith("system."))
+    memory, *entries = await asyncio.gather(server_memory(db), *(collection_storage(db, name) for name in names))
+    collections = dict(zip(names, entries))
+    working = working_set(collections, memory)
+    return {
+        "collections": collections,
+        "memory": memory,
+        "working_set": working,
+        "warnings": capacity_warnings(collections, working),
+    }
+
+
+SECTIONS = {
+    "users": users_section,
+    "posts": posts_section,
+    "categories": categories_section,
+    "comments": comments_section,
+    "newsletter": newsletter_section,
+    "engagement": engagement_section,
+    "sessions": session_stats,
+    "recent": recent_section,
+    "storage": storage_section,
+}
+
+
+async def _timed(section, db):
+    started = time.perf_counter()
+    result = await section(db)
+    return result, round((time.perf_counter() - started) * 1000, 1)
+
 
-async def show_db_stats():
-    """Show database statistics"""
+async def collect(db) -> dict:
+    """Every section, computed concurrently, with its duration in ms"""
+    started = time.perf_counter()
+    results = await asyncio.gather(*(_timed(section, db) for section in SECTIONS.values()))
+    return {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "sections": {name: result for name, (result, _) in zip(SECTIONS, results)},
+        "timings_ms": {name: ms for name, (_, ms) in zip(SECTIONS, results)},
+        "total_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+# Report ----------------------------------------------------------------------
+
+def _date(value) -> str:
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M")
+    return value[:16].replace("T", " ") if isinstance(value, str) else "N/A"
+
+
+def print_report(db_name: str, stats: dict):
+    s, ms = stats["sections"], stats["timings_ms"]
     print("=" * 60)
     print(f"📊 ESTADÍSTICAS DE BASE DE DATOS: {db_name}")
     print("=" * 60)
     print()
-    
-    # Users
-    users_count = await db.users.count_documents({})
-    admin_count = await db.users.count_documents({"role": "admin"})
-    print(f"👥 Usuarios:")
-    print(f"   Total: {users_count}")
-    print(f"   Admins: {admin_count}")
-    print(f"   Usuarios normales: {users_count - admin_count}")
-    
-    # List admins
-    if admin_count > 0:
+
+    users = s["users"]
+    print(f"👥 Usuarios:  ({ms['users']} ms)")
+    print(f"   Total: {users['total']}")
+    print(f"   Admins: {users['admins']}")
+    print(f"   Usuarios normales: {users['total'] - users['admins']}")
+    if users["by_provider"]:
+        print(f"   Por proveedor: " + ", ".join(f"{name} {count}" for name, count in users["by_provider"].items()))
+    if users["admin_list"]:
         print(f"\n   Administradores:")
-        async for user in db.users.find({"role": "admin"}, {"email": 1, "name": 1, "_id": 0}):
-            print(f"      - {user['name']} ({user['email']})")
-    print()
-    
-    # Posts
-    posts_count = await db.posts.count_documents({})
-    published_count = await db.posts.count_documents({"published": True})
-    draft_count = posts_count - published_count
-    print(f"📝 Posts:")
-    print(f"   Total: {posts_count}")
-    print(f"   Publicados: {published_count}")
-    print(f"   Borradores: {draft_count}")
-    print()
-    
-    # Categories
-    categories_count = await db.categories.count_documents({})
-    print(f"🏷️  Categorías: {categories_count}")
-    if categories_count > 0:
+        for user in users["admin_list"]:
+            print(f"      - {user.get('name')} ({user.get('email')})")
+    print()
+
+    posts = s["posts"]
+    print(f"📝 Posts:  ({ms['posts']} ms)")
+    print(f"   Total: {posts['total']}")
+    print(f"   Publicados: {posts['published']}")
+    print(f"   Borradores: {posts['drafts']}")
+    if posts["by_category"]:
+        print(f"   Por categoría: " + ", ".join(f"{name} {count}" for name, count in posts["by_category"].items()))
+    print()
+
+    categories = s["categories"]
+    print(f"🏷️  Categorías: {categories['total']}  ({ms['categories']} ms)")
+    if categories["list"]:
         print(f"   Lista:")
-        async for cat in db.categories.find({}, {"name": 1, "slug": 1, "_id": 0}):
+        for cat in categories["list"]:
             print(f"      - {cat['name']} ({cat['slug']})")
     print()
-    
-    # Comments
-    comments_count = await db.comments.count_documents({})
-    approved_comments = await db.comments.count_documents({"approved": True})
-    pending_comments = comments_count - approved_comments
-    print(f"💬 Comentarios:")
-    print(f"   Total: {comments_count}")
-    print(f"   Aprobados: {approved_comments}")
-    print(f"   Pendientes: {pending_comments}")
-    print()
-    
-    # Newsletter
-    newsletter_count = await db.newsletter.count_documents({})
-    active_subs = await db.newsletter.count_documents({"active": True})
-    print(f"📧 Newsletter:")
-    print(f"   Suscriptores: {newsletter_count}")
-    print(f"   Activos: {active_subs}")
-    print()
-    
-    # Likes
-    likes_count = await db.post_likes.count_documents({})
-    print(f"❤️  Likes: {likes_count}")
-    print()
-    
-    # Bookmarks
-    bookmarks_count = await db.bookmarks.count_documents({})
-    print(f"🔖 Bookmarks: {bookmarks_count}")
-    print()
-    
-    # User Profiles
-    profiles_count = await db.user_profiles.count_documents({})
-    print(f"👤 Perfiles de usuario: {profiles_count}")
-    print()
-    
-    # Sessions
-    sessions_count = await db.sessions.count_documents({})
-    print(f"🔐 Sesiones activas: {sessions_count}")
-    print()
-    
-    print("=" * 60)
-    print("✅ Para ver más detalles, usa MongoDB Compass o mongosh")
-    print("=" * 60)
 
-async def show_recent_activity():
-    """Show recent activity"""
-    print("\n" + "=" * 60)
-    print("📈 ACTIVIDAD RECIENTE")
+    comments = s["comments"]
+    print(f"💬 Comentarios:  ({ms['comments']} ms)")
+    print(f"   Total: {comments['total']}")
+    print(f"   Aprobados: {comments['approved']}")
+    print(f"   Pendientes: {comments['pending']}")
+    print(f"   Registrados / anónimos: {comments['by_author'].get('registered', 0)} / {comments['by_author'].get('anonymous', 0)}")
+    print(f"   Últimos 7 días: {comments['last_7_days']}")
+    print()
+
+    newsletter = s["newsletter"]
+    print(f"📧 Newsletter:  ({ms['newsletter']} ms)")
+    print(f"   Suscriptores: {newsletter['total']}")
+    print(f"   Activos: {newsletter['active']}")
+    print()
+
+    engagement = s["engagement"]
+    print(f"❤️  Likes: ~{engagement['likes']}")
+    print(f"🔖 Bookmarks: ~{engagement['bookmarks']}")
+    print(f"👤 Perfiles de usuario: ~{engagement['user_profiles']}")
+    print(f"   (~ estimado por metadatos de la colección, {ms['engagement']} ms)")
+    print()
+
+    session_info = s["sessions"]
+    print(f"🔐 Sesiones:  ({ms['sessions']} ms)")
+    print(f"   Total: {session_info['total']}")
+    print(f"   Activas: {session_info['active']}")
+    for provider, count in session_info['by_provider'].items():
+        print(f"      - {provider}: {count}")
+    print(f"   Expiradas sin eliminar: {session_info['expired']}")
+    if session_info['expired']:
+        print(f"   Expirada más antigua: hace {session_info['oldest_expired_hours']} h")
+    print(f"   Índice TTL en expires_at: {'✅ sí' if session_info['ttl_index'] else '❌ no (usar SESSION_REAPER_ENABLED=true)'}")
+    print()
+
+    print("=" * 60)
+    print(f"📈 ACTIVIDAD RECIENTE  ({ms['recent']} ms)")
     print("=" * 60)
     print()
-    
-    # Recent users
-    print("👥 Últimos 5 usuarios registrados:")
-    async for user in db.users.find({}, {"email": 1, "name": 1, "created_at": 1, "_id": 0}).sort("created_at", -1).limit(5):
-        created = user.get('created_at', 'N/A')
-        if isinstance(created, datetime):
-            created = created.strftime("%Y-%m-%d %H:%M")
-        print(f"   - {user['name']} ({user['email']}) - {created}")
-    print()
-    
-    # Recent posts
-    print("📝 Últimos 5 posts creados:")
-    async for post in db.posts.find({}, {"title": 1, "published": 1, "created_at": 1, "_id": 0}).sort("created_at", -1).limit(5):
+    recent = s["recent"]
+    print(f"👥 Últimos {RECENT_LIMIT} usuarios registrados:")
+    for user in recent["users"]:
+        print(f"   - {user.get('name')} ({user.get('email')}) - {_date(user.get('created_at'))}")
+    print()
+    print(f"📝 Últimos {RECENT_LIMIT} posts creados:")
+    for post in recent["posts"]:
         status = "✅ Publicado" if post.get('published') else "📝 Borrador"
-        created = post.get('created_at', 'N/A')
-        if isinstance(created, datetime):
-            created = created.strftime("%Y-%m-%d %H:%M")
-        print(f"   - {post['title'][:50]}... - {status} - {created}")
-    print()
-    
-    # Recent comments
-    print("💬 Últimos 5 comentarios:")
-    async for comment in db.comments.find({}, {"author_name": 1, "content": 1, "approved": 1, "created_at": 1, "_id": 0}).sort("created_at", -1).limit(5):
+        print(f"   - {post.get('title', '')[:50]}... - {status} - {_date(post.get('created_at'))}")
+    print()
+    print(f"💬 Últimos {RECENT_LIMIT} comentarios:")
+    for comment in recent["comments"]:
         status = "✅ Aprobado" if comment.get('approved') else "⏳ Pendiente"
         content = comment.get('content', '')[:40]
-        created = comment.get('created_at', 'N/A')
-        if isinstance(created, datetime):
-            created = created.strftime("%Y-%m-%d %H:%M")
-        print(f"   - {comment['author_name']}: \"{content}...\" - {status} - {created}")
+        print(f"   - {comment.get('author_name')}: \"{content}...\" - {status} - {_date(comment.get('created_at'))}")
     print()
-    
+
+    print_storage(s["storage"], ms["storage"])
+
+    print("=" * 60)
+    print(f"⏱️  Total: {stats['total_ms']} ms (secciones en paralelo)")
+    print("✅ Para ver más detalles, usa MongoDB Compass o mongosh")
     print("=" * 60)
-    
-    # Close connection after all operations
-    client.close()
 
-async def main():
+
+def print_storage(storage: dict, ms: float):
+    print("=" * 60)
+    print(f"💾 ALMACENAMIENTO E ÍNDICES  ({ms} ms)")
+    print("=" * 60)
+    print()
+    print(f"   {'colección':<16}{'docs':>10}{'datos MB':>10}{'media KB':>10}{'disco MB':>10}{'índices MB':>12}")
+    for name, entry in storage["collections"].items():
+        if "error" in entry:
+            print(f"   {name:<16}  ⚠️ {entry['error']}")
+            continue
+        print(f"   {name:<16}{entry['count']:>10}{entry['size'] / MB:>10.2f}{entry['avg_obj_size'] / 1024:>10.2f}"
+              f"{entry['storage_size'] / MB:>10.2f}{entry['total_index_size'] / MB:>12.2f}")
+    print()
+
+    print("🔎 Uso de índices (operaciones desde el último arranque de mongod):")
+    for name, entry in storage["collections"].items():
+        for index in entry.get("indexes", []):
+            ops = "?" if index["ops"] is None else index["ops"]
+            print(f"   {name + '.' + index['name']:<44} {index['size'] / MB:>8.2f} MB  {ops:>10} ops")
+    print()
+
+    print(f"📦 Campos más grandes (muestra de {FIELD_SAMPLE_SIZE} documentos):")
+    for name, entry in storage["collections"].items():
+        fields = [f"{field['field']} {field['avg_bytes'] / 1024:.1f} KB ({field['share']:.0%})"
+                  for field in entry.get("largest_fields", []) if field["field"] != "_id"][:3]
+        if fields:
+            print(f"   {name:<16} " + ", ".join(fields))
+    print()
+
+    working, memory = storage["working_set"], storage["memory"]
+    print("🧠 Working set:")
+    print(f"   Índices: {working['indexes'] / MB:.1f} MB + datos calientes: {working['hot_data'] / MB:.1f} MB "
+          f"= {working['estimate'] / MB:.1f} MB")
+    if memory:
+        cache = f"{memory['cache_max'] / MB:.0f} MB" if memory['cache_max'] else "desconocida"
+        print(f"   Caché WiredTiger: {cache} "
+              f"(en uso {(memory['cache_used'] or 0) / MB:.0f} MB), RAM: {memory['ram'] / MB:.0f} MB")
+        if working["fits"] is None:
+            print("   ❔ Sin tamaño de caché (¿motor distinto de WiredTiger?): no se puede comparar")
+        else:
+            print(f"   {'✅ Cabe en caché' if working['fits'] else '❌ No cabe en caché'}")
+    else:
+        print("   (sin permisos para serverStatus/hostInfo: no se puede comparar con la caché)")
+    print()
+
+    if storage["warnings"]:
+        print("⚠️  Avisos:")
+        for warning in storage["warnings"]:
+            print(f"   - {warning}")
+        print()
+
+
+async def main(as_json: bool):
     """Main function"""
-    await show_db_stats()
-    await show_recent_activity()
+    db_name = os.environ['DB_NAME']
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    try:
+        stats = await collect(client[db_name])
+    finally:
+        client.close()
+    if as_json:
+        print(json.dumps({"database": db_name, **stats}, indent=2, default=str))
+    else:
+        print_report(db_name, stats)
+
 
 if __name__ == "__main__":
-    print("\n🔍 Analizando base de datos...\n")
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="Estadísticas de la base de datos")
+    parser.add_argument("--json", action="store_true", help="salida JSON en lugar del informe")
+    args = parser.parse_args()
+    if not args.json:
+        print("\n🔍 Analizando base de datos...\n")
+    asyncio.run(main(args.json))
@@ -0,0 +1,165 @@
+"""
+MongoDB command monitoring for FarchoDev Blog
+A pymongo CommandListener sees every command the driver sends. The current
+request is kept in a contextvar (Motor copies the context into its executor
+threads), so each command is attributed to the route that issued it:
+
+    mongo_commands_total / mongo_command_seconds_total   per command and collection
+    http_request_db_calls / http_request_db_seconds      histograms per route
+
+Commands slower than MONGO_SLOW_QUERY_MS are logged with their filter
+shape (values replaced by "?"), e.g.
+    Slow MongoDB find on posts (132.4 ms) in GET /api/posts: {"published": "?"}
+"""
+import json
+import logging
+import os
+import threading
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+from pymongo import monitoring
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+MONITORING_ENABLED = os.environ.get('MONGO_MONITORING_ENABLED', 'true').lower() == 'true'
+SLOW_QUERY_MS = float(os.environ.get('MONGO_SLOW_QUERY_MS', '100'))
+MAX_SHAPE_LENGTH = 500
+DB_CALL_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 200)
+DB_SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+# Where each command keeps the part that decides which documents it touches
+FILTER_FIELDS = {
+    "find": "filter", "count": "query", "distinct": "query", "findAndModify": "query",
+    "aggregate": "pipeline", "update": "updates", "delete": "deletes",
+}
+IGNORED_COMMANDS = {"isMaster", "hello", "ping", "saslStart", "saslContinue", "endSessions", "killCursors"}
+
+
+class RequestDB:
+    """DB calls and time accumulated by one request"""
+    __slots__ = ("label", "calls", "seconds")
+
+    def __init__(self, label: str):
+        self.label = label
+        self.calls = 0
+        self.seconds = 0.0
+
+
+current_request: ContextVar[Optional[RequestDB]] = ContextVar("current_request", default=None)
+
+
+def shape(value):
+    """The structure of a filter with its values replaced by "?" (operators and keys kept)"""
+    if isinstance(value, dict):
+        return {key: shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        # {"$in": [...]} and pipelines: one element is enough to show the structure
+        return [shape(value[0])] if value and isinstance(value[0], (dict, list, tuple)) else ["?"] if value else []
+    return "?"
+
+
+def filter_shape(command_name: str, command: dict) -> str:
+    field = FILTER_FIELDS.get(command_name)
+    if field is None or field not in command:
+        return ""
+    target = command[field]
+    if command_name in ("update", "delete"):
+        target = [statement.get("q", {}) for statement in target[:1]]
+    text = json.dumps(shape(target), default=str)
+    return text if len(text) <= MAX_SHAPE_LENGTH else text[:MAX_SHAPE_LENGTH] + "…"
+
+
+class CommandMonitor(monitoring.CommandListener):
+    """Per-command counters, per-request attribution and the slow-query log"""
+
+    def __init__(self, slow_query_ms: float = SLOW_QUERY_MS):
+        self.slow_query_seconds = slow_query_ms / 1000
+        self.commands: Dict[Tuple[str, str], int] = {}
+        self.seconds: Dict[Tuple[str, str], float] = {}
+        self.failures: Dict[Tuple[str, str], int] = {}
+        # Started commands by (connection, request id); listeners run in the driver's threads
+        self._pending: Dict[tuple, dict] = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        if event.command_name in IGNORED_COMMANDS:
+            return
+        self._pending[(event.connection_id, event.request_id)] = event.command
+
+    def succeeded(self, event):
+        self._finish(event, failed=False)
+
+    def failed(self, event):
+        self._finish(event, failed=True)
+
+    def _finish(self, event, failed: bool):
+        command = self._pending.pop((event.connection_id, event.request_id), None)
+        if command is None:
+            return
+        name = event.command_name
+        collection = command.get(name) if isinstance(command.get(name), str) else ""
+        seconds = event.duration_micros / 1e6
+        key = (name, collection)
+        request = current_request.get()
+        with self._lock:
+            self.commands[key] = self.commands.get(key, 0) + 1
+            self.seconds[key] = self.seconds.get(key, 0.0) + seconds
+            if failed:
+                self.failures[key] = self.failures.get(key, 0) + 1
+            if request is not None:
+                request.calls += 1
+                request.seconds += seconds
+        if seconds >= self.slow_query_seconds:
+            logger.warning(
+                "Slow MongoDB %s on %s (%.1f ms) in %s: %s", name, collection or "-", seconds * 1000,
+                request.label if request is not None else "background", filter_shape(name, command)
+            )
+
+    def collect(self):
+        with self._lock:
+            commands, seconds, failures = dict(self.commands), dict(self.seconds), dict(self.failures)
+        return [
+            *metrics.format_family("mongo_commands_total", "counter", "MongoDB commands by name and collection",
+                                   ("command", "collection"), commands),
+            *metrics.format_family("mongo_command_seconds_total", "counter", "Time spent in MongoDB commands",
+                                   ("command", "collection"), seconds),
+            *metrics.format_family("mongo_command_failures_total", "counter", "Failed MongoDB commands",
+                                   ("command", "collection"), failures),
+        ]
+
+
+command_monitor = CommandMonitor()
+metrics.registry.register_collector(command_monitor.collect)
+db_calls = metrics.registry.register(metrics.Histogram(
+    "http_request_db_calls", "MongoDB commands per request", ("method", "route"), DB_CALL_BUCKETS))
+db_seconds = metrics.registry.register(metrics.Histogram(
+    "http_request_db_seconds", "MongoDB time per request", ("method", "route"), DB_SECONDS_BUCKETS))
+
+
+class DBMonitorMiddleware:
+    """Pure ASGI middleware opening a RequestDB for every /api request"""
+
+    def __init__(self, app, prefix: str = "/api"):
+        self.app = app
+        self.prefix = prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.prefix):
+            return await self.app(scope, receive, send)
+        request = RequestDB(f"{scope['method']} {scope['path']}")
+        token = current_request.set(request)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_request.reset(token)
+            route = scope.get("route")
+            template = route.path if route is not None else metrics.UNMATCHED_ROUTE
+            db_calls.observe(request.calls, scope["method"], template)
+            db_seconds.observe(request.seconds, scope["method"], template)
+
+
+def event_listeners() -> list:
+    """Listeners to pass to AsyncIOMotorClient (empty when monitoring is disabled)"""
+    return [command_monitor] if MONITORING_ENABLED else []
@@ -0,0 +1,335 @@
+"""
+Persistent job queue for FarchoDev Blog
+Jobs are stored in db.jobs and processed by a pool of async workers in
+every app process. Claiming is a single atomic find_one_and_update, so any
+number of processes can share the queue; a job whose worker dies is
+retried once its lock expires (or failed, if it has no attempts left).
+While a handler runs, a heartbeat keeps extending the lock; only the
+claim that holds the lock can finish the job.
+
+Handlers are registered with @handler("type") and receive (db, payload, job).
+A handler that raises is retried with exponential backoff until
+max_attempts is reached, then marked as failed.
+"""
+import asyncio
+import logging
+import os
+import random
+import time
+import uuid
+from datetime import datetime, timezone, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', '2'))
+POLL_INTERVAL_SECONDS = float(os.environ.get('JOB_POLL_INTERVAL', '1'))
+LOCK_SECONDS = int(os.environ.get('JOB_LOCK_SECONDS', '300'))
+MAX_ATTEMPTS = 5
+BACKOFF_BASE_SECONDS = 5
+BACKOFF_MAX_SECONDS = 3600
+RETENTION_DAYS = 7
+
+class LockLost(Exception):
+    """The job's lock expired and another claim took it over"""
+
+
+JobHandler = Callable[[object, dict, dict], Awaitable[Optional[dict]]]
+_handlers: Dict[str, JobHandler] = {}
+
+
+def handler(job_type: str):
+    """Register a coroutine as the handler for a job type"""
+    def register(fn: JobHandler) -> JobHandler:
+        _handlers[job_type] = fn
+        return fn
+    return register
+
+
+def backoff_seconds(attempts: int) -> float:
+    """Exponential backoff with equal jitter (at least half the ceiling)"""
+    ceiling = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** (attempts - 1))
+    return random.uniform(ceiling / 2, ceiling)
+
+
+def new_job(job_type: str, payload: dict, run_at: Optional[datetime] = None,
+            max_attempts: int = MAX_ATTEMPTS, dedupe_key: Optional[str] = None) -> dict:
+    now = datetime.now(timezone.utc)
+    job = {
+        "id": str(uuid.uuid4()),
+        "type": job_type,
+        "payload": payload,
+        "status": "queued",
+        "attempts": 0,
+        "max_attempts": max_attempts,
+        "run_at": run_at or now,
+        "created_at": now,
+        "updated_at": now,
+    }
+    if dedupe_key:
+        job["dedupe_key"] = dedupe_key
+    return job
+
+
+async def ensure_indexes(db):
+    await db.jobs.create_index([("status", 1), ("run_at", 1)])
+    await db.jobs.create_index([("status", 1), ("locked_until", 1)])
+    await db.jobs.create_index("dedupe_key", unique=True, sparse=True)
+    await db.jobs.create_index("finished_at", expireAfterSeconds=RETENTION_DAYS * 24 * 3600)
+
+
+async def enqueue(db, job_type: str, payload: dict, **options) -> str:
+    """Add one job; with dedupe_key, an existing job with the same key wins"""
+    job = new_job(job_type, payload, **options)
+    try:
+        await db.jobs.insert_one(job)
+    except DuplicateKeyError:
+        existing = await db.jobs.find_one({"dedupe_key": job["dedupe_key"]}, {"_id": 0, "id": 1})
+        return existing["id"] if existing else job["id"]
+    return job["id"]
+
+
+async def requeue(db, dedupe_key: str) -> bool:
+    """Put the finished job holding dedupe_key back in the queue with fresh attempts
+
+    A done or failed job keeps its dedupe key until the TTL removes it, so
+    enqueue() with that key would be a no-op until then.
+    """
+    now = datetime.now(timezone.utc)
+    result = await db.jobs.update_one(
+        {"dedupe_key": dedupe_key, "status": {"$in": ["done", "failed"]}},
+        {"$set": {"status": "queued", "attempts": 0, "run_at": now, "updated_at": now},
+         "$unset": {"finished_at": "", "last_error": ""}}
+    )
+    return result.modified_count > 0
+
+
+async def enqueue_many(db, jobs: List[dict]) -> int:
+    """Insert prepared jobs (see new_job) in one round-trip, skipping duplicates"""
+    if not jobs:
+        return 0
+    try:
+        result = await db.jobs.insert_many(jobs, ordered=False)
+        return len(result.inserted_ids)
+    except BulkWriteError as exc:
+        return exc.details.get("nInserted", 0)
+
+
+async def queue_stats(db) -> dict:
+    """Job counts by type and status, plus the age of the oldest runnable job"""
+    counts: Dict[str, Dict[str, int]] = {}
+    async for row in db.jobs.aggregate([
+        {"$group": {"_id": {"type": "$type", "status": "$status"}, "count": {"$sum": 1}}}
+    ]):
+        counts.setdefault(row["_id"]["type"], {})[row["_id"]["status"]] = row["count"]
+    now = datetime.now(timezone.utc)
+    oldest = await db.jobs.find_one(
+        {"status": "queued", "run_at": {"$lte": now}}, {"_id": 0, "run_at": 1}, sort=[("run_at", 1)]
+    )
+    lag = 0.0
+    if oldest:
+        run_at = oldest["run_at"]
+        if run_at.tzinfo is None:
+            run_at = run_at.replace(tzinfo=timezone.utc)
+        lag = (now - run_at).total_seconds()
+    return {"counts": counts, "queue_lag_seconds": round(lag, 3)}
+
+
+class JobMetrics:
+    """In-process counters for throughput and queue lag"""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.completed: Dict[str, int] = {}
+        self.failed: Dict[str, int] = {}
+        self.retried: Dict[str, int] = {}
+        self.run_seconds: Dict[str, float] = {}
+        self.lag_count = 0
+        self.lag_seconds_total = 0.0
+        self.lag_seconds_max = 0.0
+        self.lag_seconds_last = 0.0
+
+    def observe_lag(self, seconds: float):
+        seconds = max(seconds, 0.0)
+        self.lag_count += 1
+        self.lag_seconds_total += seconds
+        self.lag_seconds_last = seconds
+        self.lag_seconds_max = max(self.lag_seconds_max, seconds)
+
+    def observe_run(self, job_type: str, seconds: float, outcome: str):
+        bucket = {"completed": self.completed, "failed": self.failed, "retried": self.retried}[outcome]
+        bucket[job_type] = bucket.get(job_type, 0) + 1
+        self.run_seconds[job_type] = self.run_seconds.get(job_type, 0.0) + seconds
+
+    def as_dict(self) -> dict:
+        uptime = max(time.monotonic() - self.started, 1e-9)
+        completed = sum(self.completed.values())
+        return {
+            "uptime_seconds": round(uptime, 1),
+            "completed": self.completed,
+            "failed": self.failed,
+            "retried": self.retried,
+            "run_seconds": {k: round(v, 3) for k, v in self.run_seconds.items()},
+            "jobs_per_second": round(completed / uptime, 3),
+            "queue_lag_seconds": {
+                "last": round(self.lag_seconds_last, 3),
+                "avg": round(self.lag_seconds_total / self.lag_count, 3) if self.lag_count else 0.0,
+                "max": round(self.lag_seconds_max, 3),
+            },
+        }
+
+
+class JobQueue:
+    """Pool of async workers polling db.jobs"""
+
+    def __init__(self, db, workers: int = JOB_WORKERS, poll_interval: float = POLL_INTERVAL_SECONDS,
+                 lock_seconds: float = LOCK_SECONDS):
+        self.db = db
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.lock_seconds = lock_seconds
+        self.worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.metrics = JobMetrics()
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+
+    async def enqueue(self, job_type: str, payload: dict, **options) -> str:
+        job_id = await enqueue(self.db, job_type, payload, **options)
+        self._wakeup.set()
+        return job_id
+
+    async def claim(self) -> Optional[dict]:
+        now = datetime.now(timezone.utc)
+        update = {
+            "$set": {
+                "status": "running",
+                # One token per claim: two workers of this process never share a lock
+                "locked_by": f"{self.worker_id}-{uuid.uuid4().hex[:8]}",
+                "locked_until": now + timedelta(seconds=self.lock_seconds),
+                "updated_at": now,
+            },
+            "$inc": {"attempts": 1},
+        }
+        job = await self.db.jobs.find_one_and_update(
+            {"status": "queued", "run_at": {"$lte": now}},
+            update, sort=[("run_at", 1)], projection={"_id": 0},
+            return_document=ReturnDocument.AFTER
+        )
+        if job is None:
+            # Abandoned by a crashed or stopped worker: a job that keeps killing
+            # its worker must not be retried forever
+            expired = {"status": "running", "locked_until": {"$lt": now}}
+            await self.db.jobs.update_many(
+                {**expired, "$expr": {"$gte": ["$attempts", "$max_attempts"]}},
+                {"$set": {"status": "failed", "finished_at": now, "updated_at": now,
+                          "last_error": "Lock expired on the last attempt (worker crashed?)"},
+                 "$unset": {"locked_by": "", "locked_until": ""}}
+            )
+            job = await self.db.jobs.find_one_and_update(
+                {**expired, "$expr": {"$lt": ["$attempts", "$max_attempts"]}},
+                update, sort=[("locked_until", 1)], projection={"_id": 0},
+                return_document=ReturnDocument.AFTER
+            )
+        if job is not None:
+            run_at = job["run_at"]
+            if run_at.tzinfo is None:
+                run_at = run_at.replace(tzinfo=timezone.utc)
+            self.metrics.observe_lag((now - run_at).total_seconds())
+        return job
+
+    async def _heartbeat(self, job: dict, running: asyncio.Task, lock_lost: asyncio.Event):
+        """Extend the lock while the handler runs; stop the handler if the lock was taken"""
+        while True:
+            await asyncio.sleep(self.lock_seconds / 3)
+            now = datetime.now(timezone.utc)
+            result = await self.db.jobs.update_one(
+                {"id": job["id"], "locked_by": job.get("locked_by")},
+                {"$set": {"locked_until": now + timedelta(seconds=self.lock_seconds), "updated_at": now}}
+            )
+            if result.matched_count == 0:
+                logger.warning("Job %s (%s) lost its lock, stopping it", job["id"], job["type"])
+                lock_lost.set()
+                running.cancel()
+                return
+
+    async def _run_handler(self, fn: JobHandler, job: dict):
+        running = asyncio.ensure_future(fn(self.db, job["payload"], job))
+        lock_lost = asyncio.Event()
+        heartbeat = asyncio.create_task(self._heartbeat(job, running, lock_lost))
+        try:
+            return await running
+        except asyncio.CancelledError:
+            if lock_lost.is_set():
+                raise LockLost()
+            raise
+        finally:
+            heartbeat.cancel()
+
+    async def _finish(self, job: dict, update: dict):
+        """Write the outcome, but only while this claim still holds the lock"""
+        result = await self.db.jobs.update_one(
+            {"id": job["id"], "locked_by": job.get("locked_by")},
+            {**update, "$unset": {"locked_by": "", "locked_until": ""}}
+        )
+        if result is not None and result.matched_count == 0:
+            logger.warning("Job %s (%s) finished after losing its lock; outcome discarded", job["id"], job["type"])
+
+    async def run_job(self, job: dict):
+        job_type = job["type"]
+        fn = _handlers.get(job_type)
+        started = time.perf_counter()
+        try:
+            if fn is None:
+                raise RuntimeError(f"No handler registered for job type '{job_type}'")
+            result = await self._run_handler(fn, job)
+        except LockLost:
+            return
+        except Exception as exc:
+            elapsed = time.perf_counter() - started
+            now = datetime.now(timezone.utc)
+            error = f"{type(exc).__name__}: {exc}"
+            if job["attempts"] >= job.get("max_attempts", MAX_ATTEMPTS):
+                logger.error("Job %s (%s) failed permanently: %s", job["id"], job_type, error)
+                update = {"status": "failed", "finished_at": now}
+                self.metrics.observe_run(job_type, elapsed, "failed")
+            else:
+                delay = backoff_seconds(job["attempts"])
+                logger.warning("Job %s (%s) failed, retrying in %.0fs: %s", job["id"], job_type, delay, error)
+                update = {"status": "queued", "run_at": now + timedelta(seconds=delay)}
+                self.metrics.observe_run(job_type, elapsed, "retried")
+            await self._finish(job, {"$set": {**update, "last_error": error, "updated_at": now}})
+            return
+        elapsed = time.perf_counter() - started
+        now = datetime.now(timezone.utc)
+        self.metrics.observe_run(job_type, elapsed, "completed")
+        await self._finish(job, {"$set": {"status": "done", "finished_at": now, "updated_at": now, "result": result}})
+
+    async def _worker(self):
+        while True:
+            try:
+                job = await self.claim()
+            except Exception:
+                logger.exception("Failed to claim job")
+                job = None
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self.run_job(job)
+
+    def start(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Cancel workers; interrupted jobs are picked up again when their lock expires"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
@@ -0,0 +1,129 @@
+"""
+Event-loop lag monitor for FarchoDev Blog
+A background task sleeps for LOOP_LAG_INTERVAL seconds and measures how
+late it wakes up: that delay is how long every other request also waited
+for the loop (bcrypt, CSV building, big loops inside async handlers...).
+Lag is exported as the event_loop_lag_seconds histogram.
+
+With LOOP_WATCHDOG_ENABLED=true (debug), a watchdog thread checks the
+task's heartbeat and, when the loop has been stuck for more than
+LOOP_BLOCK_THRESHOLD_MS, logs the stack of the loop thread: the code that
+is blocking it, caught in the act.
+"""
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime, timezone
+from typing import Optional
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+LOOP_MONITOR_ENABLED = os.environ.get('LOOP_MONITOR_ENABLED', 'true').lower() == 'true'
+LAG_INTERVAL_SECONDS = float(os.environ.get('LOOP_LAG_INTERVAL', '0.5'))
+WATCHDOG_ENABLED = os.environ.get('LOOP_WATCHDOG_ENABLED', 'false').lower() == 'true'
+BLOCK_THRESHOLD_SECONDS = float(os.environ.get('LOOP_BLOCK_THRESHOLD_MS', '200')) / 1000
+MAX_STALLS_KEPT = 20
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+loop_lag = metrics.registry.register(metrics.Histogram(
+    "event_loop_lag_seconds", "Delay of the event loop in running a scheduled callback", (), LAG_BUCKETS))
+
+
+class LoopMonitor:
+    def __init__(self, interval: float = LAG_INTERVAL_SECONDS, block_threshold: float = BLOCK_THRESHOLD_SECONDS,
+                 watchdog: bool = WATCHDOG_ENABLED):
+        self.interval = interval
+        self.block_threshold = block_threshold
+        self.watchdog = watchdog
+        self.lag_last = 0.0
+        self.lag_max = 0.0
+        self.blocked = 0
+        self.stalls: deque = deque(maxlen=MAX_STALLS_KEPT)
+        self._heartbeat = time.monotonic()
+        self._reported_heartbeat: Optional[float] = None
+        self._loop_thread: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    def observe(self, lag: float):
+        self.lag_last = lag
+        self.lag_max = max(self.lag_max, lag)
+        loop_lag.observe(lag)
+
+    async def run(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._heartbeat = now
+            self.observe(max(now - expected, 0.0))
+
+    def check(self):
+        """Watchdog step: dump the loop thread's stack once per stall"""
+        heartbeat = self._heartbeat
+        stalled = time.monotonic() - heartbeat - self.interval
+        if stalled < self.block_threshold or self._reported_heartbeat == heartbeat:
+            return
+        self._reported_heartbeat = heartbeat
+        frame = sys._current_frames().get(self._loop_thread)
+        stack = "".join(traceback.format_stack(frame)) if frame is not None else ""
+        self.blocked += 1
+        self.stalls.append({
+            "detected_at": datetime.now(timezone.utc).isoformat(),
+            "blocked_ms": round(stalled * 1000, 1),
+            "stack": stack,
+        })
+        logger.warning("Event loop blocked for more than %.0f ms, at:\n%s", stalled * 1000, stack)
+
+    def _watch(self):
+        while not self._stopping.wait(self.block_threshold / 4):
+            self.check()
+
+    def as_dict(self) -> dict:
+        return {
+            "interval_seconds": self.interval,
+            "lag_ms_last": round(self.lag_last * 1000, 3),
+            "lag_ms_max": round(self.lag_max * 1000, 3),
+            "watchdog": self.watchdog,
+            "block_threshold_ms": round(self.block_threshold * 1000, 1),
+            "blocked": self.blocked,
+            "recent_stalls": list(self.stalls),
+        }
+
+    def collect(self):
+        return [
+            *metrics.format_family("event_loop_lag_max_seconds", "gauge", "Largest event loop lag seen",
+                                   (), {(): self.lag_max}),
+            *metrics.format_family("event_loop_blocked_total", "counter",
+                                   "Times the watchdog caught the loop blocked over the threshold",
+                                   (), {(): self.blocked}),
+        ]
+
+    def start(self):
+        if not LOOP_MONITOR_ENABLED or self._task is not None:
+            return
+        self._loop_thread = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._task = asyncio.create_task(self.run())
+        if self.watchdog:
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+            self._thread.start()
+
+    async def stop(self):
+        if self._thread is not None:
+            self._stopping.set()
+            self._thread.join()
+            self._thread = None
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
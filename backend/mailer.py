@@ -0,0 +1,76 @@
+"""
+SMTP delivery for FarchoDev Blog
+Sends a batch of messages over a single SMTP connection. smtplib is
+blocking, so batches run in a worker thread to keep the event loop free.
+
+For local development run the stand-in server: python smtp_sink.py
+"""
+import asyncio
+import os
+import smtplib
+from email.message import EmailMessage
+from typing import List, Tuple
+
+SMTP_HOST = os.environ.get('SMTP_HOST', 'localhost')
+SMTP_PORT = int(os.environ.get('SMTP_PORT', '1025'))
+SMTP_USER = os.environ.get('SMTP_USER', '')
+SMTP_PASSWORD = os.environ.get('SMTP_PASSWORD', '')
+SMTP_STARTTLS = os.environ.get('SMTP_STARTTLS', 'false').lower() == 'true'
+SMTP_TIMEOUT_SECONDS = 30
+MAIL_FROM = os.environ.get('NEWSLETTER_FROM', 'FarchoDev Blog <newsletter@farchodev.com>')
+
+
+def build_message(recipient: str, subject: str, text: str, html: str) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = MAIL_FROM
+    message["To"] = recipient
+    message["Subject"] = subject
+    message.set_content(text)
+    message.add_alternative(html, subtype="html")
+    return message
+
+
+class PartialDelivery(Exception):
+    """The connection failed after the first `handled` recipients were sent or refused"""
+
+    def __init__(self, handled: int, sent: int, refused: List[str], error: Exception):
+        super().__init__(f"{type(error).__name__}: {error} (after {handled} recipients)")
+        self.handled = handled
+        self.sent = sent
+        self.refused = refused
+
+
+def _send_batch_sync(recipients: List[str], subject: str, text: str, html: str) -> Tuple[int, List[str]]:
+    sent = 0
+    refused = []
+    try:
+        with smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=SMTP_TIMEOUT_SECONDS) as smtp:
+            if SMTP_STARTTLS:
+                smtp.starttls()
+            if SMTP_USER:
+                smtp.login(SMTP_USER, SMTP_PASSWORD)
+            for recipient in recipients:
+                try:
+                    smtp.send_message(build_message(recipient, subject, text, html))
+                    sent += 1
+                except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError):
+                    # Per-recipient rejection: retrying the batch would not help
+                    refused.append(recipient)
+    except (smtplib.SMTPException, OSError) as exc:
+        handled = sent + len(refused)
+        if handled == 0:
+            raise
+        if handled < len(recipients):
+            raise PartialDelivery(handled, sent, refused, exc) from exc
+        # Every message was handled; only closing the connection failed
+    return sent, refused
+
+
+async def send_batch(recipients: List[str], subject: str, text: str, html: str) -> Tuple[int, List[str]]:
+    """Send one message per recipient over one connection; returns (sent, refused)
+
+    Connection-level failures raise, so the calling job is retried. When
+    some recipients were already handled the error is a PartialDelivery,
+    which tells the caller where a retry has to resume.
+    """
+    return await asyncio.to_thread(_send_batch_sync, recipients, subject, text, html)
@@ -0,0 +1,243 @@
+"""
+Request metrics for FarchoDev Blog (Prometheus text exposition format)
+MetricsMiddleware counts every /api request by method, route template and
+status, and records its latency in a fixed-bucket histogram; /metrics
+serves them together with the counters the other modules already keep
+(rate limiting, spam filter, jobs, newsletter delivery, rendering).
+
+Recording is a dict lookup plus a bisect per request; see
+`python metrics.py --bench` for the measured middleware overhead.
+"""
+import asyncio
+import math
+import os
+import sys
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')  # If set, /metrics requires "Authorization: Bearer <token>"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+UNMATCHED_ROUTE = "unmatched"  # 404s and responses sent by middleware, kept as one series
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+def format_family(name: str, kind: str, help_text: str, labelnames: Sequence[str],
+                  values: Dict[Tuple[str, ...], float]) -> List[str]:
+    """Exposition lines for a counter or gauge kept elsewhere as {label values: number}"""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    for label_values, value in sorted(values.items()):
+        lines.append(f"{name}{_labels(labelnames, label_values)} {_number(value)}")
+    return lines
+
+
+class Histogram:
+    """Fixed buckets; per label set: one count per bucket (+Inf last), then sum"""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *labels: str):
+        series = self.values.get(labels)
+        if series is None:
+            series = self.values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        bounds = self.buckets + (math.inf,)
+        for label_values, series in sorted(self.values.items()):
+            cumulative = 0
+            for bound, count in zip(bounds, series):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, label_values, le)} {cumulative}")
+            suffix = _labels(self.labelnames, label_values)
+            lines.append(f"{self.name}_sum{suffix} {_number(series[-1])}")
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: list = []
+        self.collectors: List[Callable[[], Iterable[str]]] = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Callable[[], Iterable[str]]):
+        """Called at scrape time; returns exposition lines (see format_family)"""
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self.metrics:
+            lines.extend(metric.collect())
+        for collector in self.collectors:
+            lines.extend(collector())
+        return "\n".join(lines) + "\n"
+
+
+class RequestMetrics:
+    """Request count, latency histogram and in-flight gauge from a single series per
+    (method, route, status): one dict lookup and one bisect per request"""
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.in_progress = 0
+        self.series: Dict[Tuple[str, str, str], List[float]] = {}
+
+    def observe(self, method: str, route: str, status: str, seconds: float):
+        key = (method, route, status)
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, seconds)] += 1
+        series[-1] += seconds
+
+    def collect(self) -> List[str]:
+        requests = {key: sum(series[:-1]) for key, series in self.series.items()}
+        latency = Histogram("http_request_duration_seconds", "HTTP request latency by method and route",
+                            ("method", "route"), self.buckets)
+        for (method, route, _), series in self.series.items():
+            merged = latency.values.setdefault((method, route), [0] * len(series))
+            for i, value in enumerate(series):
+                merged[i] += value
+        return (
+            format_family("http_requests_total", "counter", "HTTP requests by method, route and status",
+                          ("method", "route", "status"), requests)
+            + latency.collect()
+            + format_family("http_requests_in_progress", "gauge", "HTTP requests currently being served",
+                            (), {(): self.in_progress})
+        )
+
+
+registry = Registry()
+request_metrics = registry.register(RequestMetrics())
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording count, status and latency of every /api request"""
+
+    def __init__(self, app, prefix: str = "/api", recorder: RequestMetrics = request_metrics):
+        self.app = app
+        self.prefix = prefix
+        self.recorder = recorder
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.prefix):
+            return await self.app(scope, receive, send)
+        status = 500  # Unless the app gets to send a response
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        recorder = self.recorder
+        recorder.in_progress += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            recorder.in_progress -= 1
+            # The router stores the matched route in the (shared) scope; its template
+            # keeps /api/posts/{slug} as one series instead of one per slug
+            route = scope.get("route")
+            recorder.observe(scope["method"], route.path if route is not None else UNMATCHED_ROUTE,
+                             str(status), elapsed)
+
+
+def authorized(authorization: str) -> bool:
+    return not METRICS_TOKEN or authorization == f"Bearer {METRICS_TOKEN}"
+
+
+# ============================================================================
+# BENCHMARK
+# ============================================================================
+
+async def _bench_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def _run(app, scope, requests: int) -> float:
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    started = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(scope), receive, send)
+    return time.perf_counter() - started
+
+
+def measure_overhead(requests: int = 100_000) -> dict:
+    """Microseconds the middleware adds per request, against the bare ASGI app"""
+    class Route:
+        path = "/api/posts/{slug}"
+
+    scope = {"type": "http", "method": "GET", "path": "/api/posts/hola", "route": Route()}
+    wrapped = MetricsMiddleware(_bench_app)
+
+    async def compare():
+        await _run(wrapped, scope, 1000)  # Warm up
+        bare = min([await _run(_bench_app, scope, requests) for _ in range(3)])
+        instrumented = min([await _run(wrapped, scope, requests) for _ in range(3)])
+        return bare, instrumented
+
+    bare, instrumented = asyncio.run(compare())
+    return {
+        "requests": requests,
+        "bare_us": round(bare / requests * 1e6, 3),
+        "instrumented_us": round(instrumented / requests * 1e6, 3),
+        "overhead_us": round((instrumented - bare) / requests * 1e6, 3),
+    }
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] != "--bench":
+        print("📖 USO:")
+        print("  python metrics.py --bench [requests]   # Overhead del middleware por request")
+        print("")
+        print("Las métricas se sirven en GET /metrics (formato de texto Prometheus)")
+        return
+    requests = int(sys.argv[2]) if len(sys.argv) > 2 else 100_000
+    result = measure_overhead(requests)
+    print(f"📊 {result['requests']} requests")
+    print(f"   Sin middleware: {result['bare_us']} µs/request")
+    print(f"   Con middleware: {result['instrumented_us']} µs/request")
+    print(f"   Overhead:       {result['overhead_us']} µs/request")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Bulk comment moderation for FarchoDev Blog
+Approve, reject or delete many comments in one admin request. Each action
+runs as a handful of update_many/delete_many/bulk operations and bumps the
+stats counters once per batch instead of once per comment.
+
+Rejected comments are archived in db.rejected_comments before being
+removed, so they remain available as spam examples. Deleting a comment that
+was never approved counts as rejecting it: an admin removing pending
+comments is the main source of spam labels.
+"""
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from pymongo.errors import BulkWriteError
+
+import pagination
+import stats
+
+ACTIONS = ("approve", "reject", "delete")
+# Comments also store the author email lower-cased, so the moderation filter
+# and the admin listing match emails the same way and can both use an index
+AUTHOR_EMAIL_KEY = "author_email_lc"
+MAX_IDS = 5000
+REJECT_BATCH_SIZE = 1000
+REJECTED_PROJECTION = {
+    "_id": 0, "id": 1, "post_id": 1, "user_id": 1, "author_name": 1,
+    "author_email": 1, AUTHOR_EMAIL_KEY: 1, "content": 1, "created_at": 1, "approved": 1,
+}
+
+
+def author_email_key(email: str) -> str:
+    """Value stored in author_email_lc and used to filter on it"""
+    return email.strip().lower()
+
+
+async def ensure_indexes(db):
+    # Comments written before author_email_lc existed are backfilled once
+    if f"{AUTHOR_EMAIL_KEY}_1" not in await db.comments.index_information():
+        await db.comments.update_many(
+            {AUTHOR_EMAIL_KEY: {"$exists": False}},
+            [{"$set": {AUTHOR_EMAIL_KEY: {"$toLower": {"$trim": {"input": "$author_email"}}}}}]
+        )
+    await db.comments.create_index(AUTHOR_EMAIL_KEY)
+    await db.rejected_comments.create_index("id", unique=True)
+    await db.rejected_comments.create_index([("rejected_at", -1)])
+
+
+def build_query(ids: Optional[List[str]] = None, status: Optional[str] = None,
+                post_id: Optional[str] = None, email: Optional[str] = None,
+                date_from: Optional[datetime] = None, date_to: Optional[datetime] = None) -> dict:
+    """Comment selector from an ID list and/or filters
+
+    Raises ValueError for an empty selector, so a bulk action can never
+    silently target every comment.
+    """
+    query = pagination.date_range("created_at", date_from, date_to)
+    if ids is not None:
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            raise ValueError("ids must not be empty")
+        if len(ids) > MAX_IDS:
+            raise ValueError(f"At most {MAX_IDS} ids per request")
+        query["id"] = {"$in": ids}
+    if status is not None:
+        if status not in ("pending", "approved"):
+            raise ValueError("status must be 'pending' or 'approved'")
+        query["approved"] = status == "approved"
+    if post_id:
+        query["post_id"] = post_id
+    if email and email.strip():
+        query[AUTHOR_EMAIL_KEY] = author_email_key(email)
+    if not query:
+        raise ValueError("Provide ids or at least one filter")
+    return query
+
+
+async def approve(db, query: dict) -> dict:
+    if query.get("approved") is True:
+        return {"matched": 0, "modified": 0}
+    result = await db.comments.update_many({**query, "approved": False}, {"$set": {"approved": True}})
+    await stats.bump(db, pending_comments=-result.modified_count)
+    return {"matched": result.matched_count, "modified": result.modified_count}
+
+
+async def delete(db, query: dict) -> dict:
+    # Pending comments are archived as rejections; approved ones are just removed.
+    # One delete_many for the approved state gives exact counter deltas without a read
+    pending = approved = 0
+    if query.get("approved") is not True:
+        pending = (await reject(db, {**query, "approved": False}))["matched"]
+    if query.get("approved") is not False:
+        approved = (await db.comments.delete_many({**query, "approved": True})).deleted_count
+    await stats.bump(db, total_comments=-approved)
+    return {"matched": pending + approved, "modified": pending + approved}
+
+
+async def reject(db, query: dict, batch_size: int = REJECT_BATCH_SIZE) -> dict:
+    """Archive matching comments in db.rejected_comments, then delete them"""
+    removed = 0
+    now = datetime.now(timezone.utc).isoformat()
+    while True:
+        # Each pass removes what it read, so re-querying walks the whole match
+        batch = await db.comments.find(query, REJECTED_PROJECTION).limit(batch_size).to_list(batch_size)
+        if not batch:
+            break
+        for comment in batch:
+            comment["rejected_at"] = now
+        try:
+            await db.rejected_comments.insert_many(batch, ordered=False)
+        except BulkWriteError as exc:
+            # Already archived by an earlier, interrupted run
+            if any(err.get("code") != 11000 for err in exc.details.get("writeErrors", [])):
+                raise
+        pending_ids = [c["id"] for c in batch if not c.get("approved")]
+        approved_ids = [c["id"] for c in batch if c.get("approved")]
+        pending = (await db.comments.delete_many({"id": {"$in": pending_ids}})).deleted_count if pending_ids else 0
+        approved = (await db.comments.delete_many({"id": {"$in": approved_ids}})).deleted_count if approved_ids else 0
+        await stats.bump(db, total_comments=-(pending + approved), pending_comments=-pending)
+        removed += pending + approved
+        if len(batch) < batch_size:
+            break
+    return {"matched": removed, "modified": removed}
+
+
+async def apply(db, action: str, query: dict) -> dict:
+    if action not in ACTIONS:
+        raise ValueError(f"action must be one of {', '.join(ACTIONS)}")
+    return await {"approve": approve, "reject": reject, "delete": delete}[action](db, query)
@@ -0,0 +1,587 @@
+"""
+Newsletter subscribers and delivery for FarchoDev Blog
+Exports stream subscribers straight from the Motor cursor in batches, so
+memory use is constant and there is no row cap. Imports read a streamed
+upload line by line and apply unordered bulk upserts in batches.
+New-post announcements are delivered through the job queue (jobs.py).
+
+Formats: csv (default), ndjson, parquet (export only, needs pandas + pyarrow)
+"""
+import codecs
+import csv
+import html
+import io
+import json
+import logging
+import os
+import re
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from typing import AsyncIterator, Iterable, List, Optional, Tuple
+
+from pymongo import DeleteMany, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, OperationFailure
+
+import jobs
+import mailer
+import stats
+
+logger = logging.getLogger(__name__)
+EXPORT_BATCH_SIZE = 2000
+EXPORT_PROJECTION = {"_id": 0, "email": 1, "subscribed_at": 1, "active": 1}
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+CSV_HEADER = ['Email', 'Fecha de Suscripción', 'Estado']
+
+IMPORT_BATCH_SIZE = 1000
+IMPORT_FORMATS = ("csv", "ndjson")
+MAX_REPORTED_ERRORS = 1000
+EMAIL_PATTERN = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+
+
+ANNOUNCEMENTS_ENABLED = os.environ.get('NEWSLETTER_ANNOUNCEMENTS', 'false').lower() == 'true'
+RECIPIENTS_PER_JOB = int(os.environ.get('NEWSLETTER_RECIPIENTS_PER_JOB', '100'))
+SITE_URL = os.environ.get('SITE_URL', 'http://localhost:3000')
+
+
+async def ensure_indexes(db):
+    await db.newsletter.create_index([("active", 1), ("subscribed_at", -1)])
+    # Full exports (include_inactive) sort every subscriber by date
+    await db.newsletter.create_index([("subscribed_at", -1)])
+    # Unique email keeps subscribe and import from creating duplicates; older
+    # databases stored emails as typed, so they are merged once before that
+    try:
+        indexes = await db.newsletter.index_information()
+        if not indexes.get("email_1", {}).get("unique"):
+            merged = await merge_email_duplicates(db)
+            if merged:
+                logger.info("Normalized %d newsletter email groups", merged)
+                await stats.rebuild_stats(db)
+            if "email_1" in indexes:
+                await db.newsletter.drop_index("email_1")
+        await db.newsletter.create_index("email", unique=True)
+    except OperationFailure as exc:
+        logger.warning("Could not create unique newsletter email index: %s", exc)
+    await db.newsletter_campaigns.create_index("post_id", unique=True)
+
+
+def _merge_operations(group: dict) -> list:
+    """Writes that collapse one case-insensitive email group into one subscriber
+
+    The oldest subscription is kept (its id and date), it stays active if
+    any of the copies was, and the email is stored in canonical form.
+    """
+    docs = sorted(group["docs"], key=lambda doc: str(doc.get("subscribed_at") or ""))
+    keep, extras = docs[0], docs[1:]
+    operations = []
+    if extras:
+        operations.append(DeleteMany({"_id": {"$in": [doc["_id"] for doc in extras]}}))
+    operations.append(UpdateOne(
+        {"_id": keep["_id"]},
+        {"$set": {"email": group["_id"], "active": any(doc.get("active", True) for doc in docs)}}
+    ))
+    return operations
+
+
+async def merge_email_duplicates(db) -> int:
+    """One-off migration: store every email in canonical form, one per address
+
+    Only groups with copies or a non-canonical spelling are touched.
+    Returns the number of groups rewritten.
+    """
+    pipeline = [
+        {"$group": {
+            "_id": {"$toLower": {"$trim": {"input": "$email"}}},
+            "docs": {"$push": {"_id": "$_id", "email": "$email", "active": "$active", "subscribed_at": "$subscribed_at"}},
+            "count": {"$sum": 1},
+            "mismatched": {"$max": {"$ne": ["$email", {"$toLower": {"$trim": {"input": "$email"}}}]}},
+        }},
+        {"$match": {"$or": [{"count": {"$gt": 1}}, {"mismatched": True}]}},
+    ]
+    operations = []
+    groups = 0
+    async for group in db.newsletter.aggregate(pipeline, allowDiskUse=True):
+        operations.extend(_merge_operations(group))
+        groups += 1
+        if len(operations) >= IMPORT_BATCH_SIZE:
+            await db.newsletter.bulk_write(operations, ordered=True)
+            operations = []
+    if operations:
+        await db.newsletter.bulk_write(operations, ordered=True)
+    return groups
+
+
+def export_cursor(db, include_inactive: bool = False, batch_size: int = EXPORT_BATCH_SIZE):
+    """Subscribers cursor, newest first
+
+    Active-only exports use the active/subscribed_at index; full exports
+    use the subscribed_at index, so neither needs an in-memory sort.
+    """
+    query = {} if include_inactive else {"active": True}
+    return db.newsletter.find(query, EXPORT_PROJECTION).sort("subscribed_at", -1).batch_size(batch_size)
+
+
+async def batched(docs: AsyncIterator[dict], size: int) -> AsyncIterator[List[dict]]:
+    batch = []
+    async for doc in docs:
+        batch.append(doc)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _as_datetime(value) -> Optional[datetime]:
+    if isinstance(value, str):
+        return datetime.fromisoformat(value)
+    return value
+
+
+def _csv_text(rows: Iterable[list]) -> str:
+    output = io.StringIO()
+    csv.writer(output).writerows(rows)
+    return output.getvalue()
+
+
+async def csv_chunks(docs: AsyncIterator[dict], batch_size: int = EXPORT_BATCH_SIZE) -> AsyncIterator[str]:
+    yield _csv_text([CSV_HEADER])
+    async for batch in batched(docs, batch_size):
+        rows = []
+        for sub in batch:
+            subscribed_date = _as_datetime(sub.get('subscribed_at'))
+            formatted_date = subscribed_date.strftime('%Y-%m-%d %H:%M:%S') if subscribed_date else 'N/A'
+            status = 'Activo' if sub.get('active', True) else 'Inactivo'
+            rows.append([sub['email'], formatted_date, status])
+        yield _csv_text(rows)
+
+
+async def ndjson_chunks(docs: AsyncIterator[dict], batch_size: int = EXPORT_BATCH_SIZE) -> AsyncIterator[str]:
+    async for batch in batched(docs, batch_size):
+        yield "".join(
+            json.dumps({
+                "email": sub["email"],
+                "subscribed_at": sub["subscribed_at"].isoformat() if isinstance(sub.get("subscribed_at"), datetime) else sub.get("subscribed_at"),
+                "active": sub.get("active", True),
+            }, ensure_ascii=False) + "\n"
+            for sub in batch
+        )
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands out whatever was written since the last drain"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+def parquet_available() -> bool:
+    try:
+        import pandas  # noqa: F401
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+async def parquet_chunks(docs: AsyncIterator[dict], batch_size: int = EXPORT_BATCH_SIZE) -> AsyncIterator[bytes]:
+    """One Parquet row group per batch, flushed to the client as it is written"""
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("email", pa.string()),
+        ("subscribed_at", pa.timestamp("us", tz="UTC")),
+        ("active", pa.bool_()),
+    ])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        async for batch in batched(docs, batch_size):
+            frame = pd.DataFrame(batch, columns=["email", "subscribed_at", "active"])
+            frame["subscribed_at"] = pd.to_datetime(frame["subscribed_at"], utc=True, format="ISO8601")
+            frame["active"] = frame["active"].fillna(True).astype(bool)
+            writer.write_table(pa.Table.from_pandas(frame, schema=schema, preserve_index=False))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def export_chunks(export_format: str, docs: AsyncIterator[dict], batch_size: int = EXPORT_BATCH_SIZE):
+    if export_format == "ndjson":
+        return ndjson_chunks(docs, batch_size)
+    if export_format == "parquet":
+        return parquet_chunks(docs, batch_size)
+    return csv_chunks(docs, batch_size)
+
+
+# ============================================================================
+# BULK IMPORT
+# ============================================================================
+
+def canonical_email(email: str) -> str:
+    """The form subscriber emails are stored and looked up in"""
+    return email.strip().lower()
+
+
+def normalize_email(value) -> Optional[str]:
+    """Trimmed, lower-cased email, or None if it does not look like one"""
+    if not isinstance(value, str):
+        return None
+    email = canonical_email(value.strip().strip('"'))
+    return email if EMAIL_PATTERN.match(email) else None
+
+
+async def iter_lines(byte_chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Decode a streamed upload into lines without buffering the whole body"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    pending = ""
+    async for chunk in byte_chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+
+class _LineFeed:
+    """Lines for a csv.reader, appended as they arrive from the upload"""
+
+    def __init__(self):
+        self.lines = deque()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        if not self.lines:
+            raise StopIteration
+        return self.lines.popleft()
+
+
+async def _then_end(lines: AsyncIterator[str]) -> AsyncIterator[Optional[str]]:
+    async for line in lines:
+        yield line
+    yield None
+
+
+async def _iter_csv_rows(lines: AsyncIterator[str]) -> AsyncIterator[Tuple[int, object]]:
+    # One reader over the whole stream, so quoted fields may span lines. It is
+    # only advanced once the buffered lines hold balanced quotes (a complete
+    # record); rows are numbered by the physical line each record starts on.
+    feed = _LineFeed()
+    reader = csv.reader(feed)
+    email_column = 0
+    quotes = 0
+    async for line in _then_end(lines):
+        if line is not None:
+            feed.lines.append(line + "\n")
+            quotes += line.count('"')
+            if quotes % 2:
+                continue
+            quotes = 0
+        # At the end (None) an unclosed quote yields what was read of the record
+        while feed.lines:
+            row_number = reader.line_num + 1
+            fields = next(reader)
+            if not any(field.strip() for field in fields):
+                continue
+            if row_number == 1:
+                lowered = [field.strip().lower() for field in fields]
+                header = next((i for i, field in enumerate(lowered) if field in ("email", "e-mail", "correo")), None)
+                if header is not None:
+                    email_column = header
+                    continue
+            yield row_number, fields[email_column] if email_column < len(fields) else None
+
+
+async def iter_import_rows(lines: AsyncIterator[str], import_format: str) -> AsyncIterator[Tuple[int, object]]:
+    """(row number, raw email value) pairs; a CSV header row is skipped"""
+    if import_format != "ndjson":
+        async for row in _iter_csv_rows(lines):
+            yield row
+        return
+    row_number = 0
+    async for line in lines:
+        row_number += 1
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield row_number, ValueError("Invalid JSON")
+            continue
+        yield row_number, record.get("email") if isinstance(record, dict) else record
+
+
+class ImportReport:
+    """Per-import counters plus a capped list of per-row errors"""
+
+    def __init__(self):
+        self.rows = 0
+        self.inserted = 0
+        self.reactivated = 0
+        self.unchanged = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.failed = 0
+        self.errors: List[dict] = []
+        self._started = time.perf_counter()
+
+    def error(self, row: int, value, message: str):
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row, "value": value if isinstance(value, str) else None, "error": message})
+
+    def as_dict(self) -> dict:
+        elapsed = time.perf_counter() - self._started
+        return {
+            "rows": self.rows,
+            "inserted": self.inserted,
+            "reactivated": self.reactivated,
+            "unchanged": self.unchanged,
+            "duplicates": self.duplicates,
+            "invalid": self.invalid,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": len(self.errors) >= MAX_REPORTED_ERRORS,
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_second": round(self.rows / elapsed, 1) if elapsed > 0 else None,
+        }
+
+
+async def _apply_batch(db, batch: List[Tuple[int, str]], report: ImportReport):
+    now = datetime.now(timezone.utc).isoformat()
+    operations = [
+        UpdateOne(
+            {"email": email},
+            {
+                "$set": {"active": True},
+                "$setOnInsert": {"id": str(uuid.uuid4()), "email": email, "subscribed_at": now},
+            },
+            upsert=True
+        )
+        for _, email in batch
+    ]
+    try:
+        result = (await db.newsletter.bulk_write(operations, ordered=False)).bulk_api_result
+    except BulkWriteError as exc:
+        result = exc.details
+        for write_error in result.get("writeErrors", []):
+            row, email = batch[write_error["index"]]
+            report.failed += 1
+            report.error(row, email, write_error.get("errmsg", "Write failed"))
+    inserted = result.get("nUpserted", 0)
+    modified = result.get("nModified", 0)
+    report.inserted += inserted
+    report.reactivated += modified
+    report.unchanged += result.get("nMatched", 0) - modified
+    await stats.bump(db, total_subscribers=inserted + modified)
+
+
+async def import_subscribers(db, byte_chunks: AsyncIterator[bytes], import_format: str = "csv",
+                             batch_size: int = IMPORT_BATCH_SIZE) -> dict:
+    """Normalize, dedupe and upsert subscribers from a streamed CSV/NDJSON body
+
+    New emails are inserted as active, inactive ones are reactivated and
+    active ones are left untouched.
+    """
+    report = ImportReport()
+    seen = set()
+    batch: List[Tuple[int, str]] = []
+    async for row, value in iter_import_rows(iter_lines(byte_chunks), import_format):
+        report.rows += 1
+        if isinstance(value, Exception):
+            report.invalid += 1
+            report.error(row, None, str(value))
+            continue
+        email = normalize_email(value)
+        if email is None:
+            report.invalid += 1
+            report.error(row, value, "Invalid email")
+            continue
+        if email in seen:
+            report.duplicates += 1
+            continue
+        seen.add(email)
+        batch.append((row, email))
+        if len(batch) >= batch_size:
+            await _apply_batch(db, batch, report)
+            batch = []
+    if batch:
+        await _apply_batch(db, batch, report)
+    return report.as_dict()
+
+
+# ============================================================================
+# NEW-POST ANNOUNCEMENTS
+# ============================================================================
+
+class DeliveryMetrics:
+    """Emails sent by this process (exposed through /api/admin/jobs/stats)"""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.sent = 0
+        self.refused = 0
+        self.send_seconds = 0.0
+
+    def as_dict(self) -> dict:
+        uptime = max(time.monotonic() - self.started, 1e-9)
+        return {
+            "emails_sent": self.sent,
+            "emails_refused": self.refused,
+            "send_seconds": round(self.send_seconds, 3),
+            "emails_per_second": round(self.sent / self.send_seconds, 1) if self.send_seconds else 0.0,
+            "emails_per_second_uptime": round(self.sent / uptime, 3),
+        }
+
+
+delivery_metrics = DeliveryMetrics()
+
+
+async def announce_post(db, post_id: str):
+    """Queue the announcement of a newly published post (no-op if disabled)"""
+    if not ANNOUNCEMENTS_ENABLED:
+        return None
+    return await jobs.enqueue(
+        db, "newsletter.announce", {"post_id": post_id},
+        dedupe_key=f"newsletter.announce:{post_id}"
+    )
+
+
+def render_announcement(post: dict) -> dict:
+    """Subject and bodies, rendered once per post and shared by every batch"""
+    url = f"{SITE_URL}/post/{post['slug']}"
+    title = post["title"]
+    excerpt = post.get("excerpt", "")
+    return {
+        "subject": f"Nuevo post: {title}",
+        "text": f"{title}\n\n{excerpt}\n\nLeer más: {url}\n",
+        "html": (
+            f"<h1>{html.escape(title)}</h1>"
+            f"<p>{html.escape(excerpt)}</p>"
+            f'<p><a href="{html.escape(url)}">Leer más</a></p>'
+        ),
+    }
+
+
+@jobs.handler("newsletter.announce")
+async def _announce(db, payload: dict, job: dict) -> dict:
+    """Render the campaign once, then fan out one send job per recipient chunk"""
+    post = await db.posts.find_one(
+        {"id": payload["post_id"], "published": True},
+        {"_id": 0, "id": 1, "title": 1, "slug": 1, "excerpt": 1}
+    )
+    if not post:
+        return {"skipped": "post not found or unpublished"}
+
+    campaign = await db.newsletter_campaigns.find_one_and_update(
+        {"post_id": post["id"]},
+        {"$setOnInsert": {
+            "id": str(uuid.uuid4()),
+            "post_id": post["id"],
+            **render_announcement(post),
+            "sent": 0,
+            "refused": 0,
+            "created_at": datetime.now(timezone.utc),
+        }},
+        upsert=True, projection={"_id": 0, "id": 1, "fanned_out_at": 1}, return_document=ReturnDocument.AFTER
+    )
+    # Job dedupe keys expire with the jobs; the campaign document is permanent
+    if campaign.get("fanned_out_at"):
+        return {"skipped": "already announced", "campaign_id": campaign["id"]}
+
+    # Deterministic chunks + dedupe keys make a retried fan-out idempotent, as long
+    # as the active subscribers did not change between attempts: a subscribe or
+    # unsubscribe in between shifts the _id boundaries, so a chunk whose job
+    # already exists keeps its old recipients and the new chunk N may skip or
+    # repeat a few addresses. Once a job is enqueued its recipient list is fixed.
+    chunks = 0
+    recipients = 0
+    pending: List[dict] = []
+    cursor = db.newsletter.find({"active": True}, {"_id": 1, "email": 1}).sort("_id", 1)
+    async for batch in batched(cursor, RECIPIENTS_PER_JOB):
+        pending.append(jobs.new_job(
+            "newsletter.send_batch",
+            {"campaign_id": campaign["id"], "batch": chunks, "recipients": [sub["email"] for sub in batch]},
+            dedupe_key=f"newsletter.batch:{campaign['id']}:{chunks}"
+        ))
+        chunks += 1
+        recipients += len(batch)
+        if len(pending) >= 100:
+            await jobs.enqueue_many(db, pending)
+            pending = []
+    await jobs.enqueue_many(db, pending)
+
+    await db.newsletter_campaigns.update_one(
+        {"id": campaign["id"]},
+        {"$set": {"recipients": recipients, "batches": chunks, "fanned_out_at": datetime.now(timezone.utc)}}
+    )
+    return {"campaign_id": campaign["id"], "recipients": recipients, "batches": chunks}
+
+
+def _observe_delivery(started: float, sent: int, refused: List[str]):
+    delivery_metrics.send_seconds += time.perf_counter() - started
+    delivery_metrics.sent += sent
+    delivery_metrics.refused += len(refused)
+
+
+@jobs.handler("newsletter.send_batch")
+async def _send_batch(db, payload: dict, job: dict) -> dict:
+    campaign = await db.newsletter_campaigns.find_one(
+        {"id": payload["campaign_id"]}, {"_id": 0, "subject": 1, "text": 1, "html": 1, "sent_batches": 1, "progress": 1}
+    )
+    if not campaign:
+        return {"skipped": "campaign not found"}
+    batch = payload.get("batch")
+    if batch is not None and batch in campaign.get("sent_batches", []):
+        return {"skipped": "batch already sent"}
+
+    # A retry after a dropped connection resumes after the recipients already handled
+    done = campaign.get("progress", {}).get(str(batch), 0) if batch is not None else 0
+    started = time.perf_counter()
+    try:
+        sent, refused = await mailer.send_batch(
+            payload["recipients"][done:], campaign["subject"], campaign["text"], campaign["html"]
+        )
+    except mailer.PartialDelivery as exc:
+        _observe_delivery(started, exc.sent, exc.refused)
+        update = {"$inc": {"sent": exc.sent, "refused": len(exc.refused)}}
+        if batch is not None:
+            update["$set"] = {f"progress.{batch}": done + exc.handled}
+        await db.newsletter_campaigns.update_one({"id": payload["campaign_id"]}, update)
+        raise
+    _observe_delivery(started, sent, refused)
+
+    update = {"$inc": {"sent": sent, "refused": len(refused)}}
+    if batch is not None:
+        update["$addToSet"] = {"sent_batches": batch}
+        update["$unset"] = {f"progress.{batch}": ""}
+    await db.newsletter_campaigns.update_one({"id": payload["campaign_id"]}, update)
+    return {"sent": sent, "refused": refused}
@@ -0,0 +1,127 @@
+"""
+Keyset (cursor) pagination for admin listings in FarchoDev Blog
+Pages are ordered by (sort field, id) descending and continue from the last
+row seen, so every page costs one index range scan regardless of depth.
+The opaque cursor and the total count travel in response headers, keeping
+the response bodies plain lists.
+"""
+import base64
+import json
+import re
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, Response
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+COUNT_CAP = 10000  # Filtered totals are counted up to this many documents
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+TOTAL_COUNT_HEADER = "X-Total-Count"
+TOTAL_CAPPED_HEADER = "X-Total-Count-Capped"
+EXPOSED_HEADERS = [NEXT_CURSOR_HEADER, TOTAL_COUNT_HEADER, TOTAL_CAPPED_HEADER]
+
+
+async def ensure_indexes(db):
+    """Indexes backing the paginated admin listings"""
+    await db.posts.create_index([("created_at", -1), ("id", -1)])
+    await db.posts.create_index([("published", 1), ("created_at", -1), ("id", -1)])
+    await db.comments.create_index([("created_at", -1), ("id", -1)])
+    await db.comments.create_index([("approved", 1), ("created_at", -1), ("id", -1)])
+    await db.comments.create_index([("post_id", 1), ("created_at", -1), ("id", -1)])
+    await db.newsletter.create_index([("subscribed_at", -1), ("id", -1)])
+
+
+def encode_cursor(sort_value, doc_id: str) -> str:
+    if isinstance(sort_value, datetime):
+        sort_value = {"$date": sort_value.isoformat()}
+    raw = json.dumps([sort_value, doc_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[object, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, doc_id = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if isinstance(sort_value, dict) and "$date" in sort_value:
+        sort_value = datetime.fromisoformat(sort_value["$date"])
+    return sort_value, doc_id
+
+
+def page_size(limit: int) -> int:
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def date_range(field: str, date_from: Optional[datetime], date_to: Optional[datetime]) -> dict:
+    """Range filter on a date field stored as an ISO string"""
+    bounds = {}
+    if date_from:
+        bounds["$gte"] = _iso(date_from)
+    if date_to:
+        bounds["$lte"] = _iso(date_to)
+    return {field: bounds} if bounds else {}
+
+
+def email_prefix(field: str, prefix: Optional[str]) -> dict:
+    """Anchored, case-sensitive prefix match (can use an index on the field)
+
+    The prefix is matched as given, so callers filter on a lower-cased field
+    (newsletter email, comment author_email_lc) with a lower-cased prefix.
+    """
+    if not prefix or not prefix.strip():
+        return {}
+    return {field: {"$regex": "^" + re.escape(prefix.strip())}}
+
+
+def _iso(moment: datetime) -> str:
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc).isoformat()
+
+
+async def paginate(collection, query: dict, sort_field: str, limit: int,
+                   cursor: Optional[str] = None, projection: Optional[dict] = None):
+    """One page of documents plus the cursor for the next page (None on the last)"""
+    limit = page_size(limit)
+    if cursor:
+        sort_value, last_id = decode_cursor(cursor)
+        keyset = {"$or": [
+            {sort_field: {"$lt": sort_value}},
+            {sort_field: sort_value, "id": {"$lt": last_id}},
+        ]}
+        query = {"$and": [query, keyset]} if query else keyset
+    docs = await collection.find(query, projection or {"_id": 0}).sort(
+        [(sort_field, -1), ("id", -1)]
+    ).limit(limit + 1).to_list(limit + 1)
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        last = docs[-1]
+        next_cursor = encode_cursor(last.get(sort_field), last["id"])
+    return docs, next_cursor
+
+
+async def count(collection, query: dict, counter: Optional[int] = None) -> Tuple[int, bool]:
+    """Cheap total for a listing: (total, capped)
+
+    Unfiltered listings use the collection metadata count and filters that
+    match a maintained stats counter use that counter; anything else is
+    counted, but never past COUNT_CAP.
+    """
+    if counter is not None:
+        return counter, False
+    if not query:
+        return await collection.estimated_document_count(), False
+    total = await collection.count_documents(query, limit=COUNT_CAP)
+    return total, total >= COUNT_CAP
+
+
+def set_page_headers(response: Response, next_cursor: Optional[str], total: int, capped: bool = False):
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    response.headers[TOTAL_COUNT_HEADER] = str(total)
+    if capped:
+        response.headers[TOTAL_CAPPED_HEADER] = "true"
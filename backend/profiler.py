@@ -0,0 +1,171 @@
+"""
+On-demand profiling for FarchoDev Blog (admin endpoints)
+Nothing here runs until an admin asks for it, so the cost is zero otherwise.
+
+Sampling profiler: a thread reads every thread's current stack through
+sys._current_frames() every few milliseconds for a fixed time, and returns
+the stacks in collapsed format ("thread;outer;...;inner count" per line),
+which flamegraph.pl and https://www.speedscope.app render as a flame graph.
+
+Memory: tracemalloc is started on request, snapshots are kept in memory
+(last MAX_SNAPSHOTS) and compared to find the lines whose allocations grew.
+Tracing slows allocations down, so stop it when done.
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+MAX_PROFILE_SECONDS = 60
+DEFAULT_INTERVAL_MS = 5
+MIN_INTERVAL_MS = 1
+MAX_SNAPSHOTS = 5
+SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Samples all threads' stacks from a background thread; one run at a time"""
+
+    def __init__(self):
+        self.running = False
+        self.samples: Counter = Counter()
+        self.sample_count = 0
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, interval: float):
+        with self._lock:
+            if self.running:
+                raise RuntimeError("A profile is already running")
+            self.running = True
+        self.samples = Counter()
+        self.sample_count = 0
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._sample, args=(interval,), name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def _sample(self, interval: float):
+        own = threading.get_ident()
+        while not self._stopping.wait(interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.samples[";".join(reversed(stack))] += 1
+            self.sample_count += 1
+
+    def stop(self) -> Counter:
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.running = False
+        return self.samples
+
+    async def profile(self, seconds: float, interval_ms: float = DEFAULT_INTERVAL_MS) -> str:
+        """Sample for `seconds` while the event loop keeps serving; collapsed stacks"""
+        if not 0 < seconds <= MAX_PROFILE_SECONDS:
+            raise ValueError(f"seconds must be between 0 and {MAX_PROFILE_SECONDS}")
+        if interval_ms < MIN_INTERVAL_MS:
+            raise ValueError(f"interval_ms must be at least {MIN_INTERVAL_MS}")
+        self.start(interval_ms / 1000)
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            samples = self.stop()
+        return collapse(samples)
+
+
+def collapse(samples: Counter) -> str:
+    return "".join(f"{stack} {count}\n" for stack, count in samples.most_common())
+
+
+class MemoryTracker:
+    """tracemalloc start/stop plus numbered snapshots and their diffs"""
+
+    def __init__(self):
+        self.snapshots: "OrderedDict[int, tuple]" = OrderedDict()
+        self._next_id = 1
+
+    def start(self, frames: int = 1):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        return self.as_dict()
+
+    def stop(self):
+        tracemalloc.stop()
+        self.snapshots.clear()
+        return self.as_dict()
+
+    def snapshot(self, limit: int = 20) -> dict:
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is not running")
+        snap = tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+        snapshot_id = self._next_id
+        self._next_id += 1
+        taken_at = datetime.now(timezone.utc)
+        self.snapshots[snapshot_id] = (taken_at, snap)
+        while len(self.snapshots) > MAX_SNAPSHOTS:
+            self.snapshots.popitem(last=False)
+        stats = snap.statistics("lineno")
+        return {
+            "id": snapshot_id,
+            "taken_at": taken_at.isoformat(),
+            "total_kb": round(sum(stat.size for stat in stats) / 1024, 1),
+            "top": [_stat_dict(stat) for stat in stats[:limit]],
+        }
+
+    def diff(self, base: int, current: int, limit: int = 30) -> dict:
+        missing = [snapshot_id for snapshot_id in (base, current) if snapshot_id not in self.snapshots]
+        if missing:
+            raise ValueError(f"Unknown snapshot(s): {missing}; kept: {list(self.snapshots)}")
+        stats = self.snapshots[current][1].compare_to(self.snapshots[base][1], "lineno")
+        return {
+            "base": base,
+            "current": current,
+            "size_diff_kb": round(sum(stat.size_diff for stat in stats) / 1024, 1),
+            "top": [{**_stat_dict(stat), "size_diff_kb": round(stat.size_diff / 1024, 1),
+                     "count_diff": stat.count_diff} for stat in stats[:limit]],
+        }
+
+    def as_dict(self) -> Dict[str, object]:
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            "tracing": tracemalloc.is_tracing(),
+            "traced_kb": round(current / 1024, 1),
+            "peak_kb": round(peak / 1024, 1),
+            "snapshots": [{"id": i, "taken_at": taken_at.isoformat()} for i, (taken_at, _) in self.snapshots.items()],
+        }
+
+
+def _stat_dict(stat) -> dict:
+    frame = stat.traceback[0]
+    return {"location": f"{frame.filename}:{frame.lineno}", "size_kb": round(stat.size / 1024, 1), "count": stat.count}
+
+
+sampling_profiler = SamplingProfiler()
+memory_tracker = MemoryTracker()
+
+
+def profile_filename() -> str:
+    return f"profile-{time.strftime('%Y%m%d-%H%M%S')}.folded"
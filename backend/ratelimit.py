@@ -0,0 +1,292 @@
+"""
+Rate limiting for FarchoDev Blog public write endpoints
+Token buckets keyed by client IP (in the ASGI middleware) and by account
+(checked inside login/register). Each policy allows `capacity` requests in
+a burst, refilled continuously at capacity/period tokens per second.
+
+Backends:
+    memory  O(1) per request, per process (default)
+    mongo   shared by every worker through one atomic find_one_and_update
+
+Policies are overridden with RATE_LIMIT_<NAME>="requests/seconds", e.g.
+RATE_LIMIT_LOGIN="20/60".
+"""
+import json
+import logging
+import math
+import os
+import re
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory')
+# Number of reverse proxies in front of the app whose X-Forwarded-For is trusted
+# (0: the app is exposed directly). It has no default: behind a proxy, a
+# wrong guess puts every reader in the proxy's bucket.
+TRUSTED_PROXIES_SETTING = os.environ.get('RATE_LIMIT_TRUSTED_PROXIES')
+TRUSTED_PROXIES = int(TRUSTED_PROXIES_SETTING or '0')
+MAX_MEMORY_KEYS = 100000
+
+
+def enabled_from_env(environ=os.environ) -> bool:
+    """RATE_LIMIT_ENABLED (default true), but only once the proxy hops are configured"""
+    if environ.get('RATE_LIMIT_ENABLED', 'true').lower() != 'true':
+        return False
+    if environ.get('RATE_LIMIT_TRUSTED_PROXIES') is None:
+        logger.error(
+            "Rate limiting is disabled: set RATE_LIMIT_TRUSTED_PROXIES to the number of reverse "
+            "proxies in front of the app (0 if clients connect directly)"
+        )
+        return False
+    return True
+
+
+RATE_LIMIT_ENABLED = enabled_from_env()
+
+
+class Policy:
+    """`capacity` requests per `period` seconds, with bursts up to `capacity`"""
+
+    def __init__(self, name: str, capacity: int, period: float):
+        self.name = name
+        self.capacity = capacity
+        self.period = period
+        self.rate = capacity / period
+
+    @classmethod
+    def parse(cls, name: str, spec: str) -> "Policy":
+        capacity, _, period = spec.partition("/")
+        return cls(name, int(capacity), float(period))
+
+    def __repr__(self):
+        return f"Policy({self.name!r}, {self.capacity}/{self.period:g}s)"
+
+
+DEFAULT_POLICIES = {
+    "comment": "5/60",
+    "subscribe": "5/600",
+    "register": "5/3600",
+    "register_account": "3/3600",
+    "login": "20/60",
+    "login_account": "5/300",
+    "view": "120/60",
+}
+
+# (method, path pattern, policy) applied per client IP by the middleware
+ROUTE_POLICIES = [
+    ("POST", r"/api/comments/anonymous", "comment"),
+    ("POST", r"/api/newsletter/subscribe", "subscribe"),
+    ("POST", r"/api/auth/register", "register"),
+    ("POST", r"/api/auth/login", "login"),
+    ("POST", r"/api/posts/[^/]+/view", "view"),
+]
+
+
+def load_policies() -> Dict[str, Policy]:
+    return {
+        name: Policy.parse(name, os.environ.get(f"RATE_LIMIT_{name.upper()}", spec))
+        for name, spec in DEFAULT_POLICIES.items()
+    }
+
+
+class MemoryBuckets:
+    """Buckets in an LRU-bounded OrderedDict: one lookup and one move per request"""
+
+    def __init__(self, max_keys: int = MAX_MEMORY_KEYS):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, List[float]]" = OrderedDict()
+
+    async def take(self, key: str, policy: Policy, now: Optional[float] = None) -> Tuple[bool, float]:
+        """Consume one token; returns (allowed, seconds until a token is available)"""
+        now = time.monotonic() if now is None else now
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [float(policy.capacity), now]
+            if len(self._buckets) > self.max_keys:
+                # Evicting the least recently seen key only forgives an idle client
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(policy.capacity, bucket[0] + (now - bucket[1]) * policy.rate)
+            bucket[1] = now
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return True, 0.0
+        return False, (1 - bucket[0]) / policy.rate
+
+    async def peek(self, key: str, policy: Policy, now: Optional[float] = None) -> Tuple[bool, float]:
+        """Like take(), without consuming a token"""
+        now = time.monotonic() if now is None else now
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            return True, 0.0
+        tokens = min(policy.capacity, bucket[0] + (now - bucket[1]) * policy.rate)
+        return (True, 0.0) if tokens >= 1 else (False, (1 - tokens) / policy.rate)
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class MongoBuckets:
+    """Buckets in db.rate_limits, refilled and consumed in one pipeline update"""
+
+    def __init__(self, db):
+        self.db = db
+
+    async def ensure_indexes(self):
+        await self.db.rate_limits.create_index("key", unique=True)
+        await self.db.rate_limits.create_index("expires_at", expireAfterSeconds=0)
+
+    async def take(self, key: str, policy: Policy, now: Optional[float] = None) -> Tuple[bool, float]:
+        now = time.time() if now is None else now
+        refilled = {"$min": [policy.capacity, {"$add": [
+            {"$ifNull": ["$tokens", policy.capacity]},
+            {"$multiply": [{"$max": [0, {"$subtract": [now, {"$ifNull": ["$ts", now]}]}]}, policy.rate]},
+        ]}]}
+        pipeline = [
+            {"$set": {"tokens": refilled, "ts": now}},
+            {"$set": {
+                "allowed": {"$gte": ["$tokens", 1]},
+                "tokens": {"$cond": [{"$gte": ["$tokens", 1]}, {"$subtract": ["$tokens", 1]}, "$tokens"]},
+                # A full bucket carries no state, so the document can expire then
+                "expires_at": datetime.now(timezone.utc) + timedelta(seconds=policy.period),
+            }},
+        ]
+        for attempt in range(2):
+            try:
+                doc = await self.db.rate_limits.find_one_and_update(
+                    {"key": key}, pipeline, upsert=True,
+                    projection={"_id": 0, "allowed": 1, "tokens": 1},
+                    return_document=ReturnDocument.AFTER
+                )
+                break
+            except DuplicateKeyError:
+                # Two first requests raced on the upsert; the retry updates the winner's document
+                if attempt:
+                    raise
+        if doc["allowed"]:
+            return True, 0.0
+        return False, (1 - doc["tokens"]) / policy.rate
+
+    async def peek(self, key: str, policy: Policy, now: Optional[float] = None) -> Tuple[bool, float]:
+        """Like take(), without consuming a token"""
+        now = time.time() if now is None else now
+        doc = await self.db.rate_limits.find_one({"key": key}, {"_id": 0, "tokens": 1, "ts": 1})
+        if doc is None:
+            return True, 0.0
+        tokens = min(policy.capacity, doc["tokens"] + max(0.0, now - doc["ts"]) * policy.rate)
+        return (True, 0.0) if tokens >= 1 else (False, (1 - tokens) / policy.rate)
+
+
+def too_many_requests(retry_after: float) -> HTTPException:
+    return HTTPException(
+        status_code=429, detail="Too many requests",
+        headers={"Retry-After": str(math.ceil(retry_after))}
+    )
+
+
+class RateLimiter:
+    """Policies plus a bucket backend; fails open if the backend errors"""
+
+    def __init__(self, backend, policies: Optional[Dict[str, Policy]] = None, enabled: bool = RATE_LIMIT_ENABLED):
+        self.backend = backend
+        self.policies = policies or load_policies()
+        self.enabled = enabled
+        self.limited: Dict[str, int] = {}
+        self.routes = [(method, re.compile(pattern + "$"), name) for method, pattern, name in ROUTE_POLICIES]
+
+    async def hit(self, policy_name: str, key: str) -> Tuple[bool, float]:
+        if not self.enabled:
+            return True, 0.0
+        policy = self.policies[policy_name]
+        try:
+            allowed, retry_after = await self.backend.take(f"{policy_name}:{key}", policy)
+        except Exception:
+            logger.exception("Rate limit backend failed; allowing request")
+            return True, 0.0
+        if not allowed:
+            self.limited[policy_name] = self.limited.get(policy_name, 0) + 1
+        return allowed, retry_after
+
+    async def enforce(self, policy_name: str, key: str):
+        """Raise 429 when the bucket for (policy, key) is empty"""
+        allowed, retry_after = await self.hit(policy_name, key)
+        if not allowed:
+            raise too_many_requests(retry_after)
+
+    async def check(self, policy_name: str, key: str):
+        """Raise 429 when the bucket is empty, without consuming a token
+
+        With charge(), for buckets that only count failures (e.g. wrong
+        passwords), so successful requests never use up the budget.
+        """
+        if not self.enabled:
+            return
+        try:
+            allowed, retry_after = await self.backend.peek(f"{policy_name}:{key}", self.policies[policy_name])
+        except Exception:
+            logger.exception("Rate limit backend failed; allowing request")
+            return
+        if not allowed:
+            self.limited[policy_name] = self.limited.get(policy_name, 0) + 1
+            raise too_many_requests(retry_after)
+
+    async def charge(self, policy_name: str, key: str):
+        """Consume a token for a failure counted by check()"""
+        await self.hit(policy_name, key)
+
+    def route_policy(self, method: str, path: str) -> Optional[str]:
+        for route_method, pattern, name in self.routes:
+            if method == route_method and pattern.match(path):
+                return name
+        return None
+
+
+def client_ip(scope) -> str:
+    """Peer address, or the client address appended by the trusted proxies"""
+    if TRUSTED_PROXIES:
+        for name, value in scope.get("headers", []):
+            if name == b"x-forwarded-for":
+                hops = [hop.strip() for hop in value.decode("latin-1").split(",")]
+                if len(hops) >= TRUSTED_PROXIES:
+                    return hops[-TRUSTED_PROXIES]
+                break
+    client = scope.get("client")
+    return client[0] if client else ""
+
+
+class RateLimitMiddleware:
+    """Pure ASGI middleware applying the per-IP route policies"""
+
+    def __init__(self, app, limiter: RateLimiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        policy_name = self.limiter.route_policy(scope["method"], scope["path"])
+        if policy_name is not None:
+            allowed, retry_after = await self.limiter.hit(policy_name, client_ip(scope))
+            if not allowed:
+                body = json.dumps({"detail": "Too many requests"}).encode()
+                await send({
+                    "type": "http.response.start",
+                    "status": 429,
+                    "headers": [
+                        (b"content-type", b"application/json"),
+                        (b"content-length", str(len(body)).encode()),
+                        (b"retry-after", str(math.ceil(retry_after)).encode()),
+                    ],
+                })
+                await send({"type": "http.response.body", "body": body})
+                return
+        await self.app(scope, receive, send)
@@ -0,0 +1,423 @@
+"""
+Related posts recommender for FarchoDev Blog
+Hashed bag-of-words TF-IDF vectors over title, tags and content, cosine
+similarity in NumPy, and precomputed top-k neighbours per post.
+
+Neighbours are stored denormalized in db.related_posts (one document per
+post, keyed by slug), so GET /api/posts/{slug}/related is a single indexed
+read. Admin writes refresh only the rows whose neighbour lists can change.
+
+Ejecutar:
+    python related.py --rebuild    Recalcula todos los posts relacionados
+"""
+import asyncio
+import logging
+import os
+import re
+import sys
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from pymongo import ReplaceOne, DeleteOne
+
+logger = logging.getLogger(__name__)
+
+N_FEATURES = int(os.environ.get('RELATED_FEATURES', '1024'))
+TOP_K = int(os.environ.get('RELATED_TOP_K', '5'))
+BLOCK_SIZE = 512  # Rows per similarity block (bounds the n x n working memory)
+MIN_SPARE_ROWS = 64  # Matrix rows kept free for posts published after a build
+MAX_CONTENT_TOKENS = 3000
+
+TITLE_WEIGHT = 3.0
+TAG_WEIGHT = 4.0
+
+# Fields copied into each neighbour entry (what a "related posts" card needs)
+SUMMARY_FIELDS = ("id", "slug", "title", "excerpt", "featured_image_url", "category", "tags", "published_at", "reading_time")
+
+TOKEN_PATTERN = re.compile(r"[a-záéíóúñü0-9][a-záéíóúñü0-9+#]+")
+STOPWORDS = frozenset("""
+a al algo como con de del el en es esta este esto la las lo los mas más no o para
+pero por que se si sin sobre su sus un una uno y ya the and for with that this from
+are was were you your its not but can will have has into about how what when use
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+
+def term_weights(post: dict) -> Counter:
+    """Weighted term frequencies for one post (sublinear tf is applied later)"""
+    weights = Counter(TOKEN_PATTERN.findall(post.get("content", "").lower())[:MAX_CONTENT_TOKENS])
+    # Dropping stopwords after counting touches each distinct word once
+    for stopword in STOPWORDS.intersection(weights):
+        del weights[stopword]
+    for token in tokenize(post.get("title", "")):
+        weights[token] += TITLE_WEIGHT
+    for tag in post.get("tags") or []:
+        weights["tag:" + tag.lower().strip()] += TAG_WEIGHT
+    category = post.get("category")
+    if category:
+        weights["cat:" + category] += 1.0
+    return weights
+
+
+def hashed_counts(posts: List[dict], n_features: int, chunk_size: int = 1000) -> np.ndarray:
+    """Hashing-trick term matrix (n_posts x n_features, float32)
+
+    Python's hash() is only stable within a process, which is fine here: the
+    matrix lives in memory and only the resulting neighbour ids are persisted.
+    Posts are processed in chunks so the temporary per-term lists stay small.
+    """
+    matrix = np.zeros((len(posts), n_features), dtype=np.float32)
+    for start in range(0, len(posts), chunk_size):
+        cells, values = [], []
+        for row, post in enumerate(posts[start:start + chunk_size]):
+            offset = row * n_features
+            weights = term_weights(post)
+            cells.extend(offset + hash(token) % n_features for token in weights)
+            values.extend(weights.values())
+        if not cells:
+            continue
+        # Sublinear tf, then sum hash collisions cell by cell
+        tf = 1.0 + np.log(np.asarray(values, dtype=np.float64))
+        unique_cells, inverse = np.unique(np.asarray(cells, dtype=np.int64), return_inverse=True)
+        matrix[start:start + chunk_size].flat[unique_cells] = np.bincount(inverse, weights=tf)
+    return matrix
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    return matrix
+
+
+def block_top_k(block: np.ndarray, k: int, first_row: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Row-wise top-k of a similarity block whose row i is post first_row + i"""
+    rows = np.arange(block.shape[0])
+    block[rows, first_row + rows] = -np.inf  # never recommend a post to itself
+    k = min(k, block.shape[1] - 1)
+    if k <= 0:
+        return np.zeros((block.shape[0], 0), dtype=np.int64), np.zeros((block.shape[0], 0))
+    candidates = np.argpartition(-block, k - 1, axis=1)[:, :k]
+    scores = np.take_along_axis(block, candidates, axis=1)
+    order = np.argsort(-scores, axis=1)
+    return np.take_along_axis(candidates, order, axis=1), np.take_along_axis(scores, order, axis=1)
+
+
+def top_k(similarities: np.ndarray, k: int, exclude: Optional[int] = None) -> List[Tuple[int, float]]:
+    """Indices and scores of the k largest similarities (descending)"""
+    if exclude is not None:
+        similarities = similarities.copy()
+        similarities[exclude] = -np.inf
+    k = min(k, similarities.shape[0] - (1 if exclude is not None else 0))
+    if k <= 0:
+        return []
+    candidates = np.argpartition(-similarities, k - 1)[:k]
+    candidates = candidates[np.argsort(-similarities[candidates])]
+    return [(int(i), float(similarities[i])) for i in candidates if similarities[i] > 0]
+
+
+class RelatedIndex:
+    """In-memory TF-IDF matrix plus the top-k neighbours of every post
+
+    The matrix is a view over a preallocated buffer with spare rows, so new
+    posts are written in place; the buffer doubles when it fills up instead
+    of being copied on every insert.
+    """
+
+    def __init__(self, n_features: int = N_FEATURES, k: int = TOP_K):
+        self.n_features = n_features
+        self.k = k
+        self.ids: List[str] = []
+        self.rows: Dict[str, int] = {}
+        self.meta: Dict[str, dict] = {}
+        self._buffer = np.zeros((MIN_SPARE_ROWS, n_features), dtype=np.float32)
+        self.idf = np.ones(n_features, dtype=np.float32)
+        self.neighbours: Dict[str, List[Tuple[str, float]]] = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """Normalized TF-IDF rows of the indexed posts (a view, row i is ids[i])"""
+        return self._buffer[:len(self.ids)]
+
+    @property
+    def capacity(self) -> int:
+        return self._buffer.shape[0]
+
+    def _reserve(self, rows: int):
+        if rows <= self.capacity:
+            return
+        buffer = np.zeros((max(rows, 2 * self.capacity), self.n_features), dtype=np.float32)
+        buffer[:len(self.ids)] = self.matrix
+        self._buffer = buffer
+
+    def build(self, posts: List[dict]):
+        """Full rebuild: recompute IDF, vectors and every neighbour list"""
+        self.ids = [p["id"] for p in posts]
+        self.rows = {post_id: i for i, post_id in enumerate(self.ids)}
+        self.meta = {p["id"]: summarize(p) for p in posts}
+        counts = hashed_counts(posts, self.n_features)
+        document_frequency = np.count_nonzero(counts, axis=0)
+        n = max(len(posts), 1)
+        self.idf = (np.log((1 + n) / (1 + document_frequency)) + 1).astype(np.float32)
+        self._buffer = np.zeros((len(posts) + max(MIN_SPARE_ROWS, len(posts) // 4), self.n_features), dtype=np.float32)
+        self._buffer[:len(posts)] = normalize_rows(counts * self.idf)
+        self.neighbours = {}
+        for start in range(0, len(self.ids), BLOCK_SIZE):
+            block = self.matrix[start:start + BLOCK_SIZE] @ self.matrix.T
+            indices, scores = block_top_k(block, self.k, start)
+            for offset in range(block.shape[0]):
+                self.neighbours[self.ids[start + offset]] = [
+                    (self.ids[i], float(score))
+                    for i, score in zip(indices[offset], scores[offset]) if score > 0
+                ]
+
+    def _named(self, ranked: Iterable[Tuple[int, float]]) -> List[Tuple[str, float]]:
+        return [(self.ids[i], score) for i, score in ranked]
+
+    def _recompute(self, post_id: str):
+        row = self.rows[post_id]
+        self.neighbours[post_id] = self._named(top_k(self.matrix @ self.matrix[row], self.k, exclude=row))
+
+    def upsert(self, post: dict) -> set:
+        """Add or replace one post; returns ids whose neighbour lists changed
+
+        IDF weights stay as of the last full build, so incremental updates
+        never have to touch the other rows of the matrix.
+        """
+        post_id = post["id"]
+        vector = normalize_rows(hashed_counts([post], self.n_features) * self.idf)[0]
+        if post_id in self.rows:
+            self.matrix[self.rows[post_id]] = vector
+        else:
+            self._reserve(len(self.ids) + 1)
+            self._buffer[len(self.ids)] = vector
+            self.rows[post_id] = len(self.ids)
+            self.ids.append(post_id)
+        self.meta[post_id] = summarize(post)
+
+        row = self.rows[post_id]
+        similarities = self.matrix @ vector
+        self.neighbours[post_id] = self._named(top_k(similarities, self.k, exclude=row))
+
+        changed = {post_id}
+        for other, neighbours in self.neighbours.items():
+            if other == post_id:
+                continue
+            if any(n == post_id for n, _ in neighbours):
+                # Score moved (or title changed): recompute to keep order/summary exact
+                self._recompute(other)
+                changed.add(other)
+                continue
+            score = float(similarities[self.rows[other]])
+            if score > 0 and (len(neighbours) < self.k or score > neighbours[-1][1]):
+                neighbours.append((post_id, score))
+                neighbours.sort(key=lambda item: -item[1])
+                del neighbours[self.k:]
+                changed.add(other)
+        return changed
+
+    def remove(self, post_id: str) -> set:
+        """Drop a post; returns ids whose neighbour lists changed"""
+        if post_id not in self.rows:
+            return set()
+        row = self.rows.pop(post_id)
+        last = len(self.ids) - 1
+        if row != last:
+            # Move the last row into the hole to keep the matrix dense
+            moved = self.ids[last]
+            self.ids[row] = moved
+            self.rows[moved] = row
+            self._buffer[row] = self._buffer[last]
+        self.ids.pop()
+        self._buffer[last] = 0
+        self.meta.pop(post_id, None)
+        self.neighbours.pop(post_id, None)
+
+        changed = set()
+        for other, neighbours in self.neighbours.items():
+            if any(n == post_id for n, _ in neighbours):
+                self._recompute(other)
+                changed.add(other)
+        return changed
+
+    def document(self, post_id: str) -> dict:
+        """db.related_posts document for one post"""
+        return {
+            "post_id": post_id,
+            "slug": self.meta[post_id]["slug"],
+            "related": [
+                {**self.meta[other], "score": round(score, 4)}
+                for other, score in self.neighbours.get(post_id, [])
+            ],
+            "updated_at": datetime.now(timezone.utc),
+        }
+
+
+def summarize(post: dict) -> dict:
+    return {field: post.get(field) for field in SUMMARY_FIELDS}
+
+
+POST_PROJECTION = {"_id": 0, "content": 1, **{field: 1 for field in SUMMARY_FIELDS}}
+
+
+async def ensure_indexes(db):
+    await db.related_posts.create_index("slug")
+    await db.related_posts.create_index("post_id", unique=True)
+
+
+class RelatedPosts:
+    """Keeps db.related_posts in sync with admin writes
+
+    The index is built in a background task at startup (start()), or on the
+    first write if that has not finished or failed. Every refresh runs in a
+    background task with the NumPy work in a thread, so admin requests never
+    wait for it.
+    """
+
+    def __init__(self, db, n_features: int = N_FEATURES, k: int = TOP_K):
+        self.db = db
+        self.index = RelatedIndex(n_features, k)
+        self._built = False
+        self._lock = asyncio.Lock()
+        self._last_sync: Optional[str] = None
+        self._tasks: set = set()
+
+    async def _published_posts(self, query: Optional[dict] = None) -> List[dict]:
+        return await self.db.posts.find(
+            {"published": True, **(query or {})}, POST_PROJECTION
+        ).to_list(None)
+
+    async def _persist(self, post_ids: Iterable[str]):
+        operations = []
+        for post_id in post_ids:
+            if post_id in self.index.rows:
+                operations.append(ReplaceOne({"post_id": post_id}, self.index.document(post_id), upsert=True))
+            else:
+                operations.append(DeleteOne({"post_id": post_id}))
+        for start in range(0, len(operations), 1000):
+            await self.db.related_posts.bulk_write(operations[start:start + 1000], ordered=False)
+
+    async def rebuild(self) -> int:
+        """Full rebuild from db.posts; returns the number of indexed posts"""
+        async with self._lock:
+            return await self._rebuild()
+
+    async def _rebuild(self, persist: bool = True) -> int:
+        started = datetime.now(timezone.utc).isoformat()
+        posts = await self._published_posts()
+        await asyncio.get_running_loop().run_in_executor(None, self.index.build, posts)
+        self._built = True
+        self._last_sync = started
+        if persist:
+            await self._persist(self.index.ids)
+            await self.db.related_posts.delete_many({"post_id": {"$nin": self.index.ids}})
+        return len(self.index)
+
+    async def warm_up(self) -> int:
+        """Build the in-memory index; rewrite db.related_posts only if it is out of step"""
+        async with self._lock:
+            if self._built:
+                return len(self.index)
+            indexed = await self._rebuild(persist=False)
+            if await self.db.related_posts.count_documents({}) != indexed:
+                await self._persist(self.index.ids)
+                await self.db.related_posts.delete_many({"post_id": {"$nin": self.index.ids}})
+            return indexed
+
+    async def _sync(self):
+        """Pick up writes handled by other workers since the last refresh"""
+        started = datetime.now(timezone.utc).isoformat()
+        published = await self.db.posts.count_documents({"published": True})
+        changed = await self._published_posts({"updated_at": {"$gt": self._last_sync}})
+        loop = asyncio.get_running_loop()
+        touched = set()
+        for post in changed:
+            touched |= await loop.run_in_executor(None, self.index.upsert, post)
+        self._last_sync = started
+        if touched:
+            await self._persist(touched)
+        if published != len(self.index):
+            # Something was unpublished or deleted elsewhere; start over
+            self._built = False
+
+    async def refresh(self, post_id: str):
+        """Recompute the neighbours affected by a change to one post"""
+        async with self._lock:
+            if self._built:
+                await self._sync()
+            if not self._built:
+                await self._rebuild()
+                return
+            post = await self.db.posts.find_one({"id": post_id, "published": True}, POST_PROJECTION)
+            loop = asyncio.get_running_loop()
+            if post:
+                changed = await loop.run_in_executor(None, self.index.upsert, post)
+            else:
+                changed = await loop.run_in_executor(None, self.index.remove, post_id)
+                changed.add(post_id)
+            await self._persist(changed)
+
+    def start(self):
+        """Build the index in the background, so the first admin write does not pay for it"""
+        self._spawn(self._warm_up_logged())
+
+    def schedule_refresh(self, post_id: str):
+        """Fire-and-forget refresh after an admin write"""
+        self._spawn(self._refresh_logged(post_id))
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _warm_up_logged(self):
+        try:
+            indexed = await self.warm_up()
+            logger.info("Related posts index built with %d posts", indexed)
+        except Exception:
+            logger.exception("Failed to build the related posts index; the first admin write will retry")
+
+    async def _refresh_logged(self, post_id: str):
+        try:
+            await self.refresh(post_id)
+        except Exception:
+            logger.exception("Failed to refresh related posts for %s", post_id)
+
+
+async def get_related(db, slug: str, limit: int = TOP_K) -> List[dict]:
+    """Precomputed neighbours for a post slug (empty if the post is not indexed)"""
+    doc = await db.related_posts.find_one({"slug": slug}, {"_id": 0, "related": 1})
+    return doc["related"][:max(limit, 0)] if doc else []
+
+
+async def main():
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from pathlib import Path
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+
+    if len(sys.argv) < 2 or sys.argv[1] != "--rebuild":
+        print("📖 USO:")
+        print("  python related.py --rebuild   - Recalcular posts relacionados")
+        client.close()
+        return
+
+    await ensure_indexes(db)
+    started = datetime.now()
+    count = await RelatedPosts(db).rebuild()
+    print(f"✅ {count} posts indexados en {(datetime.now() - started).total_seconds():.2f}s")
+    client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
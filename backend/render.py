@@ -0,0 +1,155 @@
+"""
+Server-side Markdown rendering for FarchoDev Blog
+Post content is rendered once (markdown-it + Pygments highlighting + a
+table of contents from the headings) and stored on the post as
+content_html / toc, so readers get ready HTML instead of parsing markdown
+in the browser. Raw HTML in the markdown is escaped, not passed through.
+
+Results are memoized in an in-process LRU keyed by the content hash. Posts
+written before rendering existed (or with an older RENDER_VERSION) are
+rendered lazily on their first read.
+"""
+import asyncio
+import hashlib
+import html
+import os
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from markdown_it import MarkdownIt
+from pygments import highlight as pygments_highlight
+from pygments.formatters import HtmlFormatter
+from pygments.lexers import get_lexer_by_name
+from pygments.util import ClassNotFound
+
+RENDER_VERSION = 1  # Bump when the output changes; stale posts re-render on read
+CACHE_SIZE = int(os.environ.get('RENDER_CACHE_SIZE', '256'))
+TOC_LEVELS = (2, 3)
+# Fields stored on the post; list endpoints leave them out
+RENDER_FIELDS = ("content_html", "toc", "content_hash", "render_version")
+
+_formatter = HtmlFormatter(nowrap=True)
+
+
+def _highlight(code: str, lang: str, attrs: str) -> str:
+    try:
+        lexer = get_lexer_by_name(lang) if lang else None
+    except ClassNotFound:
+        lexer = None
+    if lexer is None:
+        return ""  # markdown-it escapes and wraps it as plain code
+    lang_class = html.escape(lang, quote=True)
+    return (f'<pre class="highlight"><code class="language-{lang_class}">'
+            f'{pygments_highlight(code, lexer, _formatter)}</code></pre>\n')
+
+
+_md = MarkdownIt("commonmark", {"html": False, "highlight": _highlight}).enable(["table", "strikethrough"])
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def heading_id(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode().lower()
+    return re.sub(r"[^a-z0-9]+", "-", text).strip("-") or "seccion"
+
+
+def render_markdown(content: str) -> Dict[str, object]:
+    """HTML plus table of contents; every heading gets a unique id anchor"""
+    tokens = _md.parse(content)
+    toc: List[dict] = []
+    seen: Dict[str, int] = {}
+    for i, token in enumerate(tokens):
+        if token.type != "heading_open":
+            continue
+        text = "".join(child.content for child in tokens[i + 1].children or [] if child.type in ("text", "code_inline"))
+        anchor = heading_id(text)
+        if anchor in seen:
+            seen[anchor] += 1
+            anchor = f"{anchor}-{seen[anchor]}"
+        else:
+            seen[anchor] = 0
+        token.attrSet("id", anchor)
+        level = int(token.tag[1])
+        if level in TOC_LEVELS:
+            toc.append({"level": level, "text": text, "id": anchor})
+    return {"content_html": _md.renderer.render(tokens, _md.options, {}), "toc": toc}
+
+
+class RenderMetrics:
+    def __init__(self):
+        self.renders = 0
+        self.render_seconds = 0.0
+        self.render_seconds_max = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def as_dict(self) -> dict:
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            "renders": self.renders,
+            "render_ms_avg": round(self.render_seconds / self.renders * 1000, 3) if self.renders else 0.0,
+            "render_ms_max": round(self.render_seconds_max * 1000, 3),
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "cache_hit_ratio": round(self.cache_hits / lookups, 3) if lookups else 0.0,
+            "cache_size": len(_cache),
+        }
+
+
+render_metrics = RenderMetrics()
+_cache: "OrderedDict[str, Dict[str, object]]" = OrderedDict()
+
+
+def _cached(digest: str) -> Optional[Dict[str, object]]:
+    rendered = _cache.get(digest)
+    if rendered is None:
+        render_metrics.cache_misses += 1
+        return None
+    _cache.move_to_end(digest)
+    render_metrics.cache_hits += 1
+    return rendered
+
+
+def _render_and_store(digest: str, content: str) -> Dict[str, object]:
+    started = time.perf_counter()
+    rendered = render_markdown(content)
+    elapsed = time.perf_counter() - started
+    render_metrics.renders += 1
+    render_metrics.render_seconds += elapsed
+    render_metrics.render_seconds_max = max(render_metrics.render_seconds_max, elapsed)
+    _cache[digest] = rendered
+    if len(_cache) > CACHE_SIZE:
+        _cache.popitem(last=False)
+    return rendered
+
+
+async def render_fields(content: str) -> Dict[str, object]:
+    """Fields to store on a post for this content (cache miss renders in a thread)"""
+    digest = content_hash(content)
+    rendered = _cached(digest)
+    if rendered is None:
+        rendered = await asyncio.to_thread(_render_and_store, digest, content)
+    return {**rendered, "content_hash": digest, "render_version": RENDER_VERSION}
+
+
+def is_current(post: dict) -> bool:
+    return (
+        post.get("render_version") == RENDER_VERSION
+        and "content_html" in post
+        and post.get("content_hash") == content_hash(post.get("content", ""))
+    )
+
+
+async def ensure_rendered(db, post: dict) -> dict:
+    """Render a post stored without (or with stale) HTML and persist the result"""
+    if is_current(post):
+        return post
+    fields = await render_fields(post.get("content", ""))
+    # Matching updated_at keeps a concurrent edit from being overwritten with old HTML
+    await db.posts.update_one({"id": post["id"], "updated_at": post.get("updated_at")}, {"$set": fields})
+    return {**post, **fields}
@@ -1,8 +1,11 @@
 from fastapi import FastAPI, APIRouter, HTTPException, Request, Response, Depends
-from fastapi.responses import RedirectResponse
+from fastapi.responses import PlainTextResponse, RedirectResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+import asyncio
 import os
 import logging
 from pathlib import Path
@@ -22,13 +25,40 @@ from auth import (
     get_google_user_from_session, create_or_update_user, create_session, delete_session
 )
 from features import PostLike, Bookmark, UserActivity
+import auth
+import cascade
+import dbmonitor
+import jobs
+import loopmonitor
+import metrics
+import moderation
+import newsletter
+import pagination
+import profiler
+import ratelimit
+import related
+import render
+import sessions
+import stats
+import visitors
+from dbmonitor import DBMonitorMiddleware
+from jobs import JobQueue
+from loopmonitor import LoopMonitor
+from metrics import MetricsMiddleware
+from ratelimit import MemoryBuckets, MongoBuckets, RateLimiter, RateLimitMiddleware
+from related import RelatedPosts
+from sessions import SessionReaper
+from spam import SpamFilter
+from stats import BlogStats
+from visitors import VisitorTracker
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+# Command listener attributes every query to the request that issued it (dbmonitor.py)
+client = AsyncIOMotorClient(mongo_url, event_listeners=dbmonitor.event_listeners())
 db = client[os.environ['DB_NAME']]
 
 # Environment detection
@@ -36,6 +66,32 @@ IS_PRODUCTION = os.environ.get('ENV', 'development') == 'production'
 COOKIE_SECURE = IS_PRODUCTION  # Only secure cookies in production
 COOKIE_SAMESITE = "none" if IS_PRODUCTION else "lax"  # lax for development
 
+# Unique reader sketches (HyperLogLog), flushed to db.post_visitors
+visitor_tracker = VisitorTracker(db)
+
+# Incrementally maintained admin counters (db.stats)
+blog_stats = BlogStats(db)
+
+# Precomputed related posts (db.related_posts), built at startup and refreshed on admin writes
+related_posts = RelatedPosts(db)
+
+# Background job workers (db.jobs): newsletter delivery, etc.
+job_queue = JobQueue(db)
+
+# Naive Bayes spam scoring for anonymous comments, retrained in a worker process
+spam_filter = SpamFilter(db)
+
+# Expired-session cleanup for backends without TTL indexes (SESSION_REAPER_ENABLED)
+session_reaper = SessionReaper(db)
+
+# Event-loop lag metric; with LOOP_WATCHDOG_ENABLED it also dumps what blocks the loop
+loop_monitor = LoopMonitor()
+
+# Token buckets for public write endpoints (per IP in the middleware, per account in auth)
+rate_limiter = RateLimiter(
+    MongoBuckets(db) if ratelimit.RATE_LIMIT_BACKEND == "mongo" else MemoryBuckets()
+)
+
 # Create the main app without a prefix
 app = FastAPI()
 
@@ -85,6 +141,8 @@ class Post(BaseModel):
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     views_count: int = 0
     reading_time: int = 1
+    content_html: Optional[str] = None
+    toc: List[dict] = []
 
 class PostCreate(BaseModel):
     title: str
@@ -116,6 +174,19 @@ class Comment(BaseModel):
     updated_at: Optional[datetime] = None
     approved: bool = False
 
+class RelatedPost(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    id: str
+    slug: str
+    title: str
+    excerpt: str
+    featured_image_url: Optional[str] = None
+    category: str
+    tags: List[str] = []
+    published_at: Optional[datetime] = None
+    reading_time: int = 1
+    score: float
+
 class CommentCreate(BaseModel):
     post_id: str
     content: str
@@ -129,6 +200,15 @@ class CommentCreateAnonymous(BaseModel):
 class CommentUpdate(BaseModel):
     content: str
 
+class CommentBulkAction(BaseModel):
+    action: str  # approve, reject, delete
+    ids: Optional[List[str]] = None
+    status: Optional[str] = None  # pending, approved
+    post_id: Optional[str] = None
+    email: Optional[str] = None
+    date_from: Optional[datetime] = None
+    date_to: Optional[datetime] = None
+
 class Newsletter(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -142,6 +222,9 @@ class NewsletterSubscribe(BaseModel):
 class BookmarkCreate(BaseModel):
     post_id: str
 
+# Listings don't need the rendered body; only the single-post views return it
+POST_LIST_PROJECTION = {"_id": 0, **{field: 0 for field in render.RENDER_FIELDS}}
+
 # Public Routes
 @api_router.get("/")
 async def root():
@@ -169,7 +252,7 @@ async def get_posts(
             {"excerpt": {"$regex": search, "$options": "i"}}
         ]
     
-    posts = await db.posts.find(query, {"_id": 0}).sort("published_at", -1).skip(skip).limit(limit).to_list(limit)
+    posts = await db.posts.find(query, POST_LIST_PROJECTION).sort("published_at", -1).skip(skip).limit(limit).to_list(limit)
     
     # Convert ISO strings back to datetime
     for post in posts:
@@ -187,6 +270,9 @@ async def get_post_by_slug(slug: str):
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
     
+    # Posts stored before server-side rendering get their HTML on first read
+    post = await render.ensure_rendered(db, post)
+    
     # Convert ISO strings back to datetime
     for field in ['created_at', 'updated_at', 'published_at']:
         if field in post and isinstance(post[field], str):
@@ -194,8 +280,13 @@ async def get_post_by_slug(slug: str):
     
     return post
 
+@api_router.get("/posts/{slug}/related", response_model=List[RelatedPost])
+async def get_related_posts(slug: str, limit: int = related.TOP_K):
+    """Get posts similar to the given one (precomputed, single read)"""
+    return await related.get_related(db, slug, limit)
+
 @api_router.post("/posts/{post_id}/view")
-async def increment_view(post_id: str):
+async def increment_view(post_id: str, request: Request):
     """Increment view count for a post"""
     result = await db.posts.update_one(
         {"id": post_id},
@@ -205,6 +296,12 @@ async def increment_view(post_id: str):
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Post not found")
     
+    blog_stats.add_views(1)
+    
+    # Track unique readers (in memory, flushed in the background)
+    if not visitors.is_bot(request):
+        visitor_tracker.record(post_id, visitors.visitor_key(request))
+    
     return {"message": "View count incremented"}
 
 @api_router.get("/categories", response_model=List[Category])
@@ -220,18 +317,34 @@ async def get_categories():
 
 @api_router.post("/comments/anonymous", response_model=Comment)
 async def create_comment_anonymous(comment_data: CommentCreateAnonymous):
-    """Create a new comment (anonymous users - needs approval)"""
+    """Create a new comment (anonymous users - needs approval unless the spam filter is confident)"""
+    verdict, spam_score = spam_filter.classify(
+        comment_data.author_name, comment_data.author_email, comment_data.content
+    )
     comment_obj = Comment(
         post_id=comment_data.post_id,
         author_name=comment_data.author_name,
         author_email=comment_data.author_email,
         content=comment_data.content,
-        approved=False  # Needs approval for anonymous users
+        approved=verdict == "ham"
     )
     doc = comment_obj.model_dump()
     doc['created_at'] = doc['created_at'].isoformat()
-    
+    doc[moderation.AUTHOR_EMAIL_KEY] = moderation.author_email_key(comment_obj.author_email)
+    if spam_score is not None:
+        doc['spam_score'] = round(spam_score, 4)
+    
+    if verdict == "spam":
+        # Archived like an admin rejection, but kept out of the training labels
+        doc['rejected_at'] = doc['created_at']
+        doc['auto_rejected'] = True
+        await db.rejected_comments.insert_one(doc)
+        return comment_obj
+    
+    if verdict == "ham":
+        doc['auto_approved'] = True
     await db.comments.insert_one(doc)
+    await stats.bump(db, total_comments=1, pending_comments=0 if comment_obj.approved else 1)
     return comment_obj
 
 @api_router.get("/posts/{post_id}/comments", response_model=List[Comment])
@@ -251,23 +364,32 @@ async def get_post_comments(post_id: str):
 @api_router.post("/newsletter/subscribe", response_model=Newsletter)
 async def subscribe_newsletter(data: NewsletterSubscribe):
     """Subscribe to newsletter"""
+    email = newsletter.canonical_email(data.email)
     # Check if already subscribed
-    existing = await db.newsletter.find_one({"email": data.email})
+    existing = await db.newsletter.find_one({"email": email})
     
     if existing:
         if not existing.get('active', True):
             # Reactivate subscription
-            await db.newsletter.update_one(
-                {"email": data.email},
+            result = await db.newsletter.update_one(
+                {"email": email, "active": False},
                 {"$set": {"active": True}}
             )
+            if result.modified_count:
+                await stats.bump(db, total_subscribers=1)
         return Newsletter(**{k: v for k, v in existing.items() if k != '_id'})
     
-    newsletter_obj = Newsletter(email=data.email)
+    newsletter_obj = Newsletter(email=email)
     doc = newsletter_obj.model_dump()
     doc['subscribed_at'] = doc['subscribed_at'].isoformat()
     
-    await db.newsletter.insert_one(doc)
+    try:
+        await db.newsletter.insert_one(doc)
+    except DuplicateKeyError:
+        # A concurrent request subscribed the same address first
+        existing = await db.newsletter.find_one({"email": email}, {"_id": 0})
+        return Newsletter(**existing)
+    await stats.bump(db, total_subscribers=1)
     return newsletter_obj
 
 # ============================================================================
@@ -277,6 +399,8 @@ async def subscribe_newsletter(data: NewsletterSubscribe):
 @api_router.post("/auth/register", response_model=UserPublic)
 async def register(user_data: UserRegister, response: Response):
     """Register a new user with local auth"""
+    await rate_limiter.enforce("register_account", user_data.email.lower())
+    
     # Check if user already exists
     existing_user = await db.users.find_one({"email": user_data.email})
     if existing_user:
@@ -322,15 +446,23 @@ async def register(user_data: UserRegister, response: Response):
 @api_router.post("/auth/login", response_model=UserPublic)
 async def login(credentials: UserLogin, response: Response):
     """Login with local auth"""
+    # Per-account bucket: stops password guessing spread over many IPs. Only
+    # failures use it up, so nobody can lock an owner out with bogus requests
+    # (the per-IP "login" bucket in the middleware already limits attempts)
+    account = credentials.email.lower()
+    await rate_limiter.check("login_account", account)
+    
     # Find user
     user_doc = await db.users.find_one({"email": credentials.email})
     if not user_doc:
+        await rate_limiter.charge("login_account", account)
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
     user = User(**user_doc)
     
     # Verify password
     if not user.password_hash or not verify_password(credentials.password, user.password_hash):
+        await rate_limiter.charge("login_account", account)
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
     # Update last login
@@ -600,7 +732,7 @@ async def get_bookmarks(request: Request):
     
     # Get posts
     post_ids = [b["post_id"] for b in bookmarks]
-    posts = await db.posts.find({"id": {"$in": post_ids}}, {"_id": 0}).to_list(1000)
+    posts = await db.posts.find({"id": {"$in": post_ids}}, POST_LIST_PROJECTION).to_list(1000)
     
     # Convert datetime strings
     for post in posts:
@@ -637,8 +769,10 @@ async def create_comment_auth(comment_data: CommentCreate, request: Request):
     
     doc = comment_obj.model_dump()
     doc['created_at'] = doc['created_at'].isoformat()
+    doc[moderation.AUTHOR_EMAIL_KEY] = moderation.author_email_key(comment_obj.author_email)
     
     await db.comments.insert_one(doc)
+    await stats.bump(db, total_comments=1)
     return comment_obj
 
 @api_router.put("/comments/{comment_id}", response_model=Comment)
@@ -646,25 +780,20 @@ async def update_comment(comment_id: str, comment_data: CommentUpdate, request:
     """Update own comment"""
     user = await get_current_user(request, db)
     
-    # Check if comment exists and belongs to user
-    comment = await db.comments.find_one({"id": comment_id, "user_id": user.id})
-    if not comment:
-        raise HTTPException(status_code=404, detail="Comment not found or unauthorized")
-    
-    # Update comment
+    # Ownership check and update in one atomic operation
     update_dict = {
         "content": comment_data.content,
         "updated_at": datetime.now(timezone.utc).isoformat()
     }
     
-    await db.comments.update_one({"id": comment_id}, {"$set": update_dict})
-    
-    # Get updated comment
-    updated_comment = await db.comments.find_one({"id": comment_id}, {"_id": 0})
-    
-    for field in ['created_at', 'updated_at']:
-        if field in updated_comment and updated_comment[field] and isinstance(updated_comment[field], str):
-            updated_comment[field] = datetime.fromisoformat(updated_comment[field])
+    updated_comment = await db.comments.find_one_and_update(
+        {"id": comment_id, "user_id": user.id},
+        {"$set": update_dict},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+    if not updated_comment:
+        raise HTTPException(status_code=404, detail="Comment not found or unauthorized")
     
     return Comment(**updated_comment)
 
@@ -674,11 +803,16 @@ async def delete_own_comment(comment_id: str, request: Request):
     user = await get_current_user(request, db)
     
     # Check if comment exists and belongs to user
-    result = await db.comments.delete_one({"id": comment_id, "user_id": user.id})
+    deleted = await db.comments.find_one_and_delete(
+        {"id": comment_id, "user_id": user.id},
+        projection={"_id": 0, "approved": 1}
+    )
     
-    if result.deleted_count == 0:
+    if not deleted:
         raise HTTPException(status_code=404, detail="Comment not found or unauthorized")
     
+    await stats.bump(db, total_comments=-1, pending_comments=0 if deleted.get("approved") else -1)
+    
     return {"message": "Comment deleted"}
 
 # User profile routes
@@ -712,15 +846,14 @@ async def update_user_profile(profile_data: UserProfileUpdate, request: Request)
     # Ensure user_id is set
     update_dict["user_id"] = user.id
     
-    # Update or create profile
-    await db.user_profiles.update_one(
+    # Update or create profile, returning the result in the same round-trip
+    updated_profile = await db.user_profiles.find_one_and_update(
         {"user_id": user.id},
         {"$set": update_dict},
-        upsert=True
+        upsert=True,
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
     )
-    
-    # Return updated profile
-    updated_profile = await db.user_profiles.find_one({"user_id": user.id}, {"_id": 0})
     return updated_profile
 
 @api_router.get("/users/activity", response_model=UserActivity)
@@ -799,19 +932,46 @@ async def get_user_activity(request: Request):
 # ============================================================================
 
 @api_router.get("/admin/posts", response_model=List[Post])
-async def get_all_posts_admin(request: Request):
-    """Get all posts including drafts (admin)"""
+async def get_all_posts_admin(
+    request: Request,
+    response: Response,
+    status: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = pagination.DEFAULT_PAGE_SIZE
+):
+    """Get posts including drafts, newest first (admin)
+
+    Keyset-paginated: pass the X-Next-Cursor response header back as ?cursor=.
+    """
     await require_admin(request, db)
     
-    posts = await db.posts.find({}, {"_id": 0}).sort("created_at", -1).to_list(1000)
-    
-    for post in posts:
-        for field in ['created_at', 'updated_at', 'published_at']:
-            if field in post and isinstance(post[field], str):
-                post[field] = datetime.fromisoformat(post[field])
-    
+    query = pagination.date_range("created_at", date_from, date_to)
+    if status is not None:
+        if status not in ("published", "draft"):
+            raise HTTPException(status_code=400, detail="status must be 'published' or 'draft'")
+        query["published"] = status == "published"
+    
+    posts, next_cursor = await pagination.paginate(db.posts, query, "created_at", limit, cursor, POST_LIST_PROJECTION)
+    counter = None
+    if status is not None and len(query) == 1:
+        counters = await blog_stats.snapshot()
+        counter = counters["published_posts" if status == "published" else "draft_posts"]
+    total, capped = await pagination.count(db.posts, query, counter)
+    pagination.set_page_headers(response, next_cursor, total, capped)
     return posts
 
+@api_router.get("/admin/posts/{post_id}", response_model=Post)
+async def get_post_admin(post_id: str, request: Request):
+    """Get a single post by ID, including drafts (admin)"""
+    await require_admin(request, db)
+    
+    post = await db.posts.find_one({"id": post_id}, {"_id": 0})
+    if not post:
+        raise HTTPException(status_code=404, detail="Post not found")
+    return post
+
 @api_router.post("/admin/posts", response_model=Post)
 async def create_post(post_data: PostCreate, request: Request):
     """Create a new post (admin)"""
@@ -823,12 +983,15 @@ async def create_post(post_data: PostCreate, request: Request):
     post_dict = post_data.model_dump()
     post_dict['slug'] = slug
     post_dict['reading_time'] = reading_time
+    post_dict.update(await render.render_fields(post_data.content))
     
     if post_data.published:
         post_dict['published_at'] = datetime.now(timezone.utc)
     
     post_obj = Post(**post_dict)
     doc = post_obj.model_dump()
+    doc['content_hash'] = post_dict['content_hash']
+    doc['render_version'] = post_dict['render_version']
     
     # Serialize datetime fields
     for field in ['created_at', 'updated_at', 'published_at']:
@@ -836,6 +999,10 @@ async def create_post(post_data: PostCreate, request: Request):
             doc[field] = doc[field].isoformat()
     
     await db.posts.insert_one(doc)
+    await stats.bump(db, total_posts=1, published_posts=1 if post_obj.published else 0)
+    if post_obj.published:
+        related_posts.schedule_refresh(post_obj.id)
+        await newsletter.announce_post(db, post_obj.id)
     return post_obj
 
 @api_router.put("/admin/posts/{post_id}", response_model=Post)
@@ -843,30 +1010,45 @@ async def update_post(post_id: str, post_data: PostUpdate, request: Request):
     """Update a post (admin)"""
     await require_admin(request, db)
     
-    existing_post = await db.posts.find_one({"id": post_id})
-    
-    if not existing_post:
-        raise HTTPException(status_code=404, detail="Post not found")
-    
+    now = datetime.now(timezone.utc).isoformat()
     update_dict = {k: v for k, v in post_data.model_dump().items() if v is not None}
-    update_dict['updated_at'] = datetime.now(timezone.utc).isoformat()
+    update_dict['updated_at'] = now
     
     if 'title' in update_dict:
         update_dict['slug'] = create_slug(update_dict['title'])
     
     if 'content' in update_dict:
         update_dict['reading_time'] = calculate_reading_time(update_dict['content'])
+        update_dict.update(await render.render_fields(update_dict['content']))
+    
+    # One pipeline update: $literal keeps user text such as "$100" from being read as a
+    # field path, and published_at is only stamped on the draft -> published transition
+    set_stage = {k: {"$literal": v} for k, v in update_dict.items()}
+    if update_dict.get('published'):
+        set_stage['published_at'] = {"$cond": [{"$eq": ["$published", True]}, "$published_at", now]}
+    
+    existing_post = await db.posts.find_one_and_update(
+        {"id": post_id},
+        [{"$set": set_stage}],
+        projection={"_id": 0},
+        return_document=ReturnDocument.BEFORE
+    )
     
-    if 'published' in update_dict and update_dict['published'] and not existing_post.get('published'):
-        update_dict['published_at'] = datetime.now(timezone.utc).isoformat()
+    if not existing_post:
+        raise HTTPException(status_code=404, detail="Post not found")
     
-    await db.posts.update_one({"id": post_id}, {"$set": update_dict})
+    # The previous state decides the stats delta; the new state is that plus our changes
+    updated_post = {**existing_post, **update_dict}
+    was_published = bool(existing_post.get('published'))
+    if update_dict.get('published') and not was_published:
+        updated_post['published_at'] = now
     
-    updated_post = await db.posts.find_one({"id": post_id}, {"_id": 0})
+    if 'published' in update_dict and update_dict['published'] != was_published:
+        await stats.bump(db, published_posts=1 if update_dict['published'] else -1)
+        if update_dict['published']:
+            await newsletter.announce_post(db, post_id)
     
-    for field in ['created_at', 'updated_at', 'published_at']:
-        if field in updated_post and isinstance(updated_post[field], str):
-            updated_post[field] = datetime.fromisoformat(updated_post[field])
+    related_posts.schedule_refresh(post_id)
     
     return Post(**updated_post)
 
@@ -875,11 +1057,24 @@ async def delete_post(post_id: str, request: Request):
     """Delete a post (admin)"""
     await require_admin(request, db)
     
-    result = await db.posts.delete_one({"id": post_id})
+    deleted = await db.posts.find_one_and_delete(
+        {"id": post_id},
+        projection={"_id": 0, "published": 1, "views_count": 1}
+    )
     
-    if result.deleted_count == 0:
+    if not deleted:
         raise HTTPException(status_code=404, detail="Post not found")
     
+    await stats.bump(
+        db,
+        total_posts=-1,
+        published_posts=-1 if deleted.get("published") else 0,
+        total_views=-deleted.get("views_count", 0)
+    )
+    related_posts.schedule_refresh(post_id)
+    # Likes, bookmarks and comments are removed in the background
+    await cascade.schedule(db, post_id)
+    
     return {"message": "Post deleted successfully"}
 
 @api_router.post("/admin/categories", response_model=Category)
@@ -901,11 +1096,6 @@ async def update_category(category_id: str, category_data: CategoryCreate, reque
     """Update a category (admin)"""
     await require_admin(request, db)
     
-    existing_category = await db.categories.find_one({"id": category_id})
-    
-    if not existing_category:
-        raise HTTPException(status_code=404, detail="Category not found")
-    
     slug = create_slug(category_data.name)
     update_dict = {
         "name": category_data.name,
@@ -913,12 +1103,15 @@ async def update_category(category_id: str, category_data: CategoryCreate, reque
         "description": category_data.description
     }
     
-    await db.categories.update_one({"id": category_id}, {"$set": update_dict})
-    
-    updated_category = await db.categories.find_one({"id": category_id}, {"_id": 0})
+    updated_category = await db.categories.find_one_and_update(
+        {"id": category_id},
+        {"$set": update_dict},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
     
-    if 'created_at' in updated_category and isinstance(updated_category['created_at'], str):
-        updated_category['created_at'] = datetime.fromisoformat(updated_category['created_at'])
+    if not updated_category:
+        raise HTTPException(status_code=404, detail="Category not found")
     
     return Category(**updated_category)
 
@@ -935,16 +1128,41 @@ async def delete_category(category_id: str, request: Request):
     return {"message": "Category deleted successfully"}
 
 @api_router.get("/admin/comments", response_model=List[Comment])
-async def get_all_comments_admin(request: Request):
-    """Get all comments including pending (admin)"""
+async def get_all_comments_admin(
+    request: Request,
+    response: Response,
+    status: Optional[str] = None,
+    post_id: Optional[str] = None,
+    email: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = pagination.DEFAULT_PAGE_SIZE
+):
+    """Get comments including pending, newest first (admin)
+
+    Keyset-paginated: pass the X-Next-Cursor response header back as ?cursor=.
+    ``email`` matches a prefix of the author's email, ignoring case.
+    """
     await require_admin(request, db)
     
-    comments = await db.comments.find({}, {"_id": 0}).sort("created_at", -1).to_list(1000)
-    
-    for comment in comments:
-        if 'created_at' in comment and isinstance(comment['created_at'], str):
-            comment['created_at'] = datetime.fromisoformat(comment['created_at'])
-    
+    query = pagination.date_range("created_at", date_from, date_to)
+    if status is not None:
+        if status not in ("pending", "approved"):
+            raise HTTPException(status_code=400, detail="status must be 'pending' or 'approved'")
+        query["approved"] = status == "approved"
+    if post_id:
+        query["post_id"] = post_id
+    if email:
+        query.update(pagination.email_prefix(moderation.AUTHOR_EMAIL_KEY, moderation.author_email_key(email)))
+    
+    comments, next_cursor = await pagination.paginate(db.comments, query, "created_at", limit, cursor)
+    counter = None
+    if status is not None and len(query) == 1:
+        counters = await blog_stats.snapshot()
+        counter = counters["approved_comments" if status == "approved" else "pending_comments"]
+    total, capped = await pagination.count(db.comments, query, counter)
+    pagination.set_page_headers(response, next_cursor, total, capped)
     return comments
 
 @api_router.put("/admin/comments/{comment_id}/approve")
@@ -960,6 +1178,8 @@ async def approve_comment(comment_id: str, request: Request):
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Comment not found")
     
+    await stats.bump(db, pending_comments=-1)
+    
     return {"message": "Comment approved"}
 
 @api_router.delete("/admin/comments/{comment_id}")
@@ -967,122 +1187,287 @@ async def delete_comment_admin(comment_id: str, request: Request):
     """Delete a comment (admin)"""
     await require_admin(request, db)
     
-    result = await db.comments.delete_one({"id": comment_id})
+    # A pending comment is archived as a rejection so it trains the spam filter
+    deleted = await moderation.delete(db, {"id": comment_id})
     
-    if result.deleted_count == 0:
+    if not deleted["matched"]:
         raise HTTPException(status_code=404, detail="Comment not found")
     
     return {"message": "Comment deleted successfully"}
 
+@api_router.post("/admin/comments/bulk")
+async def bulk_moderate_comments(body: CommentBulkAction, request: Request):
+    """Approve, reject or delete many comments by ID list and/or filter (admin)"""
+    await require_admin(request, db)
+    
+    try:
+        query = moderation.build_query(
+            ids=body.ids, status=body.status, post_id=body.post_id,
+            email=body.email, date_from=body.date_from, date_to=body.date_to
+        )
+        result = await moderation.apply(db, body.action, query)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    
+    return {"message": f"Bulk {body.action} completed", "action": body.action, **result}
+
 @api_router.get("/admin/stats")
 async def get_stats(request: Request):
     """Get blog statistics (admin)"""
     await require_admin(request, db)
     
-    total_posts = await db.posts.count_documents({})
-    published_posts = await db.posts.count_documents({"published": True})
-    total_comments = await db.comments.count_documents({})
-    pending_comments = await db.comments.count_documents({"approved": False})
-    total_subscribers = await db.newsletter.count_documents({"active": True})
-    total_users = await db.users.count_documents({})
+    # Counters are maintained incrementally by the write paths (stats.py)
+    counters = await blog_stats.snapshot()
     
-    # Get total views
-    pipeline = [
-        {"$group": {"_id": None, "total_views": {"$sum": "$views_count"}}}
-    ]
-    views_result = await db.posts.aggregate(pipeline).to_list(1)
-    total_views = views_result[0]['total_views'] if views_result else 0
+    # Approximate unique visitors (HyperLogLog)
+    unique_visitors = {
+        "today": await visitor_tracker.unique_visitors(days=1),
+        "last_7_days": await visitor_tracker.unique_visitors(days=7),
+        "last_30_days": await visitor_tracker.unique_visitors(days=30),
+        "relative_error": visitor_tracker.relative_error
+    }
     
     return {
-        "total_posts": total_posts,
-        "published_posts": published_posts,
-        "draft_posts": total_posts - published_posts,
-        "total_comments": total_comments,
-        "pending_comments": pending_comments,
-        "approved_comments": total_comments - pending_comments,
-        "total_subscribers": total_subscribers,
-        "total_users": total_users,
-        "total_views": total_views
+        "total_posts": counters["total_posts"],
+        "published_posts": counters["published_posts"],
+        "draft_posts": counters["draft_posts"],
+        "total_comments": counters["total_comments"],
+        "pending_comments": counters["pending_comments"],
+        "approved_comments": counters["approved_comments"],
+        "total_subscribers": counters["total_subscribers"],
+        "total_users": counters["total_users"],
+        "total_views": counters["total_views"],
+        "unique_visitors": unique_visitors
     }
 
-@api_router.get("/admin/newsletter/subscribers", response_model=List[Newsletter])
-async def get_newsletter_subscribers(request: Request):
-    """Get all newsletter subscribers (admin)"""
+@api_router.post("/admin/stats/rebuild")
+async def rebuild_stats_admin(request: Request):
+    """Recompute stats counters from scratch (admin)"""
     await require_admin(request, db)
     
-    # Get all subscribers sorted by subscription date (newest first)
-    subscribers = await db.newsletter.find(
-        {},
-        {"_id": 0}
-    ).sort("subscribed_at", -1).to_list(10000)
+    await blog_stats.flush()
+    mismatches = await stats.verify_stats(db)
+    counters = await stats.rebuild_stats(db)
+    
+    return {
+        "message": "Stats rebuilt",
+        "stats": stats.with_derived(counters),
+        "corrected": {name: {"stored": stored, "actual": actual} for name, (stored, actual) in mismatches.items()}
+    }
+
+@api_router.get("/admin/stats/posts/{post_id}/unique-visitors")
+async def get_post_unique_visitors(post_id: str, request: Request, days: int = 30):
+    """Get estimated unique readers of a post per day (admin)"""
+    await require_admin(request, db)
+    
+    days = max(1, min(days, 365))
+    return {
+        "post_id": post_id,
+        "days": await visitor_tracker.daily_unique_visitors(post_id, days),
+        "total": await visitor_tracker.unique_visitors(post_id, days),
+        "relative_error": visitor_tracker.relative_error
+    }
+
+@api_router.post("/admin/related/rebuild")
+async def rebuild_related_posts(request: Request):
+    """Recompute related posts for every published post (admin)"""
+    await require_admin(request, db)
     
-    # Convert datetime strings to datetime objects if needed
-    for subscriber in subscribers:
-        if 'subscribed_at' in subscriber and isinstance(subscriber['subscribed_at'], str):
-            subscriber['subscribed_at'] = datetime.fromisoformat(subscriber['subscribed_at'])
+    indexed = await related_posts.rebuild()
+    return {"message": "Related posts rebuilt", "indexed_posts": indexed}
+
+@api_router.get("/admin/newsletter/subscribers", response_model=List[Newsletter])
+async def get_newsletter_subscribers(
+    request: Request,
+    response: Response,
+    status: Optional[str] = None,
+    email: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = pagination.DEFAULT_PAGE_SIZE
+):
+    """Get newsletter subscribers, newest first (admin)
+
+    Keyset-paginated: pass the X-Next-Cursor response header back as ?cursor=.
+    ``email`` matches a prefix of the subscriber's email.
+    """
+    await require_admin(request, db)
     
+    query = pagination.date_range("subscribed_at", date_from, date_to)
+    if status is not None:
+        if status not in ("active", "inactive"):
+            raise HTTPException(status_code=400, detail="status must be 'active' or 'inactive'")
+        query["active"] = status == "active"
+    if email:
+        # Subscriber emails are stored in canonical (lower-case) form
+        query.update(pagination.email_prefix("email", newsletter.canonical_email(email)))
+    
+    subscribers, next_cursor = await pagination.paginate(db.newsletter, query, "subscribed_at", limit, cursor)
+    counter = None
+    if status == "active" and len(query) == 1:
+        counter = (await blog_stats.snapshot())["total_subscribers"]
+    total, capped = await pagination.count(db.newsletter, query, counter)
+    pagination.set_page_headers(response, next_cursor, total, capped)
     return subscribers
 
 @api_router.get("/admin/newsletter/export")
-async def export_newsletter_subscribers(request: Request):
-    """Export newsletter subscribers as CSV (admin)"""
+async def export_newsletter_subscribers(request: Request, format: str = "csv", include_inactive: bool = False):
+    """Export newsletter subscribers as CSV, NDJSON or Parquet (admin)"""
     from fastapi.responses import StreamingResponse
-    import io
-    import csv
     
     await require_admin(request, db)
     
-    # Get all active subscribers
-    subscribers = await db.newsletter.find(
-        {"active": True},
-        {"_id": 0, "email": 1, "subscribed_at": 1, "active": 1}
-    ).sort("subscribed_at", -1).to_list(10000)
-    
-    # Create CSV in memory
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Write header
-    writer.writerow(['Email', 'Fecha de Suscripción', 'Estado'])
-    
-    # Write data
-    for sub in subscribers:
-        subscribed_date = sub.get('subscribed_at')
-        if isinstance(subscribed_date, str):
-            subscribed_date = datetime.fromisoformat(subscribed_date)
-        
-        formatted_date = subscribed_date.strftime('%Y-%m-%d %H:%M:%S') if subscribed_date else 'N/A'
-        status = 'Activo' if sub.get('active', True) else 'Inactivo'
-        
-        writer.writerow([sub['email'], formatted_date, status])
-    
-    # Prepare response
-    output.seek(0)
+    if format not in newsletter.EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format. Use one of: {', '.join(newsletter.EXPORT_FORMATS)}")
+    if format == "parquet" and not newsletter.parquet_available():
+        raise HTTPException(status_code=400, detail="Parquet export requires pandas and pyarrow")
+    
+    # Stream straight from the cursor: constant memory, no row cap
+    cursor = newsletter.export_cursor(db, include_inactive=include_inactive)
     
     return StreamingResponse(
-        iter([output.getvalue()]),
-        media_type="text/csv",
+        newsletter.export_chunks(format, cursor),
+        media_type=newsletter.EXPORT_FORMATS[format],
         headers={
-            "Content-Disposition": f"attachment; filename=newsletter_subscribers_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+            "Content-Disposition": f"attachment; filename=newsletter_subscribers_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{format}"
         }
     )
 
+@api_router.post("/admin/newsletter/import")
+async def import_newsletter_subscribers(request: Request, format: Optional[str] = None):
+    """Bulk import subscribers from a streamed CSV or NDJSON body (admin)"""
+    await require_admin(request, db)
+    
+    if format is None:
+        content_type = request.headers.get("content-type", "")
+        format = "ndjson" if "ndjson" in content_type or "jsonl" in content_type else "csv"
+    if format not in newsletter.IMPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format. Use one of: {', '.join(newsletter.IMPORT_FORMATS)}")
+    
+    report = await newsletter.import_subscribers(db, request.stream(), format)
+    return {"message": "Import completed", **report}
+
+@api_router.get("/admin/jobs/stats")
+async def get_job_stats(request: Request):
+    """Get job queue counts, queue lag and delivery throughput (admin)"""
+    await require_admin(request, db)
+    
+    return {
+        "queue": await jobs.queue_stats(db),
+        "workers": {"count": job_queue.workers, **job_queue.metrics.as_dict()},
+        "newsletter": newsletter.delivery_metrics.as_dict()
+    }
+
+@api_router.get("/admin/spam/stats")
+async def get_spam_stats(request: Request):
+    """Get spam filter state, verdict counts and scoring latency (admin)"""
+    await require_admin(request, db)
+    
+    return spam_filter.as_dict()
+
+@api_router.get("/admin/loop/stats")
+async def get_loop_stats(request: Request):
+    """Get event loop lag and, with the watchdog on, recent blocking stacks (admin)"""
+    await require_admin(request, db)
+    
+    return loop_monitor.as_dict()
+
+@api_router.post("/admin/debug/profile")
+async def run_sampling_profile(request: Request, seconds: float = 10, interval_ms: float = profiler.DEFAULT_INTERVAL_MS):
+    """Sample every thread's stack for `seconds`; collapsed stacks for a flame graph (admin)"""
+    await require_admin(request, db)
+    
+    try:
+        collapsed = await profiler.sampling_profiler.profile(seconds, interval_ms)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    return PlainTextResponse(collapsed, headers={
+        "Content-Disposition": f"attachment; filename={profiler.profile_filename()}"
+    })
+
+@api_router.get("/admin/debug/tracemalloc")
+async def get_tracemalloc_status(request: Request):
+    """Get tracemalloc state and the snapshots kept (admin)"""
+    await require_admin(request, db)
+    
+    return profiler.memory_tracker.as_dict()
+
+@api_router.post("/admin/debug/tracemalloc/start")
+async def start_tracemalloc(request: Request, frames: int = 1):
+    """Start tracing allocations; slows the process down until stopped (admin)"""
+    await require_admin(request, db)
+    
+    return profiler.memory_tracker.start(max(1, min(frames, 50)))
+
+@api_router.post("/admin/debug/tracemalloc/snapshot")
+async def take_tracemalloc_snapshot(request: Request, limit: int = 20):
+    """Take a snapshot and return its largest allocation sites (admin)"""
+    await require_admin(request, db)
+    
+    try:
+        return await asyncio.to_thread(profiler.memory_tracker.snapshot, limit)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@api_router.get("/admin/debug/tracemalloc/diff")
+async def diff_tracemalloc_snapshots(base: int, current: int, request: Request, limit: int = 30):
+    """Allocation sites that grew between two snapshots (admin)"""
+    await require_admin(request, db)
+    
+    try:
+        return await asyncio.to_thread(profiler.memory_tracker.diff, base, current, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@api_router.post("/admin/debug/tracemalloc/stop")
+async def stop_tracemalloc(request: Request):
+    """Stop tracing and drop the snapshots (admin)"""
+    await require_admin(request, db)
+    
+    return profiler.memory_tracker.stop()
+
+@api_router.get("/admin/render/stats")
+async def get_render_stats(request: Request):
+    """Get Markdown render cache hit ratio and render times (admin)"""
+    await require_admin(request, db)
+    
+    return render.render_metrics.as_dict()
+
+@api_router.post("/admin/spam/retrain")
+async def retrain_spam_filter(request: Request):
+    """Retrain the spam filter from moderation history now (admin)"""
+    await require_admin(request, db)
+    
+    trained = await spam_filter.retrain()
+    return {"message": "Spam filter retrained" if trained else "Not enough labelled comments", **spam_filter.as_dict()}
+
 @api_router.delete("/admin/newsletter/subscribers/{email}")
 async def delete_newsletter_subscriber(email: str, request: Request):
     """Delete a newsletter subscriber (admin)"""
     await require_admin(request, db)
     
-    result = await db.newsletter.delete_one({"email": email})
+    deleted = await db.newsletter.find_one_and_delete(
+        {"email": newsletter.canonical_email(email)},
+        projection={"_id": 0, "active": 1}
+    )
     
-    if result.deleted_count == 0:
+    if not deleted:
         raise HTTPException(status_code=404, detail="Subscriber not found")
     
+    if deleted.get('active', True):
+        await stats.bump(db, total_subscribers=-1)
+    
     return {"message": "Subscriber deleted successfully"}
 
 @api_router.put("/admin/newsletter/subscribers/{email}/toggle")
 async def toggle_newsletter_subscriber(email: str, request: Request):
     """Toggle subscriber active status (admin)"""
     await require_admin(request, db)
+    email = newsletter.canonical_email(email)
     
     # Get current status
     subscriber = await db.newsletter.find_one({"email": email})
@@ -1093,24 +1478,79 @@ async def toggle_newsletter_subscriber(email: str, request: Request):
     # Toggle status
     new_status = not subscriber.get('active', True)
     
-    await db.newsletter.update_one(
+    result = await db.newsletter.update_one(
         {"email": email},
         {"$set": {"active": new_status}}
     )
     
+    if result.modified_count:
+        await stats.bump(db, total_subscribers=1 if new_status else -1)
+    
     return {"message": f"Subscriber {'activated' if new_status else 'deactivated'}", "active": new_status}
 
+def collect_app_metrics():
+    """Counters kept by the background services, in exposition format"""
+    job_stats = job_queue.metrics
+    delivery = newsletter.delivery_metrics
+    spam_counts = spam_filter.counts
+    render_stats = render.render_metrics
+    return [
+        *metrics.format_family("blog_rate_limited_total", "counter", "Requests refused by rate limit policy",
+                               ("policy",), {(name,): n for name, n in rate_limiter.limited.items()}),
+        *metrics.format_family("blog_spam_comments_total", "counter", "Anonymous comments by spam verdict",
+                               ("verdict",), {(name,): spam_counts[name]
+                                              for name in ("auto_approved", "auto_rejected", "pending")}),
+        *metrics.format_family("blog_jobs_total", "counter", "Background jobs run by type and outcome",
+                               ("type", "outcome"), {
+                                   (job_type, outcome): n
+                                   for outcome, counts in (("completed", job_stats.completed),
+                                                           ("failed", job_stats.failed),
+                                                           ("retried", job_stats.retried))
+                                   for job_type, n in counts.items()
+                               }),
+        *metrics.format_family("blog_job_queue_lag_seconds", "gauge", "Queue lag of the last claimed job",
+                               (), {(): job_stats.lag_seconds_last}),
+        *metrics.format_family("blog_newsletter_emails_total", "counter", "Announcement emails by result",
+                               ("result",), {("sent",): delivery.sent, ("refused",): delivery.refused}),
+        *metrics.format_family("blog_render_total", "counter", "Markdown renders (cache misses)",
+                               (), {(): render_stats.renders}),
+        *metrics.format_family("blog_render_seconds_total", "counter", "Time spent rendering Markdown",
+                               (), {(): render_stats.render_seconds}),
+        *metrics.format_family("blog_render_cache_lookups_total", "counter", "Render cache lookups by result",
+                               ("result",), {("hit",): render_stats.cache_hits,
+                                             ("miss",): render_stats.cache_misses}),
+    ]
+
+metrics.registry.register_collector(collect_app_metrics)
+metrics.registry.register_collector(loop_monitor.collect)
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics(request: Request):
+    """Prometheus scrape endpoint (METRICS_TOKEN bearer auth if configured)"""
+    if not metrics.authorized(request.headers.get("authorization", "")):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return PlainTextResponse(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
 # Include the router in the main app
 app.include_router(api_router)
 
+# Added before CORS so 429 responses still carry CORS headers
+app.add_middleware(RateLimitMiddleware, limiter=rate_limiter)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=pagination.EXPOSED_HEADERS,
 )
 
+app.add_middleware(DBMonitorMiddleware)
+
+# Outermost, so latency covers the other middleware and 429s are counted too
+app.add_middleware(MetricsMiddleware)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -1118,6 +1558,35 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def start_background_tasks():
+    await visitors.ensure_indexes(db)
+    await related.ensure_indexes(db)
+    related_posts.start()
+    await newsletter.ensure_indexes(db)
+    await pagination.ensure_indexes(db)
+    await moderation.ensure_indexes(db)
+    await jobs.ensure_indexes(db)
+    await cascade.ensure_indexes(db)
+    await stats.ensure_seeded(db)
+    await cascade.resume(db)
+    await sessions.ensure_indexes(db)
+    await auth.ensure_indexes(db)
+    if isinstance(rate_limiter.backend, MongoBuckets):
+        await rate_limiter.backend.ensure_indexes()
+    visitor_tracker.start()
+    blog_stats.start()
+    job_queue.start()
+    spam_filter.start()
+    session_reaper.start()
+    loop_monitor.start()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await visitor_tracker.stop()
+    await blog_stats.stop()
+    await job_queue.stop()
+    await spam_filter.stop()
+    await session_reaper.stop()
+    await loop_monitor.stop()
     client.close()
\ No newline at end of file
@@ -0,0 +1,152 @@
+"""
+Session housekeeping for FarchoDev Blog
+db.sessions gets a TTL index on expires_at so MongoDB removes expired
+sessions on its own. For deployments whose MongoDB-compatible backend
+cannot use TTL indexes, SESSION_REAPER_ENABLED=true runs a background task
+that deletes expired sessions in batches instead.
+"""
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+SESSION_TTL_INDEX = os.environ.get('SESSION_TTL_INDEX', 'true').lower() == 'true'
+REAPER_ENABLED = os.environ.get('SESSION_REAPER_ENABLED', 'false').lower() == 'true'
+REAPER_INTERVAL_SECONDS = float(os.environ.get('SESSION_REAPER_INTERVAL', '600'))
+REAP_BATCH_SIZE = 1000
+
+
+async def ensure_indexes(db):
+    # Older databases may hold duplicate tokens or an expires_at index with other
+    # options; both are migrated here instead of failing startup
+    try:
+        indexes = await db.sessions.index_information()
+        if not indexes.get("session_token_1", {}).get("unique"):
+            removed = await drop_duplicate_tokens(db)
+            if removed:
+                logger.warning("Removed %d sessions sharing a token; their users must log in again", removed)
+            if "session_token_1" in indexes:
+                await db.sessions.drop_index("session_token_1")
+        await db.sessions.create_index("session_token", unique=True)
+    except OperationFailure as exc:
+        logger.warning("Could not create unique index on sessions.session_token: %s", exc)
+    await db.sessions.create_index("user_id")
+    try:
+        indexes = await db.sessions.index_information()
+        ttl = 0 if SESSION_TTL_INDEX else None
+        if "expires_at_1" in indexes and indexes["expires_at_1"].get("expireAfterSeconds") != ttl:
+            await db.sessions.drop_index("expires_at_1")
+        if SESSION_TTL_INDEX:
+            await db.sessions.create_index("expires_at", expireAfterSeconds=0)
+        else:
+            await db.sessions.create_index("expires_at")
+    except OperationFailure as exc:
+        # Without the TTL index expired sessions pile up; the reaper can cover for it
+        logger.warning("Could not create index on sessions.expires_at: %s", exc)
+
+
+async def drop_duplicate_tokens(db) -> int:
+    """One-off migration: delete every session whose token is not unique
+
+    A token shared by several sessions cannot tell which user it belongs
+    to, so none of the copies is kept. Returns the number of sessions removed.
+    """
+    removed = 0
+    async for group in db.sessions.aggregate([
+        {"$group": {"_id": "$session_token", "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+    ], allowDiskUse=True):
+        removed += (await db.sessions.delete_many({"_id": {"$in": group["ids"]}})).deleted_count
+    return removed
+
+
+async def reap_expired(db, batch_size: int = REAP_BATCH_SIZE) -> int:
+    """Delete expired sessions in bounded batches; returns how many were removed"""
+    removed = 0
+    now = datetime.now(timezone.utc)
+    while True:
+        expired = await db.sessions.find(
+            {"expires_at": {"$lt": now}}, {"_id": 1}
+        ).limit(batch_size).to_list(batch_size)
+        if not expired:
+            break
+        result = await db.sessions.delete_many({"_id": {"$in": [doc["_id"] for doc in expired]}})
+        removed += result.deleted_count
+        if len(expired) < batch_size:
+            break
+    return removed
+
+
+async def session_stats(db) -> dict:
+    """Session counts: total, active, expired but not yet removed, and per provider"""
+    now = datetime.now(timezone.utc)
+    total, expired, providers, oldest, indexes = await asyncio.gather(
+        db.sessions.estimated_document_count(),
+        db.sessions.count_documents({"expires_at": {"$lt": now}}),
+        db.sessions.aggregate([
+            {"$match": {"expires_at": {"$gte": now}}},
+            {"$group": {"_id": "$provider", "count": {"$sum": 1}}},
+        ]).to_list(None),
+        db.sessions.find_one({"expires_at": {"$lt": now}}, {"_id": 0, "expires_at": 1}, sort=[("expires_at", 1)]),
+        db.sessions.index_information(),
+    )
+    oldest_expired_hours = 0.0
+    if oldest:
+        expires_at = oldest["expires_at"]
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        oldest_expired_hours = (now - expires_at).total_seconds() / 3600
+    return {
+        "total": total,
+        "active": sum(row["count"] for row in providers),
+        "expired": expired,
+        "by_provider": {row["_id"] or "unknown": row["count"] for row in providers},
+        "oldest_expired_hours": round(oldest_expired_hours, 1),
+        "ttl_index": any("expireAfterSeconds" in info for info in indexes.values()),
+    }
+
+
+class SessionReaper:
+    """Periodic expired-session deletion (only needed without a TTL index)"""
+
+    def __init__(self, db, interval: float = REAPER_INTERVAL_SECONDS):
+        self.db = db
+        self.interval = interval
+        self.reaped = 0
+        self.last_run: Optional[datetime] = None
+        self.last_run_seconds = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def run_once(self) -> int:
+        started = time.perf_counter()
+        removed = await reap_expired(self.db)
+        self.reaped += removed
+        self.last_run = datetime.now(timezone.utc)
+        self.last_run_seconds = time.perf_counter() - started
+        if removed:
+            logger.info("Reaped %d expired sessions in %.2fs", removed, self.last_run_seconds)
+        return removed
+
+    async def run(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("Session reaper failed")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if REAPER_ENABLED and self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Servidor SMTP local de pruebas (acepta y descarta correos)
+Stand-in for a real SMTP relay when testing newsletter delivery locally.
+
+Usage:
+    python smtp_sink.py                  # escucha en localhost:1025
+    python smtp_sink.py --port 2525 --save ./outbox
+"""
+import argparse
+import asyncio
+import time
+from pathlib import Path
+from typing import Optional
+
+
+class SMTPSink:
+    """Minimal SMTP server: EHLO/HELO, MAIL, RCPT, DATA, RSET, NOOP, QUIT"""
+
+    def __init__(self, save_dir: Optional[Path] = None):
+        self.save_dir = save_dir
+        self.messages = 0
+        self.started = time.monotonic()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        async def reply(line: str):
+            writer.write(f"{line}\r\n".encode())
+            await writer.drain()
+
+        await reply("220 farchodev-smtp-sink ready")
+        recipients = []
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command = line.decode(errors="replace").strip()
+                verb = command[:4].upper()
+                if verb in ("EHLO", "HELO"):
+                    await reply("250 farchodev-smtp-sink")
+                elif verb == "MAIL":
+                    recipients = []
+                    await reply("250 OK")
+                elif verb == "RCPT":
+                    recipients.append(command[8:].strip(" <>"))
+                    await reply("250 OK")
+                elif verb == "DATA":
+                    await reply("354 End data with <CR><LF>.<CR><LF>")
+                    data = await reader.readuntil(b"\r\n.\r\n")
+                    self.store(data[:-5])
+                    await reply("250 OK: queued")
+                elif verb == "RSET":
+                    recipients = []
+                    await reply("250 OK")
+                elif verb == "NOOP":
+                    await reply("250 OK")
+                elif verb == "QUIT":
+                    await reply("221 Bye")
+                    break
+                else:
+                    await reply("502 Command not implemented")
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+    def store(self, data: bytes):
+        self.messages += 1
+        if self.save_dir is not None:
+            (self.save_dir / f"{self.messages:08d}.eml").write_bytes(data)
+
+    async def report(self, interval: float = 5.0):
+        last = 0
+        while True:
+            await asyncio.sleep(interval)
+            if self.messages != last:
+                rate = (self.messages - last) / interval
+                print(f"📨 {self.messages} mensajes recibidos ({rate:.1f}/s)")
+                last = self.messages
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Servidor SMTP local de pruebas")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=1025)
+    parser.add_argument("--save", type=Path, help="Directorio donde guardar los .eml recibidos")
+    args = parser.parse_args()
+
+    if args.save:
+        args.save.mkdir(parents=True, exist_ok=True)
+    sink = SMTPSink(args.save)
+    server = await asyncio.start_server(sink.handle, args.host, args.port, limit=16 * 1024 * 1024)
+    print(f"📬 SMTP sink escuchando en {args.host}:{args.port}")
+    async with server:
+        await asyncio.gather(server.serve_forever(), sink.report())
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
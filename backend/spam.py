@@ -0,0 +1,193 @@
+"""
+Spam scoring for anonymous comments in FarchoDev Blog
+Multinomial Naive Bayes over hashed tokens, trained from moderation history:
+approved comments are ham and comments rejected by an admin (archived in
+db.rejected_comments) are spam. Training is one bincount per class over the
+whole corpus; scoring a comment is a gather and a sum over a precomputed
+log-likelihood-ratio vector, so it takes microseconds.
+
+New anonymous comments are auto-approved or auto-rejected when the model is
+confident enough and left pending otherwise. The model is retrained
+periodically in a worker process so the event loop never runs the training.
+"""
+import asyncio
+import logging
+import math
+import multiprocessing
+import os
+import re
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SPAM_FILTER_ENABLED = os.environ.get('SPAM_FILTER_ENABLED', 'true').lower() == 'true'
+N_FEATURES = 2 ** 18
+ALPHA = 1.0  # Laplace smoothing
+APPROVE_BELOW = float(os.environ.get('SPAM_APPROVE_BELOW', '0.02'))
+REJECT_ABOVE = float(os.environ.get('SPAM_REJECT_ABOVE', '0.98'))
+MIN_EXAMPLES_PER_CLASS = int(os.environ.get('SPAM_MIN_EXAMPLES', '20'))
+MAX_TRAINING_EXAMPLES = 50000  # Per class, newest first
+RETRAIN_INTERVAL_SECONDS = float(os.environ.get('SPAM_RETRAIN_INTERVAL', '3600'))
+MAX_TEXT_CHARS = 5000
+
+TOKEN_PATTERN = re.compile(r"[a-záéíóúñü0-9$€@.]{2,}")
+URL_PATTERN = re.compile(r"https?://([^/\s]+)|www\.([^/\s]+)")
+TRAINING_PROJECTION = {"_id": 0, "author_name": 1, "author_email": 1, "content": 1}
+
+
+def tokens(author_name: str, author_email: str, content: str) -> List[str]:
+    """Words plus a few structural features (links, their domains, email domain)"""
+    content = content[:MAX_TEXT_CHARS].lower()
+    out = TOKEN_PATTERN.findall(content)
+    for match in URL_PATTERN.finditer(content):
+        out.append("url:")
+        out.append("domain:" + (match.group(1) or match.group(2)))
+    out.extend("name:" + word for word in author_name.lower().split()[:3])
+    domain = author_email.rpartition("@")[2].lower()
+    if domain:
+        out.append("email:" + domain)
+    if content.count("http") >= 3:
+        out.append("many-links:")
+    return out
+
+
+def feature_indices(words: Sequence[str], n_features: int = N_FEATURES) -> np.ndarray:
+    # crc32 is stable across processes, unlike hash(): the model is trained in a worker
+    return np.fromiter((zlib.crc32(w.encode()) % n_features for w in words), dtype=np.int64, count=len(words))
+
+
+def comment_indices(comment: dict, n_features: int = N_FEATURES) -> np.ndarray:
+    return feature_indices(tokens(
+        comment.get("author_name") or "", comment.get("author_email") or "", comment.get("content") or ""
+    ), n_features)
+
+
+class SpamModel:
+    """Log prior ratio plus a per-feature log-likelihood ratio (spam vs ham)"""
+
+    def __init__(self, log_prior_ratio: float, log_ratio: np.ndarray, examples: Tuple[int, int]):
+        self.log_prior_ratio = log_prior_ratio
+        self.log_ratio = log_ratio
+        self.examples = examples  # (ham, spam)
+
+    @classmethod
+    def train(cls, ham: List[dict], spam: List[dict], n_features: int = N_FEATURES) -> "SpamModel":
+        counts = []
+        for comments in (ham, spam):
+            indices = [comment_indices(c, n_features) for c in comments]
+            flat = np.concatenate(indices) if indices else np.zeros(0, dtype=np.int64)
+            counts.append(np.bincount(flat, minlength=n_features).astype(np.float64))
+        ham_counts, spam_counts = counts
+        log_ham = np.log(ham_counts + ALPHA) - math.log(ham_counts.sum() + ALPHA * n_features)
+        log_spam = np.log(spam_counts + ALPHA) - math.log(spam_counts.sum() + ALPHA * n_features)
+        return cls(
+            log_prior_ratio=math.log(len(spam)) - math.log(len(ham)),
+            log_ratio=(log_spam - log_ham).astype(np.float32),
+            examples=(len(ham), len(spam)),
+        )
+
+    def score(self, comment: dict) -> float:
+        """Probability that one comment is spam"""
+        logit = self.log_prior_ratio + float(self.log_ratio[comment_indices(comment, len(self.log_ratio))].sum())
+        return 1.0 / (1.0 + math.exp(-max(min(logit, 50.0), -50.0)))
+
+
+def _train_in_worker(ham: List[dict], spam: List[dict]) -> SpamModel:
+    return SpamModel.train(ham, spam)
+
+
+class SpamFilter:
+    """Holds the current model, classifies new comments and retrains periodically"""
+
+    def __init__(self, db, retrain_interval: float = RETRAIN_INTERVAL_SECONDS):
+        self.db = db
+        self.retrain_interval = retrain_interval
+        self.model: Optional[SpamModel] = None
+        self.trained_at: Optional[datetime] = None
+        self.train_seconds = 0.0
+        self.counts = {"scored": 0, "auto_approved": 0, "auto_rejected": 0, "pending": 0}
+        self.score_seconds = 0.0
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def classify(self, author_name: str, author_email: str, content: str) -> Tuple[str, Optional[float]]:
+        """("ham" | "spam" | "pending", spam probability or None without a model)"""
+        if not SPAM_FILTER_ENABLED or self.model is None:
+            return "pending", None
+        started = time.perf_counter()
+        score = self.model.score({"author_name": author_name, "author_email": author_email, "content": content})
+        self.score_seconds += time.perf_counter() - started
+        self.counts["scored"] += 1
+        if score <= APPROVE_BELOW:
+            verdict = "ham"
+            self.counts["auto_approved"] += 1
+        elif score >= REJECT_ABOVE:
+            verdict = "spam"
+            self.counts["auto_rejected"] += 1
+        else:
+            verdict = "pending"
+            self.counts["pending"] += 1
+        return verdict, score
+
+    async def training_data(self) -> Tuple[List[dict], List[dict]]:
+        # Only human decisions are labels; auto-rejections would reinforce the model's own mistakes
+        ham = await self.db.comments.find({"approved": True, "auto_approved": {"$ne": True}}, TRAINING_PROJECTION) \
+            .sort("created_at", -1).limit(MAX_TRAINING_EXAMPLES).to_list(MAX_TRAINING_EXAMPLES)
+        spam = await self.db.rejected_comments.find({"auto_rejected": {"$ne": True}}, TRAINING_PROJECTION) \
+            .sort("rejected_at", -1).limit(MAX_TRAINING_EXAMPLES).to_list(MAX_TRAINING_EXAMPLES)
+        return ham, spam
+
+    async def retrain(self) -> bool:
+        """Train a new model in the worker process; False if there are too few examples"""
+        ham, spam = await self.training_data()
+        if min(len(ham), len(spam)) < MIN_EXAMPLES_PER_CLASS:
+            logger.info("Spam filter not trained: %d ham / %d spam examples", len(ham), len(spam))
+            return False
+        if self._executor is None:
+            # spawn: forking a process that runs an event loop and driver threads is unsafe
+            self._executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+        started = time.perf_counter()
+        self.model = await asyncio.get_running_loop().run_in_executor(self._executor, _train_in_worker, ham, spam)
+        self.train_seconds = time.perf_counter() - started
+        self.trained_at = datetime.now(timezone.utc)
+        return True
+
+    def as_dict(self) -> dict:
+        scored = self.counts["scored"]
+        return {
+            "enabled": SPAM_FILTER_ENABLED,
+            "trained": self.model is not None,
+            "trained_at": self.trained_at.isoformat() if self.trained_at else None,
+            "train_seconds": round(self.train_seconds, 3),
+            "examples": {"ham": self.model.examples[0], "spam": self.model.examples[1]} if self.model else None,
+            "thresholds": {"approve_below": APPROVE_BELOW, "reject_above": REJECT_ABOVE},
+            **self.counts,
+            "avg_score_microseconds": round(self.score_seconds / scored * 1e6, 1) if scored else 0.0,
+        }
+
+    async def run(self):
+        while True:
+            try:
+                await self.retrain()
+            except Exception:
+                logger.exception("Spam filter retraining failed")
+            await asyncio.sleep(self.retrain_interval)
+
+    def start(self):
+        if SPAM_FILTER_ENABLED and self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
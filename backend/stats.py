@@ -0,0 +1,200 @@
+"""
+Incrementally maintained blog statistics for FarchoDev Blog
+Write paths bump counters in a single db.stats document so the admin
+dashboard is served with one read instead of a full count per collection.
+
+Ejecutar:
+    python stats.py --verify     Compara los contadores con un recuento completo
+    python stats.py --rebuild    Recalcula los contadores desde cero
+"""
+import asyncio
+import logging
+import os
+import sys
+from datetime import datetime, timezone
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+STATS_ID = "blog"
+VIEWS_FLUSH_INTERVAL_SECONDS = float(os.environ.get('STATS_VIEWS_FLUSH_INTERVAL', '5'))
+
+COUNTERS = (
+    "total_posts",
+    "published_posts",
+    "total_comments",
+    "pending_comments",
+    "total_subscribers",
+    "total_users",
+    "total_views",
+)
+
+
+async def bump(db, **deltas: int):
+    """Atomically apply counter deltas (no-op when all deltas are zero)
+
+    Never upserts: a document created from deltas would hold differences
+    instead of totals. The document is seeded at startup (ensure_seeded).
+    """
+    deltas = {k: int(v) for k, v in deltas.items() if v}
+    if not deltas:
+        return
+    unknown = set(deltas) - set(COUNTERS)
+    if unknown:
+        raise ValueError(f"Unknown stats counters: {sorted(unknown)}")
+    await db.stats.update_one(
+        {"_id": STATS_ID},
+        {"$inc": deltas, "$set": {"updated_at": datetime.now(timezone.utc)}}
+    )
+
+
+async def compute_stats(db) -> dict:
+    """Recount every counter from the source collections (slow path)"""
+    (total_posts, published_posts, total_comments, pending_comments,
+     total_subscribers, total_users, views_result) = await asyncio.gather(
+        db.posts.count_documents({}),
+        db.posts.count_documents({"published": True}),
+        db.comments.count_documents({}),
+        db.comments.count_documents({"approved": False}),
+        db.newsletter.count_documents({"active": True}),
+        db.users.count_documents({}),
+        db.posts.aggregate([
+            {"$group": {"_id": None, "total_views": {"$sum": "$views_count"}}}
+        ]).to_list(1),
+    )
+    return {
+        "total_posts": total_posts,
+        "published_posts": published_posts,
+        "total_comments": total_comments,
+        "pending_comments": pending_comments,
+        "total_subscribers": total_subscribers,
+        "total_users": total_users,
+        "total_views": views_result[0]["total_views"] if views_result else 0,
+    }
+
+
+async def rebuild_stats(db) -> dict:
+    """Replace the counters document with a fresh recount"""
+    counters = await compute_stats(db)
+    now = datetime.now(timezone.utc)
+    await db.stats.replace_one(
+        {"_id": STATS_ID},
+        {**counters, "updated_at": now, "rebuilt_at": now},
+        upsert=True
+    )
+    return counters
+
+
+async def ensure_seeded(db) -> bool:
+    """Rebuild the counters when the document is missing or incomplete (run at startup)"""
+    doc = await db.stats.find_one({"_id": STATS_ID}, {"_id": 0})
+    if doc is not None and all(name in doc for name in COUNTERS):
+        return False
+    logger.info("Seeding blog stats from a full recount")
+    await rebuild_stats(db)
+    return True
+
+
+async def verify_stats(db) -> dict:
+    """Compare stored counters with a recount; returns {counter: (stored, actual)} for mismatches"""
+    stored = await db.stats.find_one({"_id": STATS_ID}) or {}
+    actual = await compute_stats(db)
+    return {
+        name: (stored.get(name), value)
+        for name, value in actual.items()
+        if stored.get(name) != value
+    }
+
+
+def with_derived(counters: dict) -> dict:
+    """Counters plus the derived fields returned by /api/admin/stats"""
+    counters = {name: counters.get(name, 0) for name in COUNTERS}
+    counters["draft_posts"] = counters["total_posts"] - counters["published_posts"]
+    counters["approved_comments"] = counters["total_comments"] - counters["pending_comments"]
+    return counters
+
+
+class BlogStats:
+    """Counter snapshot reader plus a write-behind buffer for view counts
+
+    Views are the hottest write path, so they are summed in memory and
+    flushed every few seconds instead of costing a second update per view.
+    """
+
+    def __init__(self, db, flush_interval: float = VIEWS_FLUSH_INTERVAL_SECONDS):
+        self.db = db
+        self.flush_interval = flush_interval
+        self._pending_views = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def add_views(self, count: int = 1):
+        self._pending_views += count
+
+    async def flush(self):
+        pending, self._pending_views = self._pending_views, 0
+        try:
+            await bump(self.db, total_views=pending)
+        except Exception:
+            self._pending_views += pending
+            raise
+
+    async def snapshot(self) -> dict:
+        """Current counters from the stats document (rebuilt if missing)"""
+        doc = await self.db.stats.find_one({"_id": STATS_ID}, {"_id": 0})
+        if doc is None or any(name not in doc for name in COUNTERS):
+            doc = await rebuild_stats(self.db)
+        doc = with_derived(doc)
+        doc["total_views"] += self._pending_views
+        return doc
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Failed to flush view counter")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+
+async def main():
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from pathlib import Path
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+
+    if len(sys.argv) < 2 or sys.argv[1] not in ("--verify", "--rebuild"):
+        print("📖 USO:")
+        print("  python stats.py --verify    - Verificar contadores contra un recuento completo")
+        print("  python stats.py --rebuild   - Recalcular contadores desde cero")
+        client.close()
+        return
+
+    if sys.argv[1] == "--verify":
+        mismatches = await verify_stats(db)
+        if not mismatches:
+            print("✅ Todos los contadores coinciden")
+        for name, (stored, actual) in mismatches.items():
+            print(f"⚠️  {name}: guardado={stored} real={actual}")
+    else:
+        counters = await rebuild_stats(db)
+        print("✅ Contadores recalculados:")
+        for name, value in counters.items():
+            print(f"   {name}: {value}")
+
+    client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Tests para sync_roles: roles sincronizados con ADMIN_EMAILS en una consulta y un bulk_write
+"""
+import asyncio
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import auth
+
+
+def seed(db):
+    db.users.seed([
+        {"id": "1", "email": "ana@example.com", "role": "user"},     # listed: promote
+        {"id": "2", "email": "old@example.com", "role": "admin"},    # no longer listed: demote
+        {"id": "3", "email": "boss@example.com", "role": "admin"},   # listed and admin already
+        {"id": "4", "email": "reader@example.com", "role": "user"},
+    ])
+    return db
+
+
+def sync(db, dry_run=False, admins=("ana@example.com", "boss@example.com", "new@example.com")):
+    original = auth.ADMIN_EMAILS
+    auth.ADMIN_EMAILS = list(admins)
+    try:
+        return asyncio.run(auth.sync_roles(db, dry_run=dry_run))
+    finally:
+        auth.ADMIN_EMAILS = original
+
+
+def test_promotions_and_demotions_in_one_query_and_one_bulk_write(fake_db):
+    db = seed(fake_db)
+    result = sync(db)
+    assert (result["promoted"], result["demoted"], result["missing"]) == (
+        ["ana@example.com"], ["old@example.com"], ["new@example.com"]
+    )
+    assert db.users.calls == ["find", "bulk_write"] and result["modified"] == 2
+    assert [doc["role"] for doc in db.users.docs] == ["admin", "user", "admin", "user"]
+
+
+def test_second_run_and_dry_run_write_nothing(fake_db):
+    db = seed(fake_db)
+    preview = sync(db, dry_run=True)
+    assert preview["promoted"] == ["ana@example.com"] and "bulk_write" not in db.users.calls
+    sync(db)
+    again = sync(db)
+    assert (again["promoted"], again["demoted"], again["modified"]) == ([], [], 0)
+    assert db.users.calls.count("bulk_write") == 1
+
+
+def test_admin_emails_match_stored_emails_in_any_case(fake_db):
+    fake_db.users.seed([
+        {"id": "1", "email": "Admin@Site.com", "role": "user"},
+        {"id": "2", "email": "EDITOR@site.com", "role": "admin"},
+    ])
+    result = sync(fake_db, admins=("admin@site.com", "editor@site.com"))
+    assert (result["promoted"], result["demoted"], result["missing"]) == (["Admin@Site.com"], [], [])
+    assert [doc["role"] for doc in fake_db.users.docs] == ["admin", "admin"]
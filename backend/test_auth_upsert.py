@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Tests para create_or_update_user: un solo round-trip a MongoDB por login
+"""
+import asyncio
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from conftest import FakeDB
+
+import auth
+
+
+def login(db, picture=None):
+    return asyncio.run(auth.create_or_update_user(
+        db, email="ana@example.com", name="Ana", picture=picture, provider="github"
+    ))
+
+
+def test_new_user_is_one_upsert_plus_counter():
+    db = FakeDB(stats=[{"_id": "blog"}])
+    user = login(db)
+    assert db.users.calls == ["find_one_and_update"] and db.stats.calls == ["update_one"]
+    assert db.user_profiles.calls == [] and db.counters() == {"total_users": 1}
+    assert user.email == "ana@example.com" and user.provider == "github" and user.role == "user"
+
+
+def test_returning_user_is_a_single_round_trip():
+    db = FakeDB(stats=[{"_id": "blog"}])
+    first = login(db)
+    db.users.calls.clear()
+    db.stats.calls.clear()
+    again = login(db, picture="https://avatars.example.com/ana.png")
+    assert db.users.calls == ["find_one_and_update"] and db.stats.calls == []
+    assert len(db.users.docs) == 1
+    assert again.id == first.id and again.created_at == first.created_at
+    assert again.picture == "https://avatars.example.com/ana.png"
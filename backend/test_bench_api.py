@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Tests para el benchmark de la API: percentiles, dataset sintético y detección de regresiones
+"""
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import pytest
+
+from benchmarks import bench_api, dataset
+
+
+def test_nearest_rank_percentiles():
+    latencies = [i / 1000 for i in range(1, 101)]  # 1..100 ms
+    result = bench_api.summarize(latencies, wall_seconds=2.0, errors=1)
+    assert (result["p50_ms"], result["p95_ms"], result["p99_ms"]) == (50.0, 95.0, 99.0)
+    assert result["throughput_rps"] == 50.0 and result["errors"] == 1
+
+
+def test_dataset_is_reproducible_from_the_seed():
+    first = dataset.build(posts=5, users=3, seed=7)
+    assert first["posts"][0]["id"] == dataset.build(posts=5, users=3, seed=7)["posts"][0]["id"]
+    assert first["posts"][0]["id"] != dataset.build(posts=5, users=3, seed=8)["posts"][0]["id"]
+    assert first["posts"][0]["content_html"].startswith("<h2")
+
+
+def test_engagement_pairs_are_unique_and_reach_the_requested_count():
+    data = dataset.build(posts=20, users=10, seed=3)
+    pairs = [(like["post_id"], like["user_id"]) for like in data["post_likes"]]
+    assert len(pairs) == len(set(pairs)) == 60
+    assert dataset.Spec.scaled(100_000).total() in range(99_000, 101_000)
+
+
+def test_popular_items_are_the_same_in_every_collection():
+    generator = dataset.Generator(dataset.Spec(seed=5))
+    generator.post_ids = [f"p{i}" for i in range(50)]
+    generator.user_ids = [f"u{i}" for i in range(50)]
+    top = lambda population: np.bincount(generator.zipf_indexes(population, 5000)).argmax()
+    assert top("posts") == top("posts")
+    assert top("users") == top("users")
+
+
+def test_write_raises_failed_batches():
+    class FailingCollection:
+        def __init__(self):
+            self.calls = 0
+
+        async def bulk_write(self, operations, ordered=True):
+            self.calls += 1
+            if self.calls == 2:
+                raise RuntimeError("disk full")
+            return SimpleNamespace(inserted_count=len(operations))
+
+    collection = FailingCollection()
+    docs = ({"n": i} for i in range(100))
+    with pytest.raises(RuntimeError, match="disk full"):
+        asyncio.run(dataset.write(collection, docs, batch_size=10, parallel=1))
+    assert collection.calls < 10
+
+
+def test_compare_flags_only_regressions_beyond_threshold():
+    def results(p95, rps):
+        return {"results": {"get_post": {"p50_ms": 1.0, "p95_ms": p95, "p99_ms": 3.0, "throughput_rps": rps}}}
+
+    baseline = results(p95=2.0, rps=1000)
+    assert bench_api.compare(baseline, results(p95=2.1, rps=960), threshold=10) == []
+    assert bench_api.compare(baseline, results(p95=2.5, rps=800), threshold=10) == [
+        ("get_post", "p95_ms", 25.0), ("get_post", "throughput_rps", -20.0)
+    ]
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Tests para el borrado en cascada de posts y el barrido de huérfanos
+"""
+import asyncio
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import cascade
+import visitors
+
+
+def seed(db):
+    db.posts.seed([{"id": "kept"}])
+    db.post_likes.seed([{"post_id": "gone"}] * 5 + [{"post_id": "kept"}])
+    db.bookmarks.seed([{"post_id": "gone"}] * 2)
+    db.comments.seed([{"post_id": "gone", "approved": i % 2 == 0} for i in range(7)] + [{"post_id": "kept", "approved": True}])
+    db.post_visitors.seed([{"post_id": "gone"}, {"post_id": visitors.SITE_KEY}])
+    return db
+
+
+def test_dependents_are_deleted_in_batches(fake_db):
+    db = seed(fake_db)
+    removed = asyncio.run(cascade.delete_post_dependents(db, ["gone"], batch_size=2))
+    assert removed == {"post_likes": 5, "bookmarks": 2, "comments": 7, "post_visitors": 1}
+    assert [d["post_id"] for d in db.post_likes.docs] == ["kept"]
+    assert db.post_likes.calls.count("delete_many") == 3  # 2 + 2 + 1
+    assert len(db.comments.docs) == 1
+    assert db.counters() == {"total_comments": -7, "pending_comments": -3}
+
+
+def test_orphan_lookup_skips_live_posts_and_site_key(fake_db):
+    db = seed(fake_db)
+    assert asyncio.run(cascade.find_orphan_post_ids(db, "post_likes", "post_id")) == ["gone"]
+    assert asyncio.run(cascade.find_orphan_post_ids(db, "post_visitors", "post_id")) == ["gone"]
+
+
+def test_resume_requeues_failed_cascades(fake_db):
+    fake_db.post_tombstones.seed([{"post_id": "gone", "status": "pending"}, {"post_id": "new", "status": "pending"}])
+    fake_db.jobs.unique = ("dedupe_key",)
+    fake_db.jobs.seed([{"dedupe_key": "posts.cascade_delete:gone", "status": "failed", "attempts": 5,
+                        "finished_at": "2025-01-01", "last_error": "boom"}])
+    assert asyncio.run(cascade.resume(fake_db)) == 2
+    failed, fresh = fake_db.jobs.docs
+    assert failed["status"] == "queued" and failed["attempts"] == 0
+    assert "finished_at" not in failed and "last_error" not in failed
+    assert fresh["dedupe_key"] == "posts.cascade_delete:new" and fresh["status"] == "queued"
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Tests para db_stats.py: secciones en paralelo, conteos a partir de $facet, tiempos por sección y almacenamiento
+"""
+import asyncio
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "test_db")
+
+import db_stats
+from conftest import FakeCollection, FakeCursor, FakeDB
+
+LATENCY = 0.05
+
+
+class StatsCollection(FakeCollection):
+    """Canned $facet/$group results and index usage, LATENCY per round-trip"""
+
+    def __init__(self, aggregate_result=None, docs=(), estimate=0):
+        super().__init__(docs, latency=LATENCY)
+        self.aggregate_result = aggregate_result or []
+        self.estimate = estimate
+
+    def aggregate(self, pipeline, **kwargs):
+        self.pipelines.append(pipeline)
+        if "$indexStats" in pipeline[0]:
+            return FakeCursor([{"name": "_id_", "accesses": {"ops": 12}}, {"name": "slug_1", "accesses": {"ops": 0}}], LATENCY)
+        if "$sample" in pipeline[0]:
+            return FakeCursor(list(self.docs), LATENCY)
+        return FakeCursor(self.aggregate_result, LATENCY)
+
+    async def estimated_document_count(self):
+        await self._io("estimated_document_count")
+        return self.estimate
+
+
+class StatsDB(FakeDB):
+    collection_class = StatsCollection
+
+    async def command(self, name, collection=None):
+        await asyncio.sleep(LATENCY)
+        if name == "collStats":
+            return {"count": 10, "size": 10 * 4096, "avgObjSize": 4096, "storageSize": 20000,
+                    "totalIndexSize": 8192, "indexSizes": {"_id_": 4096, "slug_1": 4096}}
+        if name == "serverStatus":
+            return {"wiredTiger": {"cache": {"maximum bytes configured": 256 * 1024, "bytes currently in the cache": 1024}}}
+        return {"system": {"memSizeMB": 1024}}
+
+
+def make_db():
+    return StatsDB(
+        users=StatsCollection([{
+            "by_role": [{"_id": "user", "count": 8}, {"_id": "admin", "count": 2}],
+            "by_provider": [{"_id": "github", "count": 10}],
+            "admins": [{"name": "Ana", "email": "ana@example.com"}],
+        }]),
+        posts=StatsCollection([{
+            "by_status": [{"_id": True, "count": 7}, {"_id": False, "count": 2}, {"_id": None, "count": 1}],
+            "by_category": [{"_id": "Backend", "count": 10}],
+        }]),
+        categories=StatsCollection(docs=[{"name": "Backend", "slug": "backend"}]),
+        comments=StatsCollection([{
+            "by_status": [{"_id": True, "count": 5}, {"_id": False, "count": 3}],
+            "by_author": [{"_id": "registered", "count": 6}, {"_id": "anonymous", "count": 2}],
+            "last_7_days": [],
+        }]),
+        newsletter=StatsCollection([{"_id": True, "count": 4}, {"_id": False, "count": 1}]),
+        post_likes=StatsCollection(estimate=40),
+        bookmarks=StatsCollection(estimate=12),
+        user_profiles=StatsCollection(estimate=3),
+        sessions=StatsCollection(estimate=9),
+    )
+
+
+def test_totals_come_from_one_facet_per_collection():
+    db = make_db()
+    stats = asyncio.run(db_stats.collect(db))
+    sections = stats["sections"]
+    assert (sections["users"]["total"], sections["users"]["admins"]) == (10, 2)
+    assert (sections["posts"]["total"], sections["posts"]["published"], sections["posts"]["drafts"]) == (10, 7, 3)
+    assert sections["posts"]["by_category"] == {"Backend": 10}
+    assert (sections["comments"]["approved"], sections["comments"]["pending"], sections["comments"]["last_7_days"]) == (5, 3, 0)
+    assert sections["newsletter"] == {"total": 5, "active": 4}
+    assert sections["engagement"]["likes"] == 40
+    for collection in (db.users, db.posts, db.comments):
+        assert len([pipeline for pipeline in collection.pipelines if "$facet" in pipeline[0]]) == 1
+
+
+def test_sections_run_concurrently_and_are_timed():
+    stats = asyncio.run(db_stats.collect(make_db()))
+    assert set(stats["timings_ms"]) == set(db_stats.SECTIONS)
+    assert all(ms >= LATENCY * 1000 * 0.9 for name, ms in stats["timings_ms"].items() if name != "sessions")
+    # Sequentially this would take one LATENCY per section
+    assert stats["total_ms"] < LATENCY * 1000 * 3
+
+
+def test_largest_fields_are_measured_in_bson_bytes():
+    docs = [{"_id": i, "title": "t" * 10, "content": "x" * 3000} for i in range(4)]
+    sizes = db_stats.field_sizes(docs)
+    assert list(sizes)[0] == "content" and 3000 < sizes["content"] < 3020
+    assert db_stats.field_sizes([]) == {}
+
+
+def test_storage_flags_big_fields_unused_indexes_and_a_working_set_over_the_cache():
+    db = make_db()
+    db.posts.seed([{"_id": 1, "title": "Hola", "content": "x" * 3000}])
+    storage = asyncio.run(db_stats.collect(db))["sections"]["storage"]
+    posts = storage["collections"]["posts"]
+    assert posts["largest_fields"][0]["field"] == "content" and posts["largest_fields"][0]["share"] > 0.5
+    assert [index["ops"] for index in posts["indexes"]] == [12, 0]
+    # 9 collections × 8 KB of indexes + 6 hot collections × 40 KB of data, against 80% of a 256 KB cache
+    assert storage["working_set"]["estimate"] == 9 * 8192 + 6 * 40960 and storage["working_set"]["fits"] is False
+    warnings = "\n".join(storage["warnings"])
+    assert "posts.content" in warnings and "posts.slug_1 sin uso" in warnings and "working set" in warnings
+
+
+def test_unknown_cache_size_is_reported_as_unknown(capsys):
+    db = make_db()
+    storage = asyncio.run(db_stats.collect(db))["sections"]["storage"]
+    storage["memory"]["cache_max"] = None
+    storage["working_set"] = db_stats.working_set(storage["collections"], storage["memory"])
+    assert storage["working_set"]["fits"] is None
+    db_stats.print_storage(storage, 1.0)
+    out = capsys.readouterr().out
+    assert "Caché WiredTiger: desconocida" in out and "No cabe" not in out
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Tests para el monitoreo de comandos MongoDB por request
+"""
+import logging
+import os
+import sys
+from types import SimpleNamespace
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import dbmonitor
+
+
+def run_command(monitor, request_id, command, micros, failed=False):
+    name = next(iter(command))
+    event = SimpleNamespace(command_name=name, command=command, connection_id=("db", 27017),
+                            request_id=request_id, duration_micros=micros)
+    monitor.started(event)
+    (monitor.failed if failed else monitor.succeeded)(event)
+
+
+def test_filter_shape_hides_values_but_keeps_operators():
+    command = {"find": "posts", "filter": {"published": True, "tags": {"$in": ["python", "fastapi"]},
+                                           "$or": [{"title": {"$regex": "x"}}, {"content": "y"}]}}
+    assert dbmonitor.filter_shape("find", command) == \
+        '{"published": "?", "tags": {"$in": ["?"]}, "$or": [{"title": {"$regex": "?"}}]}'
+    update = {"update": "posts", "updates": [{"q": {"id": "p1"}, "u": {"$inc": {"views_count": 1}}}]}
+    assert dbmonitor.filter_shape("update", update) == '[{"id": "?"}]'
+
+
+def test_commands_are_attributed_to_the_current_request_and_slow_ones_logged(caplog):
+    monitor = dbmonitor.CommandMonitor(slow_query_ms=100)
+    request = dbmonitor.RequestDB("GET /api/users/activity")
+    token = dbmonitor.current_request.set(request)
+    try:
+        with caplog.at_level(logging.WARNING, logger="dbmonitor"):
+            for i in range(3):
+                run_command(monitor, i, {"find": "posts", "filter": {"id": f"p{i}"}}, 2000)
+            run_command(monitor, 9, {"find": "comments", "filter": {"user_id": "u1"}}, 150000)
+    finally:
+        dbmonitor.current_request.reset(token)
+    run_command(monitor, 10, {"insert": "jobs", "documents": []}, 1000)  # Background, no request
+
+    assert request.calls == 4 and abs(request.seconds - 0.156) < 1e-9
+    assert monitor.commands == {("find", "posts"): 3, ("find", "comments"): 1, ("insert", "jobs"): 1}
+    assert len(caplog.records) == 1
+    assert caplog.records[0].getMessage() == \
+        'Slow MongoDB find on comments (150.0 ms) in GET /api/users/activity: {"user_id": "?"}'
+    assert 'mongo_commands_total{command="find",collection="posts"} 3' in monitor.collect()
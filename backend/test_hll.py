@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Tests para el sketch HyperLogLog (visitantes únicos)
+"""
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import visitors
+from hll import HyperLogLog, merge_all
+
+
+def test_small_cardinality_is_near_exact():
+    sketch = HyperLogLog()
+    sketch.update(f"visitor-{i}" for i in range(100))
+    sketch.update(f"visitor-{i}" for i in range(100))  # refreshes
+    assert abs(sketch.count() - 100) <= 2
+
+
+def test_large_cardinality_within_error_bounds():
+    sketch = HyperLogLog(precision=12)
+    n = 50_000
+    sketch.update(f"reader-{i}" for i in range(n))
+    # 4 standard errors keeps the test deterministic-safe
+    assert abs(sketch.count() - n) / n < 4 * sketch.relative_error
+
+
+def test_merge_equals_union():
+    day1, day2, union = HyperLogLog(), HyperLogLog(), HyperLogLog()
+    for i in range(3000):
+        day1.add(f"u{i}")
+        union.add(f"u{i}")
+    for i in range(2000, 6000):
+        day2.add(f"u{i}")
+        union.add(f"u{i}")
+    assert merge_all([day1, day2]) == union
+    # Idempotent: merging a sketch with itself changes nothing
+    assert HyperLogLog().merge(union).merge(union) == union
+
+
+def test_sketches_of_different_precision_merge_at_the_lower_one():
+    fine, coarse = HyperLogLog(precision=14), HyperLogLog(precision=12)
+    fine.update(f"u{i}" for i in range(5000))
+    coarse.update(f"u{i}" for i in range(5000))
+    # Folding is exact: same registers as a sketch built at the lower precision
+    assert fine.downsample(12) == coarse
+    assert HyperLogLog(precision=14).merge(coarse) == coarse
+    assert HyperLogLog(precision=10).merge(fine) == fine.downsample(10)
+
+
+def test_visitor_key_uses_the_client_behind_the_trusted_proxy(monkeypatch):
+    monkeypatch.setattr(visitors.ratelimit, "TRUSTED_PROXIES", 1)
+    request = SimpleNamespace(
+        cookies={}, headers={"user-agent": "Firefox"},
+        scope={"client": ("10.0.0.2", 443), "headers": [(b"x-forwarded-for", b"203.0.113.7")]},
+    )
+    assert visitors.visitor_key(request) == "a:203.0.113.7|Firefox"
+
+
+def test_serialization_roundtrip_is_fixed_size():
+    sketch = HyperLogLog(precision=10)
+    sketch.update(str(i) for i in range(10_000))
+    data = sketch.to_bytes()
+    assert len(data) == 1024
+    assert HyperLogLog.from_bytes(data) == sketch
+
+
+class FlakyVisitors:
+    """post_visitors whose second write fails"""
+
+    def __init__(self):
+        self.written = []
+
+    async def update_one(self, query, update, upsert=False):
+        if len(self.written) == 1:
+            raise ConnectionError("primary stepped down")
+        self.written.append((query["post_id"], query["day"]))
+
+
+def test_failed_flush_keeps_unwritten_sketches_dirty():
+    tracker = visitors.VisitorTracker(SimpleNamespace(post_visitors=FlakyVisitors()))
+    tracker.record("p1", "visitor-1")
+    tracker.record("p2", "visitor-1")
+    try:
+        asyncio.run(tracker.flush())
+        assert False, "flush should re-raise"
+    except ConnectionError:
+        pass
+    written = set(tracker.db.post_visitors.written)
+    assert len(written) == 1
+    assert tracker._dirty == set(tracker._sketches) - written
+
+
+def test_stats_read_sketches_stored_with_an_older_precision(fake_db):
+    old = HyperLogLog(precision=10)
+    old.update(f"u{i}" for i in range(300))
+    fake_db.post_visitors.seed([{"post_id": "p1", "day": visitors.day_key(), "worker_id": "old",
+                                 "registers": old.to_bytes(), "precision": 10}])
+    tracker = visitors.VisitorTracker(fake_db, precision=12)
+    tracker.record("p1", "u-new")
+    assert abs(asyncio.run(tracker.unique_visitors("p1")) - 301) <= 10
+    assert abs(asyncio.run(tracker.daily_unique_visitors("p1", 1))[0]["unique_visitors"] - 301) <= 10
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Tests para la cola de trabajos (reintentos y backoff)
+"""
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from conftest import FakeDB
+
+import jobs
+
+
+@jobs.handler("test.flaky")
+async def flaky(db, payload, job):
+    raise ConnectionError("smtp down")
+
+
+@jobs.handler("test.ok")
+async def ok(db, payload, job):
+    return {"echo": payload["value"]}
+
+
+def claimed(job_type, payload, attempts=1, locked_by="w-1", **options):
+    """A job as a worker sees it right after claiming it"""
+    return {**jobs.new_job(job_type, payload, **options), "status": "running", "attempts": attempts,
+            "locked_by": locked_by}
+
+
+def run(job_type, attempts, max_attempts=3):
+    db = FakeDB()
+    job = claimed(job_type, {"value": 1}, attempts=attempts, max_attempts=max_attempts)
+    db.jobs.seed([job])
+    queue = jobs.JobQueue(db, workers=0)
+    asyncio.run(queue.run_job(job))
+    return queue, db.jobs.docs[0]
+
+
+def test_failed_job_is_retried_with_backoff():
+    queue, update = run("test.flaky", attempts=1)
+    assert update["status"] == "queued"
+    assert "ConnectionError" in update["last_error"]
+    assert queue.metrics.retried == {"test.flaky": 1}
+
+
+def test_job_fails_permanently_after_max_attempts():
+    queue, update = run("test.flaky", attempts=3)
+    assert update["status"] == "failed"
+    assert queue.metrics.failed == {"test.flaky": 1}
+
+
+def test_successful_job_stores_result():
+    queue, update = run("test.ok", attempts=1)
+    assert update["status"] == "done" and update["result"] == {"echo": 1}
+
+
+@jobs.handler("test.slow")
+async def slow(db, payload, job):
+    await asyncio.sleep(payload["seconds"])
+    return {"slept": payload["seconds"]}
+
+
+def test_heartbeat_extends_the_lock_while_the_handler_runs():
+    db = FakeDB()
+    job = claimed("test.slow", {"seconds": 0.05})
+    db.jobs.seed([job])
+    queue = jobs.JobQueue(db, workers=0, lock_seconds=0.03)
+    asyncio.run(queue.run_job(job))
+    assert db.jobs.calls.count("update_one") >= 2  # heartbeats, then the outcome
+    assert db.jobs.docs[0]["status"] == "done" and "locked_by" not in db.jobs.docs[0]
+
+
+def test_handler_is_stopped_when_another_worker_took_the_lock():
+    db = FakeDB()
+    job = claimed("test.slow", {"seconds": 1})
+    db.jobs.seed([{**job, "locked_by": "w-2"}])
+    queue = jobs.JobQueue(db, workers=0, lock_seconds=0.03)
+    asyncio.run(asyncio.wait_for(queue.run_job(job), timeout=0.5))
+    assert db.jobs.docs[0]["status"] == "running" and db.jobs.docs[0]["locked_by"] == "w-2"
+    assert queue.metrics.completed == {} and queue.metrics.retried == {}
+
+
+def test_expired_locks_are_only_reclaimed_with_attempts_left():
+    expired = datetime.now(timezone.utc) - timedelta(seconds=1)
+    exhausted = {**claimed("test.ok", {"value": 1}, attempts=3, max_attempts=3), "locked_until": expired}
+    retryable = {**claimed("test.ok", {"value": 2}, attempts=1), "locked_until": expired}
+    db = FakeDB(jobs=[exhausted, retryable])
+    job = asyncio.run(jobs.JobQueue(db, workers=0).claim())
+    assert job["id"] == retryable["id"] and job["attempts"] == 2 and job["locked_by"] != "w-1"
+    assert db.jobs.docs[0]["status"] == "failed" and "locked_by" not in db.jobs.docs[0]
+
+
+def test_backoff_grows_and_is_capped():
+    assert jobs.backoff_seconds(1) <= jobs.BACKOFF_BASE_SECONDS
+    assert jobs.backoff_seconds(4) >= jobs.BACKOFF_BASE_SECONDS * 4
+    assert jobs.backoff_seconds(50) <= jobs.BACKOFF_MAX_SECONDS
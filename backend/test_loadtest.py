@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Tests para el load test: histograma de latencias, corrección de coordinated omission y mezcla de tráfico
+"""
+import asyncio
+import os
+import random
+import sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from benchmarks import loadtest
+
+
+def test_histogram_percentiles_within_one_percent():
+    histogram = loadtest.LatencyHistogram()
+    for i in range(1, 1001):  # 1..1000 ms
+        histogram.record(i / 1000)
+    for p, expected in ((50, 0.5), (99, 0.99), (100, 1.0)):
+        assert abs(histogram.percentile(p) - expected) <= expected * 0.01
+
+
+def test_corrected_histogram_adds_the_requests_a_stall_held_back():
+    raw, corrected = loadtest.LatencyHistogram(), loadtest.LatencyHistogram()
+    for _ in range(99):
+        raw.record(0.01)
+        corrected.record_corrected(0.01, expected_interval=0.1)
+    raw.record(1.0)
+    corrected.record_corrected(1.0, expected_interval=0.1)
+    # One stalled request in 100 barely moves the raw p95; corrected, it is what 9 more users saw
+    assert raw.percentile(95) < 0.011
+    assert corrected.total == 109 and corrected.percentile(95) > 0.5
+
+
+def test_mix_weights_and_validation():
+    actions, weights = loadtest.action_weights(loadtest.parse_mix("anonymous=90,admin=10"))
+    assert {action.group for action in actions} == {"anonymous", "admin"}
+    assert abs(sum(weight for action, weight in zip(actions, weights) if action.group == "admin") - 10) < 1e-9
+    for bad in ("visitors=10", "anonymous=x", "anonymous=0"):
+        try:
+            loadtest.parse_mix(bad)
+            assert False, bad
+        except ValueError:
+            pass
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+class FakeClient:
+    """Answers after 1 ms; liking an already liked post is a 400, like the API"""
+
+    def __init__(self):
+        self.calls = []
+        self.liked = set()
+
+    async def request(self, method, url, headers=None, **kwargs):
+        self.calls.append((method, url))
+        await asyncio.sleep(0.001)
+        if url.endswith("/like"):
+            key = (headers["Authorization"], url)
+            if method == "POST" and key in self.liked:
+                return FakeResponse(400)
+            (self.liked.add if method == "POST" else self.liked.discard)(key)
+        return FakeResponse(200)
+
+    async def get(self, url, **kwargs):
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request("POST", url, **kwargs)
+
+    async def delete(self, url, **kwargs):
+        return await self.request("DELETE", url, **kwargs)
+
+
+def test_open_loop_keeps_the_rate_and_records_every_request():
+    client = FakeClient()
+    traffic = loadtest.Traffic([{"id": "p1", "slug": "post-1"}], ["bench-session-1"], "bench-session-0", random.Random(1))
+    test = loadtest.LoadTest(client, traffic, loadtest.parse_mix("anonymous=50,engaged=50"), warmup=0)
+    asyncio.run(test.open_loop(rate=200, duration=0.5, max_in_flight=10))
+    results = test.results(0.5)
+    assert results["total"]["requests"] == len(client.calls) == 100
+    likes = sum(1 for call in client.calls if call == ("POST", "/api/posts/p1/like"))
+    assert results.get("like", {}).get("requests", 0) == likes
+
+
+def test_unlike_undoes_a_like_made_during_the_run():
+    client = FakeClient()
+    traffic = loadtest.Traffic([{"id": "p1", "slug": "post-1"}], ["bench-session-1", "bench-session-2"], None,
+                               random.Random(3))
+    assert asyncio.run(loadtest.like(client, traffic)).status_code == 200
+    assert len(traffic.liked) == 1
+    assert asyncio.run(loadtest.unlike(client, traffic)).status_code == 200
+    assert len(traffic.liked) == 0 and client.liked == set()
+    assert [method for method, _ in client.calls] == ["POST", "DELETE"]
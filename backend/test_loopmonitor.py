@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Tests para el monitor de lag del event loop y el watchdog de bloqueos
+"""
+import asyncio
+import os
+import sys
+import time
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import loopmonitor
+
+
+def hash_password_synchronously():
+    time.sleep(0.3)  # Stands in for bcrypt or any CPU-bound work inside a handler
+
+
+async def blocking_handler():
+    hash_password_synchronously()
+
+
+def test_lag_is_measured_and_the_blocking_stack_is_captured():
+    monitor = loopmonitor.LoopMonitor(interval=0.02, block_threshold=0.1, watchdog=True)
+
+    async def scenario():
+        monitor.start()
+        await asyncio.sleep(0.1)
+        await blocking_handler()
+        await asyncio.sleep(0.1)
+        await monitor.stop()
+
+    asyncio.run(scenario())
+    assert monitor.lag_max >= 0.2
+    assert monitor.blocked == 1
+    assert "hash_password_synchronously" in monitor.stalls[0]["stack"]
+    assert "blocking_handler" in monitor.stalls[0]["stack"]
+
+
+def test_no_stalls_on_an_idle_loop():
+    monitor = loopmonitor.LoopMonitor(interval=0.02, block_threshold=0.1, watchdog=True)
+
+    async def scenario():
+        monitor.start()
+        await asyncio.sleep(0.2)
+        await monitor.stop()
+
+    asyncio.run(scenario())
+    assert monitor.blocked == 0 and monitor.lag_max < 0.1
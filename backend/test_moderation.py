@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Tests para la moderación masiva de comentarios
+"""
+import asyncio
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from conftest import matches
+
+import moderation
+import pagination
+
+
+def sample():
+    """Comments as stored before author_email_lc existed, in mixed case"""
+    return [
+        {"id": f"c{i}", "post_id": "p1", "author_email": ("Spam@Bad.com" if i % 2 else "spam@bad.com") if i < 6 else "ana@ok.com",
+         "approved": i % 3 == 0, "content": "...", "created_at": f"2025-01-{10 + i}T00:00:00+00:00"}
+        for i in range(10)
+    ]
+
+
+def seeded(db):
+    db.comments.seed(sample())
+    asyncio.run(moderation.ensure_indexes(db))
+    db.comments.calls.clear()
+    return db
+
+
+def test_empty_or_invalid_selector_is_rejected():
+    with pytest.raises(ValueError):
+        moderation.build_query()
+    with pytest.raises(ValueError):
+        moderation.build_query(ids=[])
+    with pytest.raises(ValueError):
+        moderation.build_query(status="spam")
+
+
+def test_approve_pending_from_email_is_one_update(fake_db):
+    seeded(fake_db)
+    query = moderation.build_query(status="pending", email="SPAM@bad.com")
+    result = asyncio.run(moderation.apply(fake_db, "approve", query))
+    assert result["modified"] == 4 and fake_db.comments.calls == ["update_many"]
+    assert fake_db.counters() == {"pending_comments": -4}
+
+
+def test_delete_archives_pending_comments_as_spam_labels(fake_db):
+    seeded(fake_db)
+    query = moderation.build_query(ids=["c0", "c1", "c2", "c3", "missing"])
+    result = asyncio.run(moderation.apply(fake_db, "delete", query))
+    assert result["modified"] == 4
+    assert {d["id"] for d in fake_db.rejected_comments.docs} == {"c1", "c2"}
+    assert fake_db.counters() == {"total_comments": -4, "pending_comments": -2}
+
+
+def test_reject_archives_in_batches(fake_db):
+    seeded(fake_db)
+    query = moderation.build_query(email="spam@bad.com")
+    result = asyncio.run(moderation.reject(fake_db, query, batch_size=4))
+    assert result["modified"] == 6
+    assert {d["id"] for d in fake_db.rejected_comments.docs} == {f"c{i}" for i in range(6)}
+    assert all("rejected_at" in d for d in fake_db.rejected_comments.docs)
+    assert len(fake_db.comments.docs) == 4
+    assert fake_db.counters() == {"total_comments": -6, "pending_comments": -4}
+
+
+def test_moderation_filter_and_admin_listing_match_emails_the_same_way(fake_db):
+    seeded(fake_db)
+    assert {doc["author_email_lc"] for doc in fake_db.comments.docs} == {"spam@bad.com", "ana@ok.com"}
+    bulk = {doc["id"] for doc in fake_db.comments.docs
+            if matches(doc, moderation.build_query(email=" SPAM@bad.com "))}
+    listing_query = pagination.email_prefix(moderation.AUTHOR_EMAIL_KEY, moderation.author_email_key("Spam@"))
+    docs, _ = asyncio.run(pagination.paginate(fake_db.comments, listing_query, "created_at", 50))
+    assert bulk == {doc["id"] for doc in docs} == {f"c{i}" for i in range(6)}
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Tests para la importación/exportación de suscriptores del newsletter
+"""
+import asyncio
+import json
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from conftest import FakeDB
+
+import newsletter
+
+
+async def body(text, chunk_size=7):
+    data = text.encode()
+    for start in range(0, len(data), chunk_size):
+        yield data[start:start + chunk_size]
+
+
+async def fake_cursor(rows):
+    for i in range(rows):
+        yield {"email": f"user{i}@example.com", "subscribed_at": "2025-01-15T10:30:00+00:00", "active": True}
+
+
+async def collect(chunks):
+    return [chunk async for chunk in chunks]
+
+
+def test_csv_export_streams_in_batches_without_row_cap():
+    chunks = asyncio.run(collect(newsletter.export_chunks("csv", fake_cursor(25_000), batch_size=1000)))
+    assert len(chunks) == 26  # header + one chunk per batch
+    lines = "".join(chunks).splitlines()
+    assert lines[0] == "Email,Fecha de Suscripción,Estado"
+    assert lines[1] == "user0@example.com,2025-01-15 10:30:00,Activo"
+    assert len(lines) == 25_001
+
+
+def test_ndjson_export():
+    chunks = asyncio.run(collect(newsletter.export_chunks("ndjson", fake_cursor(3), batch_size=2)))
+    records = [json.loads(line) for line in "".join(chunks).splitlines()]
+    assert [r["email"] for r in records] == ["user0@example.com", "user1@example.com", "user2@example.com"]
+
+
+def subscribers_db():
+    return FakeDB(newsletter=[{"email": "existing@example.com", "active": True}], stats=[{"_id": "blog"}])
+
+
+def test_csv_import_normalizes_dedupes_and_batches():
+    db = subscribers_db()
+    upload = "nombre,email\nAna, Ana@Example.com \nBea,bea@example.com\nDup,ANA@example.com\nX,not-an-email\nOld,existing@example.com\n"
+    report = asyncio.run(newsletter.import_subscribers(db, body(upload), "csv", batch_size=2))
+    assert db.newsletter.calls == ["bulk_write", "bulk_write"]
+    assert sorted(d["email"] for d in db.newsletter.docs) == ["ana@example.com", "bea@example.com", "existing@example.com"]
+    assert db.counters() == {"total_subscribers": 2}
+    assert report["rows"] == 5
+    assert report["inserted"] == 2 and report["unchanged"] == 1
+    assert report["duplicates"] == 1 and report["invalid"] == 1
+    assert report["errors"] == [{"row": 5, "value": "not-an-email", "error": "Invalid email"}]
+
+
+def test_csv_import_keeps_quoted_fields_that_span_lines():
+    db = subscribers_db()
+    upload = ('email,nota\n'
+              'ana@example.com,"primera línea\nsegunda, con coma"\n'
+              'bea@example.com,"cita ""doble""\n\ny línea en blanco"\n'
+              'no-es-email,x\n')
+    report = asyncio.run(newsletter.import_subscribers(db, body(upload, chunk_size=5), "csv"))
+    assert report["rows"] == 3 and report["inserted"] == 2
+    assert report["errors"] == [{"row": 7, "value": "no-es-email", "error": "Invalid email"}]
+
+
+def test_ndjson_import_reports_bad_lines():
+    db = subscribers_db()
+    upload = '{"email": "a@example.com"}\n{broken\n"b@example.com"\n'
+    report = asyncio.run(newsletter.import_subscribers(db, body(upload), "ndjson"))
+    assert report["inserted"] == 2
+    assert report["errors"][0]["row"] == 2
+
+
+
+def test_campaigns_are_sent_once_even_after_job_keys_expire(monkeypatch):
+    sends = []
+
+    async def send_batch(recipients, subject, text, html):
+        sends.append(recipients)
+        return len(recipients), []
+
+    monkeypatch.setattr(newsletter.mailer, "send_batch", send_batch)
+    campaign = {"id": "c1", "subject": "s", "text": "t", "html": "h", "sent_batches": [0]}
+    db = FakeDB(newsletter_campaigns=[campaign])
+    job = {"campaign_id": "c1", "recipients": ["a@example.com"]}
+    assert asyncio.run(newsletter._send_batch(db, {**job, "batch": 0}, {})) == {"skipped": "batch already sent"}
+    asyncio.run(newsletter._send_batch(db, {**job, "batch": 1}, {}))
+    assert sends == [["a@example.com"]]
+    assert db.newsletter_campaigns.docs[0]["sent_batches"] == [0, 1]
+
+    db = FakeDB(posts=[{"id": "p1", "title": "Hola", "slug": "hola", "published": True}],
+                newsletter_campaigns=[{"id": "c1", "post_id": "p1", "fanned_out_at": "2025-01-01"}])
+    result = asyncio.run(newsletter._announce(db, {"post_id": "p1"}, {}))
+    assert result["skipped"] == "already announced"
+
+
+def test_retry_after_a_dropped_connection_only_sends_to_the_rest(monkeypatch):
+    sends = []
+
+    async def send_batch(recipients, subject, text, html):
+        sends.append(recipients)
+        if len(sends) == 1:
+            raise newsletter.mailer.PartialDelivery(2, 1, [recipients[1]], ConnectionError("reset"))
+        return len(recipients), []
+
+    monkeypatch.setattr(newsletter.mailer, "send_batch", send_batch)
+    db = FakeDB(newsletter_campaigns=[{"id": "c1", "subject": "s", "text": "t", "html": "h", "sent": 0, "refused": 0}])
+    payload = {"campaign_id": "c1", "batch": 3, "recipients": ["a@x.com", "b@x.com", "c@x.com", "d@x.com"]}
+    with pytest.raises(newsletter.mailer.PartialDelivery):
+        asyncio.run(newsletter._send_batch(db, payload, {}))
+    assert db.newsletter_campaigns.docs[0]["progress"] == {"3": 2}
+    asyncio.run(newsletter._send_batch(db, payload, {}))
+    assert sends[1] == ["c@x.com", "d@x.com"]
+    campaign = db.newsletter_campaigns.docs[0]
+    assert (campaign["sent"], campaign["refused"], campaign["sent_batches"]) == (3, 1, [3])
+    assert campaign["progress"] == {}
+
+
+def test_mailer_reports_how_far_a_dropped_connection_got(monkeypatch):
+    class DroppingSMTP:
+        def __init__(self, *args, **kwargs):
+            self.messages = 0
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc_info):
+            return False
+
+        def send_message(self, message):
+            self.messages += 1
+            if message["To"] == "b@x.com":
+                raise newsletter.mailer.smtplib.SMTPRecipientsRefused({})
+            if self.messages == 3:
+                raise newsletter.mailer.smtplib.SMTPServerDisconnected("gone")
+
+    monkeypatch.setattr(newsletter.mailer.smtplib, "SMTP", DroppingSMTP)
+    with pytest.raises(newsletter.mailer.PartialDelivery) as exc:
+        newsletter.mailer._send_batch_sync(["a@x.com", "b@x.com", "c@x.com", "d@x.com"], "s", "t", "h")
+    assert (exc.value.handled, exc.value.sent, exc.value.refused) == (2, 1, ["b@x.com"])
+
+
+def test_email_case_duplicates_merge_into_the_oldest_subscriber():
+    group = {
+        "_id": "ana@example.com",
+        "docs": [
+            {"_id": 2, "email": "Ana@Example.com", "active": True, "subscribed_at": "2025-03-01T00:00:00"},
+            {"_id": 1, "email": "ana@example.com", "active": False, "subscribed_at": "2025-01-01T00:00:00"},
+        ],
+    }
+    delete, update = newsletter._merge_operations(group)
+    assert delete._filter == {"_id": {"$in": [2]}}
+    assert update._filter == {"_id": 1}
+    assert update._doc == {"$set": {"email": "ana@example.com", "active": True}}
+    assert newsletter.canonical_email(" Ana@Example.COM ") == "ana@example.com"
+
+
+def test_email_merge_migration_collapses_case_duplicates(fake_db):
+    fake_db.newsletter.seed([
+        {"_id": 1, "email": "ana@example.com", "active": False, "subscribed_at": "2025-01-01T00:00:00"},
+        {"_id": 2, "email": " Ana@Example.com", "active": True, "subscribed_at": "2025-03-01T00:00:00"},
+        {"_id": 3, "email": "Luis@Example.com", "active": True, "subscribed_at": "2025-02-01T00:00:00"},
+        {"_id": 4, "email": "eva@example.com", "active": True, "subscribed_at": "2025-02-01T00:00:00"},
+    ])
+    assert asyncio.run(newsletter.merge_email_duplicates(fake_db)) == 2
+    assert sorted((d["_id"], d["email"], d["active"]) for d in fake_db.newsletter.docs) == [
+        (1, "ana@example.com", True), (3, "luis@example.com", True), (4, "eva@example.com", True),
+    ]
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Tests para el profiler por muestreo y los snapshots de tracemalloc
+"""
+import asyncio
+import os
+import sys
+import time
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+import profiler
+
+
+def build_export_synchronously():
+    deadline = time.perf_counter() + 0.2
+    while time.perf_counter() < deadline:
+        pass
+
+
+async def slow_handler():
+    await asyncio.sleep(0.02)
+    build_export_synchronously()
+
+
+def test_profile_returns_collapsed_stacks_of_the_busy_code():
+    sampler = profiler.SamplingProfiler()
+
+    async def scenario():
+        profile = asyncio.create_task(sampler.profile(0.4, interval_ms=2))
+        await slow_handler()
+        return await profile
+
+    collapsed = asyncio.run(scenario())
+    lines = collapsed.splitlines()
+    busy = [line for line in lines if "build_export_synchronously" in line]
+    assert busy and all(line.startswith("MainThread;") for line in busy)
+    stack, count = busy[0].rsplit(" ", 1)
+    assert stack.index("slow_handler") < stack.index("build_export_synchronously") and int(count) > 10
+    assert not sampler.running and sampler._thread is None
+
+
+def test_profile_rejects_bad_arguments_and_concurrent_runs():
+    sampler = profiler.SamplingProfiler()
+    with pytest.raises(ValueError):
+        asyncio.run(sampler.profile(profiler.MAX_PROFILE_SECONDS + 1))
+    sampler.start(0.01)
+    try:
+        with pytest.raises(RuntimeError):
+            sampler.start(0.01)
+    finally:
+        sampler.stop()
+
+
+def test_tracemalloc_diff_points_at_the_growing_line():
+    tracker = profiler.MemoryTracker()
+    tracker.start()
+    try:
+        base = tracker.snapshot()["id"]
+        leak = [bytearray(1024) for _ in range(2000)]
+        current = tracker.snapshot()["id"]
+        diff = tracker.diff(base, current)
+        assert diff["top"][0]["location"].endswith(f"test_profiler.py:{leak_line()}")
+        assert diff["top"][0]["size_diff_kb"] >= 2000
+        with pytest.raises(ValueError):
+            tracker.diff(base, 99)
+    finally:
+        assert tracker.stop()["tracing"] is False
+    assert len(leak) == 2000
+
+
+def leak_line():
+    with open(__file__) as source:
+        return next(i for i, line in enumerate(source, 1) if "leak = [bytearray" in line)
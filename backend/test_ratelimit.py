@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Tests para el rate limiting por token bucket
+"""
+import asyncio
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from starlette.testclient import TestClient
+
+import ratelimit
+from ratelimit import MemoryBuckets, Policy, RateLimiter, RateLimitMiddleware
+
+
+def test_bucket_allows_burst_then_refills():
+    async def scenario():
+        buckets = MemoryBuckets()
+        policy = Policy("test", capacity=3, period=30)  # one token every 10s
+        results = [await buckets.take("ip", policy, now=0.0) for _ in range(4)]
+        assert [allowed for allowed, _ in results] == [True, True, True, False]
+        assert results[-1][1] == 10.0
+        assert (await buckets.take("ip", policy, now=10.0))[0] is True
+        assert (await buckets.take("ip", policy, now=10.0))[0] is False
+        assert (await buckets.take("other-ip", policy, now=10.0))[0] is True
+
+    asyncio.run(scenario())
+
+
+def test_memory_buckets_are_bounded():
+    async def scenario():
+        buckets = MemoryBuckets(max_keys=100)
+        policy = Policy("test", capacity=1, period=60)
+        for i in range(1000):
+            await buckets.take(f"ip{i}", policy, now=0.0)
+        assert len(buckets) == 100
+
+    asyncio.run(scenario())
+
+
+def test_route_policies_match_public_writes_only():
+    limiter = RateLimiter(MemoryBuckets())
+    assert limiter.route_policy("POST", "/api/posts/abc-123/view") == "view"
+    assert limiter.route_policy("POST", "/api/auth/login") == "login"
+    assert limiter.route_policy("GET", "/api/auth/login") is None
+    assert limiter.route_policy("POST", "/api/posts/abc/view/extra") is None
+
+
+def test_middleware_returns_429_with_retry_after():
+    app = FastAPI()
+
+    @app.post("/api/comments/anonymous")
+    async def comment():
+        return {"ok": True}
+
+    limiter = RateLimiter(MemoryBuckets(), policies={**ratelimit.load_policies(),
+                                                     "comment": Policy("comment", 2, 60)}, enabled=True)
+    app.add_middleware(RateLimitMiddleware, limiter=limiter)
+    client = TestClient(app)
+    codes = [client.post("/api/comments/anonymous").status_code for _ in range(3)]
+    assert codes == [200, 200, 429]
+    response = client.post("/api/comments/anonymous")
+    assert response.json() == {"detail": "Too many requests"}
+    assert 0 < int(response.headers["retry-after"]) <= 30
+    assert limiter.limited == {"comment": 2}
+
+
+def test_limiter_stays_off_until_the_proxy_hops_are_configured():
+    assert ratelimit.enabled_from_env({}) is False
+    assert ratelimit.enabled_from_env({"RATE_LIMIT_TRUSTED_PROXIES": "1"}) is True
+    assert ratelimit.enabled_from_env({"RATE_LIMIT_TRUSTED_PROXIES": "0"}) is True
+    assert ratelimit.enabled_from_env({"RATE_LIMIT_TRUSTED_PROXIES": "1", "RATE_LIMIT_ENABLED": "false"}) is False
+
+
+def test_clients_behind_one_proxy_get_their_own_buckets(monkeypatch):
+    monkeypatch.setattr(ratelimit, "TRUSTED_PROXIES", 1)
+    app = FastAPI()
+
+    @app.post("/api/comments/anonymous")
+    async def comment():
+        return {"ok": True}
+
+    limiter = RateLimiter(MemoryBuckets(), policies={**ratelimit.load_policies(),
+                                                     "comment": Policy("comment", 2, 60)}, enabled=True)
+    app.add_middleware(RateLimitMiddleware, limiter=limiter)
+    client = TestClient(app)  # Every request arrives from the same peer: the proxy
+
+    def post(ip):
+        # A client-sent X-Forwarded-For is kept; the proxy appends the real address
+        return client.post("/api/comments/anonymous", headers={"X-Forwarded-For": f"6.6.6.6, {ip}"}).status_code
+
+    assert [post("203.0.113.5") for _ in range(3)] == [200, 200, 429]
+    assert post("198.51.100.7") == 200
+
+
+def test_account_bucket_only_counts_failures():
+    async def scenario():
+        limiter = RateLimiter(MemoryBuckets(), policies={"login_account": Policy("login_account", 2, 300)}, enabled=True)
+        for _ in range(10):  # Successful logins only check the bucket
+            await limiter.check("login_account", "ana@example.com")
+        await limiter.charge("login_account", "ana@example.com")
+        await limiter.charge("login_account", "ana@example.com")
+        with pytest.raises(HTTPException) as exc:
+            await limiter.check("login_account", "ana@example.com")
+        assert exc.value.status_code == 429
+        await limiter.check("login_account", "bob@example.com")
+
+    asyncio.run(scenario())
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Tests para el recomendador de posts relacionados
+"""
+import asyncio
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from conftest import FakeDB
+
+import related
+from related import RelatedIndex, RelatedPosts
+
+
+def make_post(post_id, title, tags, content):
+    return {
+        "id": post_id, "slug": post_id, "title": title, "excerpt": title,
+        "category": "dev", "tags": tags, "content": content,
+    }
+
+
+POSTS = [
+    make_post("react-hooks", "Guía de React hooks", ["react", "javascript"], "useState useEffect componentes react estado"),
+    make_post("react-context", "React Context API", ["react", "javascript"], "context provider componentes react estado global"),
+    make_post("fastapi-intro", "Introducción a FastAPI", ["python", "fastapi"], "python api rutas pydantic async endpoints"),
+    make_post("fastapi-auth", "Autenticación en FastAPI", ["python", "fastapi"], "python jwt cookies endpoints async seguridad"),
+    make_post("mongo-indexes", "Índices en MongoDB", ["mongodb"], "índices consultas colecciones rendimiento"),
+]
+
+
+def neighbour_ids(index, post_id):
+    return [other for other, _ in index.neighbours[post_id]]
+
+
+def test_build_finds_topical_neighbours():
+    index = RelatedIndex(n_features=256, k=2)
+    index.build(POSTS)
+    assert neighbour_ids(index, "react-hooks")[0] == "react-context"
+    assert neighbour_ids(index, "fastapi-auth")[0] == "fastapi-intro"
+    assert "react-hooks" not in neighbour_ids(index, "react-hooks")
+
+
+def test_incremental_upsert_and_remove():
+    index = RelatedIndex(n_features=256, k=2)
+    index.build(POSTS)
+    new_post = make_post("react-testing", "Testing en React", ["react", "javascript"], "componentes react testing estado")
+    changed = index.upsert(new_post)
+    assert "react-testing" in changed
+    assert neighbour_ids(index, "react-testing")[0] in {"react-hooks", "react-context"}
+    assert "react-testing" in neighbour_ids(index, "react-hooks")
+
+    changed = index.remove("react-testing")
+    assert "react-hooks" in changed
+    assert "react-testing" not in neighbour_ids(index, "react-hooks")
+    assert len(index) == len(POSTS)
+    assert index.document("react-hooks")["related"][0]["slug"] == "react-context"
+
+
+def test_upserts_fill_spare_rows_and_grow_the_buffer_by_doubling():
+    index = RelatedIndex(n_features=256, k=2)
+    index.build(POSTS)
+    capacity = index.capacity
+    assert capacity >= len(POSTS) + related.MIN_SPARE_ROWS
+    buffer = index._buffer
+    for i in range(capacity - len(POSTS)):
+        index.upsert(make_post(f"extra-{i}", f"Post {i}", ["python"], f"python tema{i}"))
+    assert index._buffer is buffer  # written in place
+    index.upsert(make_post("one-more", "Otro", ["react"], "react componentes"))
+    assert index.capacity == 2 * capacity and len(index) == capacity + 1
+    assert index.matrix.shape == (capacity + 1, 256)
+    # Rows written before the buffer grew were carried over
+    row = index.rows["react-hooks"]
+    assert related.top_k(index.matrix @ index.matrix[row], 1, exclude=row)[0][0] == index.rows["react-context"]
+
+
+def test_startup_warm_up_builds_in_memory_and_only_writes_when_out_of_step():
+    db = FakeDB(posts=[{**post, "published": True} for post in POSTS])
+    service = RelatedPosts(db, n_features=256, k=2)
+    assert asyncio.run(service.warm_up()) == len(POSTS)
+    assert len(db.related_posts.docs) == len(POSTS)  # empty collection: written once
+
+    db.related_posts.calls.clear()
+    again = RelatedPosts(db, n_features=256, k=2)
+    assert asyncio.run(again.warm_up()) == len(POSTS)
+    assert again._built and db.related_posts.calls == ["count_documents"]
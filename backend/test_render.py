@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Tests para el renderizado Markdown del lado del servidor
+"""
+import asyncio
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from conftest import FakeDB
+
+import render
+
+
+CONTENT = """# Título
+
+## Instalación
+
+```python
+def hola():
+    return 1
+```
+
+## Instalación
+
+### Uso con `pip`
+
+<script>alert(1)</script> [x](javascript:alert(1))
+"""
+
+
+def test_render_builds_toc_with_unique_anchors_and_highlights_code():
+    rendered = render.render_markdown(CONTENT)
+    assert rendered["toc"] == [
+        {"level": 2, "text": "Instalación", "id": "instalacion"},
+        {"level": 2, "text": "Instalación", "id": "instalacion-1"},
+        {"level": 3, "text": "Uso con pip", "id": "uso-con-pip"},
+    ]
+    html = rendered["content_html"]
+    assert '<h2 id="instalacion-1">' in html
+    assert '<pre class="highlight"><code class="language-python"><span class="k">def</span>' in html
+    # Raw HTML is escaped and unsafe links are not turned into anchors
+    assert "<script>" not in html and "&lt;script&gt;" in html
+    assert 'href="javascript:' not in html
+
+
+def test_cache_hits_skip_rendering():
+    render._cache.clear()
+    before = render.render_metrics.renders
+    first = asyncio.run(render.render_fields(CONTENT))
+    second = asyncio.run(render.render_fields(CONTENT))
+    assert render.render_metrics.renders == before + 1
+    assert first == second and first["content_hash"] == render.content_hash(CONTENT)
+
+
+def test_posts_without_html_are_backfilled_once():
+    post = {"id": "p1", "content": "## Hola", "updated_at": "2025-01-20T10:00:00+00:00"}
+    db = FakeDB(posts=[post])
+    post = asyncio.run(render.ensure_rendered(db, post))
+    assert post["toc"] == [{"level": 2, "text": "Hola", "id": "hola"}]
+    assert db.posts.docs[0]["toc"] == post["toc"] and db.posts.docs[0]["content_hash"] == post["content_hash"]
+    asyncio.run(render.ensure_rendered(db, post))
+    assert db.posts.calls == ["update_one"]
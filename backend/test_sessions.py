@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Tests para la limpieza de sesiones expiradas
+"""
+import asyncio
+import os
+import sys
+from datetime import datetime, timezone, timedelta
+from types import SimpleNamespace
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from fastapi import HTTPException
+
+import auth
+import sessions
+
+
+def seed(db, expired, active):
+    now = datetime.now(timezone.utc)
+    db.sessions.seed([{"_id": i, "session_token": f"t{i}", "expires_at": now - timedelta(days=1)} for i in range(expired)])
+    db.sessions.seed([{"_id": expired + i, "session_token": f"a{i}", "expires_at": now + timedelta(days=1)}
+                      for i in range(active)])
+    return db
+
+
+def test_reaper_removes_only_expired_sessions_in_batches(fake_db):
+    db = seed(fake_db, expired=25, active=3)
+    assert asyncio.run(sessions.reap_expired(db, batch_size=10)) == 25
+    assert db.sessions.calls.count("delete_many") == 3
+    assert len(db.sessions.docs) == 3
+
+
+def test_expired_session_with_naive_datetime_is_rejected(fake_db):
+    # Motor returns naive UTC datetimes; comparing them with aware ones used to raise TypeError
+    db = seed(fake_db, expired=1, active=0)
+    db.sessions.docs[0]["expires_at"] = db.sessions.docs[0]["expires_at"].replace(tzinfo=None)
+    request = SimpleNamespace(cookies={"session_token": "t0"}, headers={})
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(auth.get_current_user(request, db))
+    assert exc.value.detail == "Session has expired"
+    assert db.sessions.docs == []
+
+
+def test_duplicate_tokens_are_removed_before_the_unique_index(fake_db):
+    db = seed(fake_db, expired=0, active=3)
+    db.sessions.seed([{"_id": 10, "session_token": "a0"}, {"_id": 11, "session_token": "a1"}])
+    asyncio.run(sessions.ensure_indexes(db))
+    assert sorted(doc["session_token"] for doc in db.sessions.docs) == ["a2"]
+    assert db.sessions.indexes["session_token_1"]["unique"] is True
+
+
+def test_indexes_with_conflicting_options_are_replaced(fake_db, monkeypatch):
+    monkeypatch.setattr(sessions, "SESSION_TTL_INDEX", True)
+    asyncio.run(fake_db.sessions.create_index("session_token"))
+    asyncio.run(fake_db.sessions.create_index("expires_at"))
+    asyncio.run(sessions.ensure_indexes(fake_db))
+    assert fake_db.sessions.indexes["session_token_1"]["unique"] is True
+    assert fake_db.sessions.indexes["expires_at_1"]["expireAfterSeconds"] == 0
+    monkeypatch.setattr(sessions, "SESSION_TTL_INDEX", False)
+    asyncio.run(sessions.ensure_indexes(fake_db))
+    assert "expireAfterSeconds" not in fake_db.sessions.indexes["expires_at_1"]
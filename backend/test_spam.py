@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Tests para el filtro de spam (Naive Bayes) de comentarios anónimos
+"""
+import asyncio
+import os
+import random
+import sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+import spam
+
+HAM_WORDS = "gracias excelente artículo python fastapi me ayudó mucho con mongodb async explicación clara".split()
+SPAM_WORDS = "gana dinero casino bitcoin gratis oferta click aquí premio viagra préstamo rápido".split()
+
+
+def corpus(words, n, seed, link=False):
+    rng = random.Random(seed)
+    comments = []
+    for i in range(n):
+        content = " ".join(rng.choice(words) for _ in range(12))
+        if link:
+            content += f" https://promo{i % 3}.example.biz/oferta"
+        comments.append({
+            "author_name": "Lector" if not link else "Promo Bot",
+            "author_email": f"user{i}@{'gmail.com' if not link else 'spam.biz'}",
+            "content": content,
+        })
+    return comments
+
+
+def model():
+    return spam.SpamModel.train(corpus(HAM_WORDS, 200, 1), corpus(SPAM_WORDS, 200, 2, link=True))
+
+
+def test_separates_ham_and_spam():
+    m = model()
+    ham = corpus(HAM_WORDS, 20, 3)
+    junk = corpus(SPAM_WORDS, 20, 4, link=True)
+    assert max(m.score(c) for c in ham) < spam.APPROVE_BELOW
+    assert min(m.score(c) for c in junk) > spam.REJECT_ABOVE
+
+
+def test_hashing_is_stable_across_processes():
+    # crc32, not hash(): a model trained in the worker must index the same features
+    assert spam.feature_indices(["casino"]).tolist() == [2198816663 % spam.N_FEATURES]
+
+
+def seed(db, ham, junk):
+    db.comments.seed({**comment, "approved": True} for comment in ham)
+    db.rejected_comments.seed(junk)
+    return db
+
+
+def test_retrain_in_worker_and_classify(fake_db):
+    async def scenario():
+        spam_filter = spam.SpamFilter(seed(fake_db, corpus(HAM_WORDS, 50, 7), corpus(SPAM_WORDS, 50, 8, link=True)))
+        assert spam_filter.classify("Ana", "ana@gmail.com", "hola")[0] == "pending"  # no model yet
+        try:
+            assert await spam_filter.retrain()
+        finally:
+            await spam_filter.stop()
+        verdict, score = spam_filter.classify("Promo Bot", "x@spam.biz", "casino gratis https://promo1.example.biz/")
+        assert verdict == "spam" and score > spam.REJECT_ABOVE
+        assert spam_filter.as_dict()["examples"] == {"ham": 50, "spam": 50}
+
+    asyncio.run(scenario())
+
+
+def test_too_few_examples_keeps_filter_off(fake_db):
+    spam_filter = spam.SpamFilter(seed(fake_db, corpus(HAM_WORDS, 3, 9), []))
+    assert asyncio.run(spam_filter.retrain()) is False
+    assert spam_filter.model is None
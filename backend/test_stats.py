@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Tests para los contadores incrementales de estadísticas del blog
+"""
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fastapi.testclient import TestClient
+
+from conftest import FakeDB
+
+import server
+import stats
+
+
+def test_bump_never_creates_the_counters_document(fake_db):
+    fake_db.stats.docs.clear()
+    asyncio.run(stats.bump(fake_db, total_posts=1, total_views=0))
+    assert fake_db.stats.calls == ["update_one"] and fake_db.stats.docs == []
+
+
+def test_missing_or_partial_counters_are_seeded_from_a_recount(fake_db, monkeypatch):
+    recount = {name: 3 for name in stats.COUNTERS}
+
+    async def compute_stats(db):
+        return recount
+
+    monkeypatch.setattr(stats, "compute_stats", compute_stats)
+    assert asyncio.run(stats.ensure_seeded(fake_db)) is True
+    assert fake_db.counters() == recount
+    asyncio.run(fake_db.stats.update_many({}, {"$unset": {"total_views": ""}}))  # partial document
+    assert asyncio.run(stats.ensure_seeded(fake_db)) is True
+    assert asyncio.run(stats.ensure_seeded(fake_db)) is False
+
+
+def test_counters_match_a_recount_after_every_write_through_the_api(monkeypatch):
+    db = FakeDB()
+    asyncio.run(stats.rebuild_stats(db))
+    user = SimpleNamespace(id="u1", name="Ana", email="ana@example.com")
+
+    async def authenticated(request, _db):
+        return user
+
+    monkeypatch.setattr(server, "db", db)
+    monkeypatch.setattr(server, "require_admin", authenticated)
+    monkeypatch.setattr(server, "get_current_user", authenticated)
+    monkeypatch.setattr(server.related_posts, "schedule_refresh", lambda post_id: None)
+    client = TestClient(server.app)
+
+    def call(method, url, **kwargs):
+        response = client.request(method, f"/api{url}", **kwargs)
+        assert response.status_code == 200, (method, url, response.text)
+        counters = {name: value for name, value in db.counters().items() if name in stats.COUNTERS}
+        assert counters == asyncio.run(stats.compute_stats(db)), (method, url)
+        return response.json()
+
+    post = {"title": "Hola", "content": "texto", "excerpt": "x", "category": "backend"}
+    draft = call("POST", "/admin/posts", json=post)
+    live = call("POST", "/admin/posts", json={**post, "title": "Otro", "published": True})
+    call("PUT", f"/admin/posts/{draft['id']}", json={"published": True})
+    call("PUT", f"/admin/posts/{draft['id']}", json={"published": False})
+
+    pending = call("POST", "/comments/anonymous", json={
+        "post_id": live["id"], "author_name": "Eva", "author_email": "eva@example.com", "content": "hola"})
+    spam = call("POST", "/comments/anonymous", json={
+        "post_id": live["id"], "author_name": "Bot", "author_email": "bot@example.com", "content": "compra"})
+    own = call("POST", "/comments", json={"post_id": live["id"], "content": "mío"})
+    call("PUT", f"/admin/comments/{pending['id']}/approve")
+    call("DELETE", f"/admin/comments/{spam['id']}")
+    call("DELETE", f"/comments/{own['id']}")
+    call("DELETE", f"/admin/comments/{pending['id']}")
+
+    call("POST", f"/posts/{live['id']}/like")
+    call("DELETE", f"/posts/{live['id']}/like")
+
+    call("POST", "/newsletter/subscribe", json={"email": "Lector@Example.com"})
+    call("POST", "/newsletter/subscribe", json={"email": "otro@example.com"})
+    call("PUT", "/admin/newsletter/subscribers/lector@example.com/toggle")
+    call("POST", "/newsletter/subscribe", json={"email": "lector@example.com"})
+    call("DELETE", "/admin/newsletter/subscribers/otro@example.com")
+
+    call("POST", "/auth/register", json={"email": "nuevo@example.com", "name": "Nuevo", "password": "secreto123"})
+
+    call("DELETE", f"/admin/posts/{live['id']}")
+    call("DELETE", f"/admin/posts/{draft['id']}")
+    assert db.counters()["total_posts"] == 0 and db.counters()["total_users"] == 1
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Tests para las rutas de edición: un solo round-trip con find_one_and_update
+"""
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from conftest import FakeDB
+
+import server
+from server import CategoryCreate, CommentUpdate, PostUpdate, UserProfileUpdate
+
+
+POST = {"id": "p1", "title": "Borrador", "slug": "borrador", "content": "hola", "excerpt": "x",
+        "category": "backend", "published": False, "created_at": "2025-01-20T10:00:00+00:00",
+        "updated_at": "2025-01-20T10:00:00+00:00"}
+
+
+def blog_db():
+    return FakeDB(
+        posts=[POST],
+        categories=[{"id": "c1", "name": "Old", "slug": "old", "created_at": "2025-01-01T00:00:00+00:00"}],
+        comments=[{"id": "m1", "post_id": "p1", "user_id": "u1", "author_name": "Ana",
+                   "author_email": "a@x.com", "content": "v1", "approved": True,
+                   "created_at": "2025-01-20T10:00:00+00:00"}],
+        stats=[{"_id": "blog"}],
+    )
+
+
+def calls(db):
+    """Every recorded operation, as (collection, operation) pairs"""
+    return [(name, call) for name in ("posts", "categories", "comments", "user_profiles", "stats")
+            for call in db[name].calls]
+
+
+def run(monkeypatch, coro_fn):
+    db = blog_db()
+    user = SimpleNamespace(id="u1")
+
+    async def fake_auth(request, _db):
+        return user
+
+    monkeypatch.setattr(server, "db", db)
+    monkeypatch.setattr(server, "require_admin", fake_auth)
+    monkeypatch.setattr(server, "get_current_user", fake_auth)
+    monkeypatch.setattr(server.related_posts, "schedule_refresh", lambda post_id: None)
+    result = asyncio.run(coro_fn())
+    return db, result
+
+
+def test_update_post_is_one_round_trip_and_stamps_published_at(monkeypatch):
+    db, post = run(monkeypatch, lambda: server.update_post(
+        "p1", PostUpdate(title="Precio: $100", published=True), request=None))
+    # The findAndModify plus the counter bump for the draft -> published transition
+    assert calls(db) == [("posts", "find_one_and_update"), ("stats", "update_one")]
+    assert post.title == "Precio: $100" and post.slug == "precio-100"
+    assert post.published_at is not None
+    assert db.posts.docs[0]["title"] == "Precio: $100"
+    assert db.posts.docs[0]["published_at"] == post.published_at.isoformat()
+
+
+def test_update_category_comment_and_profile_are_one_round_trip(monkeypatch):
+    db, category = run(monkeypatch, lambda: server.update_category(
+        "c1", CategoryCreate(name="Nueva"), request=None))
+    assert calls(db) == [("categories", "find_one_and_update")] and category.slug == "nueva"
+
+    db, comment = run(monkeypatch, lambda: server.update_comment(
+        "m1", CommentUpdate(content="v2"), request=None))
+    assert calls(db) == [("comments", "find_one_and_update")] and comment.content == "v2"
+
+    db, profile = run(monkeypatch, lambda: server.update_user_profile(
+        UserProfileUpdate(bio="Hola"), request=None))
+    assert calls(db) == [("user_profiles", "find_one_and_update")] and profile["bio"] == "Hola"
@@ -1,9 +1,18 @@
 """
-Script to update admin roles based on ADMIN_EMAILS in .env
-Run this script whenever you add new emails to ADMIN_EMAILS
+Script to sync user roles with ADMIN_EMAILS in .env
+Run this script whenever you change ADMIN_EMAILS:
+    python update_admin_roles.py             # promote and demote
+    python update_admin_roles.py --dry-run   # only show what would change
+
+Users in ADMIN_EMAILS become admins and admins no longer listed become
+users, the same rule logins apply (auth.get_user_role). Changes take
+effect on the next request: roles are read from the database, not from
+the session or token.
 """
+import argparse
 import asyncio
 import os
+import sys
 from dotenv import load_dotenv
 from motor.motor_asyncio import AsyncIOMotorClient
 from pathlib import Path
@@ -11,44 +20,41 @@ from pathlib import Path
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
-
-# Get admin emails from .env
-ADMIN_EMAILS_STR = os.environ.get('ADMIN_EMAILS', '')
-ADMIN_EMAILS = [email.strip().lower() for email in ADMIN_EMAILS_STR.split(',') if email.strip()]
-
-async def update_admin_roles():
-    """Update user roles based on ADMIN_EMAILS"""
-    print(f"📧 Admin emails configured: {ADMIN_EMAILS}")
-    print(f"\n🔄 Updating admin roles...\n")
-    
-    # Update users who should be admin
-    for email in ADMIN_EMAILS:
-        result = await db.users.update_one(
-            {"email": email},
-            {"$set": {"role": "admin"}}
-        )
-        if result.matched_count > 0:
-            print(f"✅ Updated {email} to admin role")
-        else:
-            print(f"⚠️  User {email} not found in database")
-    
-    # Optionally: Demote users who are admin but not in ADMIN_EMAILS
-    # (uncomment if you want this behavior)
-    # result = await db.users.update_many(
-    #     {"email": {"$nin": ADMIN_EMAILS}, "role": "admin"},
-    #     {"$set": {"role": "user"}}
-    # )
-    # if result.modified_count > 0:
-    #     print(f"\n⬇️  Demoted {result.modified_count} user(s) from admin to user")
-    
-    print(f"\n✨ Done! Users need to log out and log back in for changes to take effect.")
-    
-    # Close connection
-    client.close()
+import auth  # noqa: E402  (reads ADMIN_EMAILS from the .env loaded above)
+
+
+async def update_admin_roles(dry_run: bool):
+    """Sync user roles with ADMIN_EMAILS"""
+    print(f"📧 Admin emails configured: {auth.ADMIN_EMAILS}")
+    if not auth.ADMIN_EMAILS:
+        # Syncing against an empty list would demote every admin
+        print("❌ ADMIN_EMAILS is empty: nothing synced (set it in backend/.env)")
+        sys.exit(1)
+    print(f"\n🔄 {'Checking' if dry_run else 'Syncing'} roles...\n")
+
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    try:
+        result = await auth.sync_roles(client[os.environ['DB_NAME']], dry_run=dry_run)
+    finally:
+        client.close()
+
+    verb = "Would" if dry_run else "Did"
+    for email in result["promoted"]:
+        print(f"⬆️  {verb} promote {email} to admin")
+    for email in result["demoted"]:
+        print(f"⬇️  {verb} demote {email} to user")
+    for email in result["missing"]:
+        print(f"⚠️  User {email} not found in database (will be admin on first login)")
+    if not result["promoted"] and not result["demoted"]:
+        print("✅ Roles already in sync")
+
+    if dry_run:
+        print(f"\n🔍 Dry run: no changes written")
+    else:
+        print(f"\n✨ Done! {result['modified']} user(s) updated; changes apply on their next request.")
+
 
 if __name__ == "__main__":
-    asyncio.run(update_admin_roles())
+    parser = argparse.ArgumentParser(description="Sync user roles with ADMIN_EMAILS")
+    parser.add_argument("--dry-run", action="store_true", help="show the changes without writing them")
+    asyncio.run(update_admin_roles(parser.parse_args().dry_run))
@@ -0,0 +1,210 @@
+"""
+Unique reader tracking for FarchoDev Blog
+Keeps one HyperLogLog sketch per (post, day) in memory and flushes it to
+the post_visitors collection.
+
+Every app worker owns its own documents ({post_id, day, worker_id}), so
+flushes never race with each other; readers merge all documents for the
+requested days. Past days are compacted into a single "merged" document.
+"""
+import asyncio
+import logging
+import os
+import re
+import uuid
+from datetime import datetime, timezone, timedelta
+from typing import Dict, Iterable, Optional, Tuple
+
+from fastapi import Request
+
+import ratelimit
+from hll import HyperLogLog, DEFAULT_PRECISION, relative_error
+
+logger = logging.getLogger(__name__)
+
+SITE_KEY = "*"  # Sketch key for site-wide unique visitors
+MERGED_WORKER = "merged"
+FLUSH_INTERVAL_SECONDS = float(os.environ.get('VISITORS_FLUSH_INTERVAL', '30'))
+PRECISION = int(os.environ.get('VISITORS_HLL_PRECISION', DEFAULT_PRECISION))
+
+BOT_PATTERN = re.compile(r"bot|crawl|spider|slurp|preview|facebookexternalhit|headless", re.IGNORECASE)
+
+
+def day_key(moment: Optional[datetime] = None) -> str:
+    """UTC day bucket, e.g. 2025-01-31"""
+    return (moment or datetime.now(timezone.utc)).strftime("%Y-%m-%d")
+
+
+def day_range(days: int, until: Optional[datetime] = None) -> list:
+    """Day keys for the last `days` days, oldest first"""
+    until = until or datetime.now(timezone.utc)
+    return [day_key(until - timedelta(days=offset)) for offset in range(days - 1, -1, -1)]
+
+
+def is_bot(request: Request) -> bool:
+    """Cheap user-agent check to keep crawlers out of the sketches"""
+    user_agent = request.headers.get("user-agent", "")
+    return not user_agent or bool(BOT_PATTERN.search(user_agent))
+
+
+def visitor_key(request: Request) -> str:
+    """Identify a reader: session token when logged in, otherwise IP + user agent
+
+    The IP is resolved like the rate limiter does, so readers behind the
+    reverse proxy are not all counted as the proxy's address.
+    """
+    token = request.cookies.get("session_token")
+    if token:
+        return f"s:{token}"
+    return f"a:{ratelimit.client_ip(request.scope)}|{request.headers.get('user-agent', '')}"
+
+
+async def ensure_indexes(db):
+    await db.post_visitors.create_index(
+        [("post_id", 1), ("day", 1), ("worker_id", 1)], unique=True
+    )
+    await db.post_visitors.create_index([("day", 1)])
+
+
+class VisitorTracker:
+    """Per-worker HLL buffer with periodic flush to MongoDB"""
+
+    def __init__(self, db, precision: int = PRECISION, flush_interval: float = FLUSH_INTERVAL_SECONDS):
+        self.db = db
+        self.precision = precision
+        self.flush_interval = flush_interval
+        self.worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._sketches: Dict[Tuple[str, str], HyperLogLog] = {}
+        self._dirty: set = set()
+        self._task: Optional[asyncio.Task] = None
+        self._last_compacted: Optional[str] = None
+
+    @property
+    def relative_error(self) -> float:
+        return round(relative_error(self.precision), 4)
+
+    def record(self, post_id: str, visitor: str, moment: Optional[datetime] = None):
+        """Add a visitor to today's post and site-wide sketches (no I/O)"""
+        day = day_key(moment)
+        for key in ((post_id, day), (SITE_KEY, day)):
+            sketch = self._sketches.get(key)
+            if sketch is None:
+                sketch = self._sketches[key] = HyperLogLog(self.precision)
+            if sketch.add(visitor):
+                self._dirty.add(key)
+
+    async def flush(self):
+        """Write changed sketches; each worker only ever writes its own documents"""
+        dirty, self._dirty = list(self._dirty), set()
+        now = datetime.now(timezone.utc)
+        written = 0
+        try:
+            for post_id, day in dirty:
+                await self.db.post_visitors.update_one(
+                    {"post_id": post_id, "day": day, "worker_id": self.worker_id},
+                    {"$set": {
+                        "registers": self._sketches[(post_id, day)].to_bytes(),
+                        "precision": self.precision,
+                        "updated_at": now,
+                    }},
+                    upsert=True
+                )
+                written += 1
+        except Exception:
+            # Unwritten sketches stay dirty for the next flush
+            self._dirty.update(dirty[written:])
+            raise
+        # Only today's sketches can still change
+        today = day_key(now)
+        for key in [k for k in self._sketches if k[1] < today and k not in self._dirty]:
+            del self._sketches[key]
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+                today = day_key()
+                if self._last_compacted != today:
+                    await compact(self.db, before_day=today)
+                    self._last_compacted = today
+            except Exception:
+                logger.exception("Failed to flush visitor sketches")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    def _local(self, post_id: str, days: Iterable[str]):
+        for day in days:
+            sketch = self._sketches.get((post_id, day))
+            if sketch is not None:
+                yield sketch
+
+    async def sketch(self, post_id: str, days: Iterable[str]) -> HyperLogLog:
+        """Union of stored and not-yet-flushed sketches for the given days
+
+        Merging is idempotent, so this worker's own flushed documents can be
+        combined with its in-memory sketches without double counting.
+        """
+        days = list(days)
+        result = HyperLogLog(self.precision)
+        async for doc in self.db.post_visitors.find(
+            {"post_id": post_id, "day": {"$in": days}},
+            {"_id": 0, "registers": 1}
+        ):
+            result.merge(HyperLogLog.from_bytes(doc["registers"]))
+        for sketch in self._local(post_id, days):
+            result.merge(sketch)
+        return result
+
+    async def unique_visitors(self, post_id: str = SITE_KEY, days: int = 1) -> int:
+        """Estimated unique visitors over the last `days` days"""
+        return (await self.sketch(post_id, day_range(days))).count()
+
+    async def daily_unique_visitors(self, post_id: str, days: int) -> list:
+        """Per-day estimates, oldest day first"""
+        keys = day_range(days)
+        per_day = {day: HyperLogLog(self.precision) for day in keys}
+        async for doc in self.db.post_visitors.find(
+            {"post_id": post_id, "day": {"$in": keys}},
+            {"_id": 0, "day": 1, "registers": 1}
+        ):
+            per_day[doc["day"]].merge(HyperLogLog.from_bytes(doc["registers"]))
+        for day in keys:
+            for sketch in self._local(post_id, [day]):
+                per_day[day].merge(sketch)
+        return [{"day": day, "unique_visitors": per_day[day].count()} for day in keys]
+
+
+async def compact(db, before_day: str):
+    """Merge per-worker documents of finished days into one document each"""
+    pipeline = [
+        {"$match": {"day": {"$lt": before_day}}},
+        {"$group": {"_id": {"post_id": "$post_id", "day": "$day"}, "docs": {"$sum": 1}}},
+        {"$match": {"docs": {"$gt": 1}}},
+    ]
+    async for group in db.post_visitors.aggregate(pipeline):
+        key = group["_id"]
+        merged = None
+        async for doc in db.post_visitors.find(key, {"_id": 0, "registers": 1}):
+            sketch = HyperLogLog.from_bytes(doc["registers"])
+            merged = sketch if merged is None else merged.merge(sketch)
+        if merged is None:
+            continue
+        await db.post_visitors.update_one(
+            {**key, "worker_id": MERGED_WORKER},
+            {"$set": {
+                "registers": merged.to_bytes(),
+                "precision": merged.p,
+                "updated_at": datetime.now(timezone.utc),
+            }},
+            upsert=True
+        )
+        await db.post_visitors.delete_many({**key, "worker_id": {"$ne": MERGED_WORKER}})
@@ -415,12 +415,34 @@ const PostDetail = () => {
             />
           )}
 
-          {/* Post Content */}
-          <div className="prose max-w-none mb-12" data-testid="post-content">
-            {post.content.split('\n').map((paragraph, index) => (
-              <p key={index} className="mb-4 text-gray-800 leading-relaxed">{paragraph}</p>
-            ))}
-          </div>
+          {/* Table of Contents */}
+          {post.toc && post.toc.length > 1 && (
+            <nav className="mb-8 p-6 bg-gray-50 rounded-xl" data-testid="post-toc">
+              <h3 className="text-lg font-semibold text-gray-900 mb-3">Contenido</h3>
+              <ul className="space-y-1">
+                {post.toc.map((item) => (
+                  <li key={item.id} className={item.level > 2 ? 'ml-4' : ''}>
+                    <a href={`#${item.id}`} className="text-blue-700 hover:underline">{item.text}</a>
+                  </li>
+                ))}
+              </ul>
+            </nav>
+          )}
+
+          {/* Post Content (HTML rendered and escaped server-side) */}
+          {post.content_html ? (
+            <div
+              className="prose max-w-none mb-12"
+              data-testid="post-content"
+              dangerouslySetInnerHTML={{ __html: post.content_html }}
+            />
+          ) : (
+            <div className="prose max-w-none mb-12" data-testid="post-content">
+              {post.content.split('\n').map((paragraph, index) => (
+                <p key={index} className="mb-4 text-gray-800 leading-relaxed">{paragraph}</p>
+              ))}
+            </div>
+          )}
 
           {/* Tags */}
           {post.tags && post.tags.length > 0 && (
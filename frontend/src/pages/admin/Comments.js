@@ -1,7 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import axiosInstance from '../../utils/axios';
 import AdminLayout from '../../components/AdminLayout';
-import { Check, Trash2 } from 'lucide-react';
+import { Ban, Check, Trash2 } from 'lucide-react';
 import { format } from 'date-fns';
 import { es } from 'date-fns/locale';
 import { toast } from 'sonner';
@@ -10,15 +10,31 @@ const AdminComments = () => {
   const [comments, setComments] = useState([]);
   const [loading, setLoading] = useState(true);
   const [filter, setFilter] = useState('all'); // all, pending, approved
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [pendingCount, setPendingCount] = useState(0);
 
   useEffect(() => {
     fetchComments();
-  }, []);
+  }, [filter]);
+
+  const listParams = (cursor) => {
+    const params = {};
+    if (filter !== 'all') params.status = filter;
+    if (cursor) params.cursor = cursor;
+    return params;
+  };
 
   const fetchComments = async () => {
     try {
-      const response = await axiosInstance.get('/admin/comments');
+      // The pending total comes from the X-Total-Count header of a one-row page
+      const [response, pendingRes] = await Promise.all([
+        axiosInstance.get('/admin/comments', { params: listParams() }),
+        axiosInstance.get('/admin/comments', { params: { status: 'pending', limit: 1 } })
+      ]);
       setComments(response.data);
+      setNextCursor(response.headers['x-next-cursor'] || null);
+      setPendingCount(parseInt(pendingRes.headers['x-total-count'] || '0', 10));
     } catch (error) {
       console.error('Error fetching comments:', error);
     } finally {
@@ -26,6 +42,19 @@ const AdminComments = () => {
     }
   };
 
+  const loadMore = async () => {
+    setLoadingMore(true);
+    try {
+      const response = await axiosInstance.get('/admin/comments', { params: listParams(nextCursor) });
+      setComments(prev => [...prev, ...response.data]);
+      setNextCursor(response.headers['x-next-cursor'] || null);
+    } catch (error) {
+      console.error('Error fetching comments:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const approveComment = async (id) => {
     try {
       await axiosInstance.put(`/admin/comments/${id}/approve`);
@@ -50,13 +79,18 @@ const AdminComments = () => {
     }
   };
 
-  const filteredComments = comments.filter(comment => {
-    if (filter === 'pending') return !comment.approved;
-    if (filter === 'approved') return comment.approved;
-    return true;
-  });
+  const bulkModerate = async (action, selector, confirmMessage) => {
+    if (confirmMessage && !window.confirm(confirmMessage)) return;
 
-  const pendingCount = comments.filter(c => !c.approved).length;
+    try {
+      const response = await axiosInstance.post('/admin/comments/bulk', { action, ...selector });
+      toast.success(`${response.data.modified} comentarios actualizados`);
+      fetchComments();
+    } catch (error) {
+      console.error('Error moderating comments:', error);
+      toast.error('Error al moderar los comentarios');
+    }
+  };
 
   return (
     <AdminLayout>
@@ -68,6 +102,16 @@ const AdminComments = () => {
               <p className="text-orange-600 mt-1">{pendingCount} comentarios pendientes de aprobación</p>
             )}
           </div>
+          {pendingCount > 0 && (
+            <button
+              onClick={() => bulkModerate('approve', { status: 'pending' }, `¿Aprobar los ${pendingCount} comentarios pendientes?`)}
+              className="btn-secondary flex items-center"
+              data-testid="approve-all-pending-btn"
+            >
+              <Check size={18} className="mr-2" />
+              Aprobar todos
+            </button>
+          )}
         </div>
 
         {/* Filter Tabs */}
@@ -108,9 +152,9 @@ const AdminComments = () => {
               <div key={i} className="skeleton h-32 rounded-xl" />
             ))}
           </div>
-        ) : filteredComments.length > 0 ? (
+        ) : comments.length > 0 ? (
           <div className="space-y-4" data-testid="comments-list">
-            {filteredComments.map(comment => (
+            {comments.map(comment => (
               <div 
                 key={comment.id} 
                 className="bg-white rounded-xl border border-gray-200 p-6"
@@ -141,6 +185,20 @@ const AdminComments = () => {
                         <Check size={18} />
                       </button>
                     )}
+                    {!comment.approved && (
+                      <button
+                        onClick={() => bulkModerate(
+                          'reject',
+                          { status: 'pending', email: comment.author_email },
+                          `¿Rechazar todos los comentarios pendientes de ${comment.author_email}?`
+                        )}
+                        className="p-2 text-orange-600 hover:bg-orange-50 rounded-lg transition-colors"
+                        title="Rechazar todos los pendientes de este email"
+                        data-testid={`reject-email-btn-${comment.id}`}
+                      >
+                        <Ban size={18} />
+                      </button>
+                    )}
                     <button
                       onClick={() => deleteComment(comment.id)}
                       className="p-2 text-red-600 hover:bg-red-50 rounded-lg transition-colors"
@@ -154,6 +212,18 @@ const AdminComments = () => {
                 <p className="text-sm text-gray-500">Post ID: {comment.post_id}</p>
               </div>
             ))}
+            {nextCursor && (
+              <div className="text-center pt-2">
+                <button
+                  onClick={loadMore}
+                  disabled={loadingMore}
+                  className="btn-secondary"
+                  data-testid="load-more-comments-btn"
+                >
+                  {loadingMore ? 'Cargando...' : 'Cargar más'}
+                </button>
+              </div>
+            )}
           </div>
         ) : (
           <div className="bg-white rounded-xl border border-gray-200 p-12 text-center">
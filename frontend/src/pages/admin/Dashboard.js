@@ -17,10 +17,10 @@ const AdminDashboard = () => {
     try {
       const [statsRes, postsRes] = await Promise.all([
         axiosInstance.get('/admin/stats'),
-        axiosInstance.get('/admin/posts')
+        axiosInstance.get('/admin/posts', { params: { limit: 5 } })
       ]);
       setStats(statsRes.data);
-      setRecentPosts(postsRes.data.slice(0, 5));
+      setRecentPosts(postsRes.data);
     } catch (error) {
       console.error('Error fetching dashboard data:', error);
     } finally {
@@ -12,11 +12,18 @@ const AdminNewsletter = () => {
   const [stats, setStats] = useState(null);
   const [filter, setFilter] = useState('all'); // all, active, inactive
 
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [totalCount, setTotalCount] = useState(0);
+
   useEffect(() => {
-    fetchSubscribers();
     fetchStats();
   }, []);
 
+  useEffect(() => {
+    fetchSubscribers();
+  }, [filter]);
+
   const fetchStats = async () => {
     try {
       const response = await axiosInstance.get('/admin/stats');
@@ -26,10 +33,23 @@ const AdminNewsletter = () => {
     }
   };
 
+  const listParams = (cursor) => {
+    const params = {};
+    if (filter !== 'all') params.status = filter;
+    if (cursor) params.cursor = cursor;
+    return params;
+  };
+
   const fetchSubscribers = async () => {
     try {
-      const response = await axiosInstance.get('/admin/newsletter/subscribers');
+      // The overall total comes from the X-Total-Count header of a one-row page
+      const [response, totalRes] = await Promise.all([
+        axiosInstance.get('/admin/newsletter/subscribers', { params: listParams() }),
+        axiosInstance.get('/admin/newsletter/subscribers', { params: { limit: 1 } })
+      ]);
       setSubscribers(response.data);
+      setNextCursor(response.headers['x-next-cursor'] || null);
+      setTotalCount(parseInt(totalRes.headers['x-total-count'] || '0', 10));
     } catch (error) {
       console.error('Error fetching subscribers:', error);
       toast.error('Error al cargar los suscriptores');
@@ -38,6 +58,20 @@ const AdminNewsletter = () => {
     }
   };
 
+  const loadMore = async () => {
+    setLoadingMore(true);
+    try {
+      const response = await axiosInstance.get('/admin/newsletter/subscribers', { params: listParams(nextCursor) });
+      setSubscribers(prev => [...prev, ...response.data]);
+      setNextCursor(response.headers['x-next-cursor'] || null);
+    } catch (error) {
+      console.error('Error fetching subscribers:', error);
+      toast.error('Error al cargar los suscriptores');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const exportSubscribers = async () => {
     try {
       const response = await axiosInstance.get('/admin/newsletter/export', {
@@ -88,14 +122,8 @@ const AdminNewsletter = () => {
     }
   };
 
-  const filteredSubscribers = subscribers.filter(sub => {
-    if (filter === 'active') return sub.active;
-    if (filter === 'inactive') return !sub.active;
-    return true;
-  });
-
-  const activeCount = subscribers.filter(s => s.active).length;
-  const inactiveCount = subscribers.length - activeCount;
+  const activeCount = stats?.total_subscribers || 0;
+  const inactiveCount = Math.max(totalCount - activeCount, 0);
 
   return (
     <AdminLayout>
@@ -106,7 +134,7 @@ const AdminNewsletter = () => {
             onClick={exportSubscribers}
             className="btn-secondary flex items-center"
             data-testid="export-subscribers-btn"
-            disabled={subscribers.length === 0}
+            disabled={totalCount === 0}
           >
             <Download size={20} className="mr-2" />
             Exportar Suscriptores
@@ -132,7 +160,7 @@ const AdminNewsletter = () => {
               <span className="font-semibold">{inactiveCount}</span> Inactivos
             </div>
             <div>
-              <span className="font-semibold">{subscribers.length}</span> Total
+              <span className="font-semibold">{totalCount}</span> Total
             </div>
           </div>
         </div>
@@ -176,7 +204,7 @@ const AdminNewsletter = () => {
               <div key={i} className="skeleton h-20 rounded-xl" />
             ))}
           </div>
-        ) : filteredSubscribers.length > 0 ? (
+        ) : subscribers.length > 0 ? (
           <div className="bg-white rounded-xl border border-gray-200 overflow-hidden">
             <table className="w-full" data-testid="subscribers-table">
               <thead className="bg-gray-50 border-b border-gray-200">
@@ -188,7 +216,7 @@ const AdminNewsletter = () => {
                 </tr>
               </thead>
               <tbody className="divide-y divide-gray-200">
-                {filteredSubscribers.map(subscriber => (
+                {subscribers.map(subscriber => (
                   <tr key={subscriber.id} className="hover:bg-gray-50" data-testid={`subscriber-${subscriber.id}`}>
                     <td className="px-6 py-4">
                       <div className="flex items-center">
@@ -239,6 +267,18 @@ const AdminNewsletter = () => {
                 ))}
               </tbody>
             </table>
+            {nextCursor && (
+              <div className="p-4 text-center border-t border-gray-200">
+                <button
+                  onClick={loadMore}
+                  disabled={loadingMore}
+                  className="btn-secondary"
+                  data-testid="load-more-subscribers-btn"
+                >
+                  {loadingMore ? 'Cargando...' : 'Cargar más'}
+                </button>
+              </div>
+            )}
           </div>
         ) : (
           <div className="bg-white rounded-xl border border-gray-200 p-12 text-center">
@@ -41,8 +41,8 @@ const AdminPostEditor = () => {
 
   const fetchPost = async () => {
     try {
-      const response = await axiosInstance.get('/admin/posts');
-      const post = response.data.find(p => p.id === id);
+      const response = await axiosInstance.get(`/admin/posts/${id}`);
+      const post = response.data;
       
       if (post) {
         setFormData({
@@ -59,6 +59,11 @@ const AdminPostEditor = () => {
         navigate('/admin/posts');
       }
     } catch (error) {
+      if (error.response?.status === 404) {
+        toast.error('Post no encontrado');
+        navigate('/admin/posts');
+        return;
+      }
       console.error('Error fetching post:', error);
       toast.error('Error al cargar el post');
     } finally {
@@ -8,6 +8,8 @@ import { toast } from 'sonner';
 const AdminPosts = () => {
   const [posts, setPosts] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     fetchPosts();
@@ -17,6 +19,7 @@ const AdminPosts = () => {
     try {
       const response = await axiosInstance.get('/admin/posts');
       setPosts(response.data);
+      setNextCursor(response.headers['x-next-cursor'] || null);
     } catch (error) {
       console.error('Error fetching posts:', error);
       toast.error('Error al cargar los posts');
@@ -25,6 +28,20 @@ const AdminPosts = () => {
     }
   };
 
+  const loadMore = async () => {
+    setLoadingMore(true);
+    try {
+      const response = await axiosInstance.get('/admin/posts', { params: { cursor: nextCursor } });
+      setPosts(prev => [...prev, ...response.data]);
+      setNextCursor(response.headers['x-next-cursor'] || null);
+    } catch (error) {
+      console.error('Error fetching posts:', error);
+      toast.error('Error al cargar los posts');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const deletePost = async (id, title) => {
     if (!window.confirm(`¿Estás seguro de eliminar "${title}"?`)) return;
 
@@ -112,6 +129,18 @@ const AdminPosts = () => {
                 ))}
               </tbody>
             </table>
+            {nextCursor && (
+              <div className="p-4 text-center border-t border-gray-200">
+                <button
+                  onClick={loadMore}
+                  disabled={loadingMore}
+                  className="btn-secondary"
+                  data-testid="load-more-posts-btn"
+                >
+                  {loadingMore ? 'Cargando...' : 'Cargar más'}
+                </button>
+              </div>
+            )}
           </div>
         ) : (
           <div className="bg-white rounded-xl border border-gray-200 p-12 text-center">